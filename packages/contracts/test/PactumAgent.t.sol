@@ -388,6 +388,86 @@ contract PactumAgentTest is Test {
         assertFalse(agent.verifyEIP712(alice, wrongChallenge, timestamp, signature));
     }
 
+    // ----------------------------------------------------------------
+    // EIP-712 parity vectors (gateway/chain/eip712.py, registry-agent/src/eip712.py)
+    // Same constants are checked on the Python side by gateway/scripts/check_eip712_vectors.py
+    // ----------------------------------------------------------------
+
+    uint256 constant VECTOR_CHAIN_ID = 84532;
+    address constant VECTOR_CONTRACT = 0x0000000000000000000000000000000000007A17;
+    uint256 constant VECTOR_TIMESTAMP = 1700000000;
+    bytes32 constant VECTOR_AUTH_TYPEHASH = 0x6cc7f9054f828b2492c12bb0449b405cdbf41c87b525811a492b94be42231f19;
+    bytes32 constant VECTOR_DOMAIN_SEPARATOR = 0x6c01a494da20ce3cd672b476bd29361fcdbf541e3461ae60c0b4d2688aad40f7;
+    // EOA: alice signs for alice
+    bytes32 constant VECTOR_EOA_DIGEST = 0xaa65a99acb2df7b88618817683ea61e8b44522c4519e2fac3c782b0b396aff17;
+    bytes constant VECTOR_EOA_SIG =
+        hex"661c107c0704e2d9b1dce709755e5a6aba10728e221c0db335d4276e635e8b4b11cdaf91953e4244700673e270ec357508b19d8a32e34ab0eda69bda98fa0b481b";
+    // Same signature with s' = n - s, v flipped — must be rejected
+    bytes constant VECTOR_EOA_SIG_HIGH_S =
+        hex"661c107c0704e2d9b1dce709755e5a6aba10728e221c0db335d4276e635e8b4bee32506e6ac1bdbb8ff98c1d8f13ca89b1fd3f5c7c65558ad22bc2b2373c35f91c";
+    // Smart Account: charlie registers with signer = bob, bob signs for charlie
+    bytes32 constant VECTOR_SA_DIGEST = 0x621eb2683b46c46260027972090fcec80715405736e0e1a9534e0e9497b85648;
+    bytes constant VECTOR_SA_SIG =
+        hex"ed810a2218d503c0ba8c363e0ce43a1d90196cd570068786c549683029bc9a2f17f13afe80d30310a24e73cf8cc3588cb1d84ea7f17fbb802a04d1afb0112b401c";
+
+    function _vectorAgent() internal returns (PactumAgent v) {
+        vm.chainId(VECTOR_CHAIN_ID);
+        deployCodeTo("PactumAgent.sol:PactumAgent", VECTOR_CONTRACT);
+        v = PactumAgent(VECTOR_CONTRACT);
+    }
+
+    function _digest(PactumAgent v, address wallet) internal view returns (bytes32) {
+        bytes32 structHash = keccak256(abi.encode(
+            v.AUTH_TYPEHASH(),
+            wallet,
+            keccak256("random-challenge"),
+            VECTOR_TIMESTAMP
+        ));
+        return keccak256(abi.encodePacked("\x19\x01", v.DOMAIN_SEPARATOR(), structHash));
+    }
+
+    function test_verifyEIP712_vectors_domain() public {
+        PactumAgent v = _vectorAgent();
+        assertEq(v.AUTH_TYPEHASH(), VECTOR_AUTH_TYPEHASH);
+        assertEq(v.DOMAIN_SEPARATOR(), VECTOR_DOMAIN_SEPARATOR);
+    }
+
+    function test_verifyEIP712_vectors_eoa() public {
+        PactumAgent v = _vectorAgent();
+        vm.prank(alice);
+        v.registerAgent(keccak256("card1"), address(0));
+
+        bytes32 digest = _digest(v, alice);
+        assertEq(digest, VECTOR_EOA_DIGEST);
+        (uint8 sv, bytes32 r, bytes32 s) = vm.sign(aliceKey, digest);
+        assertEq(abi.encodePacked(r, s, sv), VECTOR_EOA_SIG);
+
+        assertTrue(v.verifyEIP712(alice, keccak256("random-challenge"), VECTOR_TIMESTAMP, VECTOR_EOA_SIG));
+        assertFalse(v.verifyEIP712(alice, keccak256("random-challenge"), VECTOR_TIMESTAMP + 1, VECTOR_EOA_SIG));
+    }
+
+    function test_verifyEIP712_vectors_smartAccount() public {
+        PactumAgent v = _vectorAgent();
+        vm.prank(charlie);
+        v.registerAgent(keccak256("card1"), bob);
+
+        bytes32 digest = _digest(v, charlie);
+        assertEq(digest, VECTOR_SA_DIGEST);
+        (uint8 sv, bytes32 r, bytes32 s) = vm.sign(bobKey, digest);
+        assertEq(abi.encodePacked(r, s, sv), VECTOR_SA_SIG);
+
+        assertTrue(v.verifyEIP712(charlie, keccak256("random-challenge"), VECTOR_TIMESTAMP, VECTOR_SA_SIG));
+    }
+
+    function test_verifyEIP712_vectors_highS_reverts() public {
+        PactumAgent v = _vectorAgent();
+        vm.prank(alice);
+        v.registerAgent(keccak256("card1"), address(0));
+
+        vm.expectRevert();
+        v.verifyEIP712(alice, keccak256("random-challenge"), VECTOR_TIMESTAMP, VECTOR_EOA_SIG_HIGH_S);
+    }
+
     // ----------------------------------------------------------------
     // ERC-721 metadata
     // ----------------------------------------------------------------
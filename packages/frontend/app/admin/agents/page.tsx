@@ -20,21 +20,30 @@ function shortWallet(w: string) {
 export default function AdminAgentsPage() {
   const [agents, setAgents] = useState<Agent[]>([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
 
   useEffect(() => {
     adminApi.getAgents()
-      .then((d) => setAgents(d.agents))
+      .then((d) => { setAgents(d.agents); setNextCursor(d.next_cursor) })
       .catch(() => {})
       .finally(() => setLoading(false))
   }, [])
 
+  async function loadMore() {
+    if (!nextCursor) return
+    const d = await adminApi.getAgents(nextCursor).catch(() => null)
+    if (!d) return
+    setAgents((prev) => [...prev, ...d.agents])
+    setNextCursor(d.next_cursor)
+  }
+
   if (loading) return <p className="text-muted-foreground">Loading...</p>
 
   return (
     <div className="max-w-6xl mx-auto space-y-6">
       <div className="flex justify-between items-center">
         <h1 className="text-3xl font-bold">Agents</h1>
-        <span className="text-muted-foreground text-sm">{agents.length} total</span>
+        <span className="text-muted-foreground text-sm">{agents.length} shown</span>
       </div>
 
       <Card>
@@ -69,6 +78,17 @@ export default function AdminAgentsPage() {
           </div>
         </CardContent>
       </Card>
+
+      {!loading && nextCursor && (
+        <div className="flex justify-center">
+          <button
+            onClick={loadMore}
+            className="px-3 py-1.5 rounded-md text-sm text-muted-foreground hover:text-foreground hover:bg-muted transition-colors"
+          >
+            Load more
+          </button>
+        </div>
+      )}
     </div>
   )
 }
@@ -28,15 +28,24 @@ export default function AdminItemsPage() {
   const [items, setItems] = useState<Item[]>([])
   const [tab, setTab] = useState('all')
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
 
   useEffect(() => {
     setLoading(true)
     adminApi.getItems(tab === 'all' ? undefined : tab)
-      .then((d) => setItems(d.items))
+      .then((d) => { setItems(d.items); setNextCursor(d.next_cursor) })
       .catch(() => {})
       .finally(() => setLoading(false))
   }, [tab])
 
+  async function loadMore() {
+    if (!nextCursor) return
+    const d = await adminApi.getItems(tab === 'all' ? undefined : tab, nextCursor).catch(() => null)
+    if (!d) return
+    setItems((prev) => [...prev, ...d.items])
+    setNextCursor(d.next_cursor)
+  }
+
   return (
     <div className="max-w-6xl mx-auto space-y-6">
       <div className="flex justify-between items-center">
@@ -110,6 +119,17 @@ export default function AdminItemsPage() {
           </CardContent>
         </Card>
       )}
+
+      {!loading && nextCursor && (
+        <div className="flex justify-center">
+          <button
+            onClick={loadMore}
+            className="px-3 py-1.5 rounded-md text-sm text-muted-foreground hover:text-foreground hover:bg-muted transition-colors"
+          >
+            Load more
+          </button>
+        </div>
+      )}
     </div>
   )
 }
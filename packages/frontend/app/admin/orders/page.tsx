@@ -53,15 +53,24 @@ export default function AdminOrdersPage() {
   const [expanded, setExpanded] = useState<string | null>(null)
   const [detail, setDetail] = useState<OrderDetail | null>(null)
   const [detailLoading, setDetailLoading] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
 
   useEffect(() => {
     setLoading(true)
     adminApi.getOrders(tab === 'all' ? undefined : tab)
-      .then((d) => setOrders(d.orders))
+      .then((d) => { setOrders(d.orders); setNextCursor(d.next_cursor) })
       .catch(() => {})
       .finally(() => setLoading(false))
   }, [tab])
 
+  async function loadMore() {
+    if (!nextCursor) return
+    const d = await adminApi.getOrders(tab === 'all' ? undefined : tab, nextCursor).catch(() => null)
+    if (!d) return
+    setOrders((prev) => [...prev, ...d.orders])
+    setNextCursor(d.next_cursor)
+  }
+
   async function toggleExpand(orderId: string) {
     if (expanded === orderId) {
       setExpanded(null)
@@ -210,6 +219,17 @@ export default function AdminOrdersPage() {
           ))}
         </div>
       )}
+
+      {!loading && nextCursor && (
+        <div className="flex justify-center">
+          <button
+            onClick={loadMore}
+            className="px-3 py-1.5 rounded-md text-sm text-muted-foreground hover:text-foreground hover:bg-muted transition-colors"
+          >
+            Load more
+          </button>
+        </div>
+      )}
     </div>
   )
 }
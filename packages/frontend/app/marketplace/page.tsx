@@ -4,6 +4,7 @@ import { useState, useEffect } from 'react'
 import { Header } from '@/components/layout/Header'
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card'
 import { Badge } from '@/components/ui/badge'
+import { Button } from '@/components/ui/button'
 import Link from 'next/link'
 import { api } from '@/lib/api'
 import type { AgentWithItems } from '@/lib/api'
@@ -12,17 +13,36 @@ function shortAddr(addr: string) {
   return `${addr.slice(0, 6)}...${addr.slice(-4)}`
 }
 
+const PAGE_SIZE = 24
+
 export default function MarketplacePage() {
   const [agents, setAgents] = useState<AgentWithItems[]>([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
-    api.getAgents()
-      .then(data => setAgents(data.agents || []))
+    api.getAgents(PAGE_SIZE)
+      .then(data => {
+        setAgents(data.agents || [])
+        setNextCursor(data.next_cursor ?? null)
+      })
       .catch(() => setAgents([]))
       .finally(() => setLoading(false))
   }, [])
 
+  const loadMore = () => {
+    if (!nextCursor || loadingMore) return
+    setLoadingMore(true)
+    api.getAgents(PAGE_SIZE, nextCursor)
+      .then(data => {
+        setAgents(prev => [...prev, ...(data.agents || [])])
+        setNextCursor(data.next_cursor ?? null)
+      })
+      .catch(() => setNextCursor(null))
+      .finally(() => setLoadingMore(false))
+  }
+
   const activeAgents = agents.filter(a => a.items && a.items.length > 0)
 
   return (
@@ -34,7 +54,7 @@ export default function MarketplacePage() {
           <div className="space-y-2">
             <h1 className="text-4xl font-bold">Marketplace</h1>
             <p className="text-muted-foreground">
-              {agents.length} seller{agents.length !== 1 ? 's' : ''} registered
+              {agents.length}{nextCursor ? '+' : ''} seller{agents.length !== 1 ? 's' : ''} registered
             </p>
           </div>
 
@@ -95,6 +115,13 @@ export default function MarketplacePage() {
                   </CardContent>
                 </Card>
               ))}
+              {nextCursor && (
+                <div className="flex justify-center">
+                  <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                    {loadingMore ? 'Loading...' : 'Load more sellers'}
+                  </Button>
+                </div>
+              )}
             </div>
           ) : (
             <Card>
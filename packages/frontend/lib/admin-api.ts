@@ -54,6 +54,14 @@ async function adminFetch(path: string, init?: RequestInit) {
   return res.json()
 }
 
+function pageQuery(status?: string, cursor?: string) {
+  const params = new URLSearchParams()
+  if (status) params.set('status', status)
+  if (cursor) params.set('cursor', cursor)
+  const qs = params.toString()
+  return qs ? `?${qs}` : ''
+}
+
 export const adminApi = {
   async sendCode(email: string) {
     return adminFetch('/auth/send-code', {
@@ -77,18 +85,16 @@ export const adminApi = {
     return adminFetch('/overview')
   },
 
-  async getAgents() {
-    return adminFetch('/agents')
+  async getAgents(cursor?: string) {
+    return adminFetch(`/agents${pageQuery(undefined, cursor)}`)
   },
 
-  async getItems(status?: string) {
-    const params = status ? `?status=${status}` : ''
-    return adminFetch(`/items${params}`)
+  async getItems(status?: string, cursor?: string) {
+    return adminFetch(`/items${pageQuery(status, cursor)}`)
   },
 
-  async getOrders(status?: string) {
-    const params = status ? `?status=${status}` : ''
-    return adminFetch(`/orders${params}`)
+  async getOrders(status?: string, cursor?: string) {
+    return adminFetch(`/orders${pageQuery(status, cursor)}`)
   },
 
   async getOrderDetail(orderId: string) {
@@ -206,9 +206,16 @@ export const api = {
     return res.json()
   },
 
-  // List all agents with their items (no auth needed)
-  async getAgents(): Promise<{ agents: AgentWithItems[]; count: number }> {
-    const res = await fetch(`${API_URL}/market/agents`)
+  // List agents with their active items, one page at a time (no auth needed)
+  async getAgents(
+    limit?: number,
+    cursor?: string | null,
+  ): Promise<{ agents: AgentWithItems[]; count: number; next_cursor: string | null }> {
+    const params = new URLSearchParams()
+    if (limit !== undefined) params.set('limit', String(limit))
+    if (cursor) params.set('cursor', cursor)
+
+    const res = await fetch(`${API_URL}/market/agents?${params}`)
     if (!res.ok) throw new Error('Failed to fetch agents')
     return res.json()
   },
@@ -217,10 +224,14 @@ export const api = {
   async searchItems(
     query?: string,
     maxPrice?: number,
-  ): Promise<{ items: Item[]; count: number }> {
+    limit?: number,
+    cursor?: string | null,
+  ): Promise<{ items: Item[]; count: number; next_cursor: string | null }> {
     const params = new URLSearchParams()
     if (query) params.set('q', query)
     if (maxPrice !== undefined) params.set('max_price', String(maxPrice))
+    if (limit !== undefined) params.set('limit', String(limit))
+    if (cursor) params.set('cursor', cursor)
 
     const res = await fetch(`${API_URL}/market/items?${params}`)
     if (!res.ok) throw new Error('Search failed')
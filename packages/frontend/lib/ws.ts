@@ -4,6 +4,10 @@ const WS_URL = (process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000')
   .replace(/^http/, 'ws')
   .replace(/^https/, 'wss')
 
+// Batch acks for replayed offline events (server accepts up to 500 ids per ack)
+const ACK_BATCH_MAX = 500
+const ACK_DELAY_MS = 200
+
 export interface WsMessage {
   type: string
   [key: string]: unknown
@@ -19,6 +23,9 @@ class PactumWsManager {
   private handlers: Set<WsEventHandler> = new Set()
   private reconnectDelay = 2000
   private stopped = false
+  // Offline events replayed by the server carry event_id; they stay queued server-side until acked
+  private pendingAcks: string[] = []
+  private ackTimeout: ReturnType<typeof setTimeout> | null = null
 
   connect(token: string) {
     this.token = token
@@ -70,7 +77,12 @@ class PactumWsManager {
     ws.onmessage = (event) => {
       try {
         const msg = JSON.parse(event.data) as WsMessage
+        if (msg.type === 'heartbeat') {
+          ws.send(JSON.stringify({ type: 'pong' }))
+          return
+        }
         this.handlers.forEach(h => h(msg))
+        if (typeof msg.event_id === 'string') this._queueAck(msg.event_id)
       } catch {
         // ignore parse errors
       }
@@ -91,6 +103,26 @@ class PactumWsManager {
     }
   }
 
+  private _queueAck(eventId: string) {
+    this.pendingAcks.push(eventId)
+    if (this.pendingAcks.length >= ACK_BATCH_MAX) {
+      this._flushAcks()
+    } else if (!this.ackTimeout) {
+      this.ackTimeout = setTimeout(() => this._flushAcks(), ACK_DELAY_MS)
+    }
+  }
+
+  private _flushAcks() {
+    if (this.ackTimeout) {
+      clearTimeout(this.ackTimeout)
+      this.ackTimeout = null
+    }
+    if (!this.pendingAcks.length || this.ws?.readyState !== WebSocket.OPEN) return
+    const eventIds = this.pendingAcks.splice(0, ACK_BATCH_MAX)
+    this.ws.send(JSON.stringify({ id: 'ack', type: 'ack', event_ids: eventIds }))
+    if (this.pendingAcks.length) this._flushAcks()
+  }
+
   private _clearTimers() {
     if (this.pingInterval) {
       clearInterval(this.pingInterval)
@@ -100,6 +132,12 @@ class PactumWsManager {
       clearTimeout(this.reconnectTimeout)
       this.reconnectTimeout = null
     }
+    if (this.ackTimeout) {
+      clearTimeout(this.ackTimeout)
+      this.ackTimeout = null
+    }
+    // Unsent acks are dropped; the server re-sends those events on the next connect
+    this.pendingAcks = []
   }
 }
 
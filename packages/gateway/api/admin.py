@@ -10,30 +10,24 @@ from typing import Optional
 import bcrypt
 import jwt
 import resend
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from config import (
     JWT_SECRET, JWT_ALGORITHM, RESEND_API_KEY, ADMIN_FROM_EMAIL,
-    SUPABASE_URL, SUPABASE_KEY,
 )
+from db.client import get_supabase
+from market.pagination import apply_keyset, split_page
 
 logger = logging.getLogger("pactum-admin")
 
 admin_router = APIRouter(prefix="/admin", tags=["admin"])
 security = HTTPBearer(auto_error=False)
 
-# ========== Supabase client (lazy init) ==========
-
-_supabase = None
-
+# ========== Supabase client (共享异步单例) ==========
 
 def _sb():
-    global _supabase
-    if _supabase is None:
-        from supabase import create_client
-        _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    return _supabase
+    return get_supabase()
 
 
 # ========== Verification codes (in-memory, 5min TTL) ==========
@@ -89,7 +83,7 @@ async def send_code(request: Request):
         raise HTTPException(status_code=400, detail="email required")
 
     # Check admin exists
-    result = _sb().table("admin_users").select("id").eq("email", email).execute()
+    result = await _sb().table("admin_users").select("id").eq("email", email).execute()
     if not result.data:
         raise HTTPException(status_code=403, detail="Not an admin")
 
@@ -136,7 +130,7 @@ async def admin_login(request: Request):
         raise HTTPException(status_code=401, detail="Invalid code")
 
     # Verify password
-    result = _sb().table("admin_users").select("password_hash").eq("email", email).execute()
+    result = await _sb().table("admin_users").select("password_hash").eq("email", email).execute()
     if not result.data:
         raise HTTPException(status_code=403, detail="Not an admin")
 
@@ -156,21 +150,17 @@ async def admin_login(request: Request):
 async def overview(admin: dict = Depends(require_admin)):
     sb = _sb()
 
-    agents = sb.table("agents").select("wallet", count="exact").execute()
-    items = sb.table("items").select("item_id", count="exact").execute()
-    orders = sb.table("orders").select("order_id, status, amount", count="exact").execute()
-
-    # Status counts + total volume
-    status_counts: dict[str, int] = {}
-    total_volume = 0.0
-    for o in (orders.data or []):
-        s = o.get("status", "unknown")
-        status_counts[s] = status_counts.get(s, 0) + 1
-        if s in ("paid", "processing", "delivered", "completed"):
-            total_volume += float(o.get("amount", 0))
+    # 计数 / 状态分布 / 成交额来自触发器维护的 market_rollup（按 metric 汇总各 shard），不扫 orders
+    rollup = await sb.table("market_rollup").select("metric, value").execute()
+    metrics: dict[str, float] = {}
+    for r in rollup.data or []:
+        metrics[r["metric"]] = metrics.get(r["metric"], 0.0) + float(r["value"])
+    status_counts = {
+        m.split(":", 1)[1]: int(v) for m, v in metrics.items() if m.startswith("status:") and v
+    }
 
     # Recent 5 orders
-    recent = (
+    recent = await (
         sb.table("orders")
         .select("order_id, item_id, buyer_wallet, seller_wallet, amount, status, created_at, items(name)")
         .order("created_at", desc=True)
@@ -179,56 +169,69 @@ async def overview(admin: dict = Depends(require_admin)):
     )
 
     return {
-        "agents": agents.count or 0,
-        "items": items.count or 0,
-        "orders": orders.count or 0,
-        "total_volume": round(total_volume, 2),
+        "agents": int(metrics.get("sellers", 0)),
+        "items": int(metrics.get("items", 0)),
+        "orders": int(metrics.get("orders", 0)),
+        "total_volume": round(metrics.get("volume", 0), 2),
         "status_counts": status_counts,
         "recent_orders": recent.data or [],
     }
 
 
 @admin_router.get("/agents")
-async def list_agents(admin: dict = Depends(require_admin)):
-    result = (
+async def list_agents(
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    admin: dict = Depends(require_admin),
+):
+    qb = (
         _sb().table("agents")
         .select("wallet, description, avg_rating, total_reviews, telegram_user_id, registered_at")
-        .order("registered_at", desc=True)
-        .execute()
     )
-    return {"agents": result.data or [], "count": len(result.data or [])}
+    return await _page(qb, "agents", limit, cursor, "registered_at", "wallet")
 
 
 @admin_router.get("/items")
-async def list_items(status: Optional[str] = None, admin: dict = Depends(require_admin)):
-    qb = (
-        _sb().table("items")
-        .select("*, agents(wallet, description)")
-        .order("created_at", desc=True)
-    )
+async def list_items(
+    status: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    admin: dict = Depends(require_admin),
+):
+    qb = _sb().table("items").select("*, agents(wallet, description)")
     if status:
         qb = qb.eq("status", status)
-    result = qb.execute()
-    return {"items": result.data or [], "count": len(result.data or [])}
+    return await _page(qb, "items", limit, cursor, "created_at", "item_id")
 
 
 @admin_router.get("/orders")
-async def list_orders(status: Optional[str] = None, admin: dict = Depends(require_admin)):
-    qb = (
-        _sb().table("orders")
-        .select("*, items(name)")
-        .order("created_at", desc=True)
-    )
+async def list_orders(
+    status: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    admin: dict = Depends(require_admin),
+):
+    qb = _sb().table("orders").select("*, items(name)")
     if status:
         qb = qb.eq("status", status)
-    result = qb.execute()
-    return {"orders": result.data or [], "count": len(result.data or [])}
+    return await _page(qb, "orders", limit, cursor, "created_at", "order_id")
+
+
+async def _page(qb, key: str, limit: int, cursor: Optional[str], ts_col: str, id_col: str) -> dict:
+    """倒序 keyset 分页，返回 {key: rows, count, next_cursor}"""
+    try:
+        qb = apply_keyset(qb, cursor, limit, ts_col=ts_col, id_col=id_col)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await qb.execute()
+    rows, next_cursor = split_page(result.data or [], limit, ts_col, id_col)
+    return {key: rows, "count": len(rows), "next_cursor": next_cursor}
 
 
 @admin_router.get("/orders/{order_id}")
 async def get_order_detail(order_id: str, admin: dict = Depends(require_admin)):
     sb = _sb()
-    order_result = (
+    order_result = await (
         sb.table("orders")
         .select("*, items(name, type, endpoint, price)")
         .eq("order_id", order_id)
@@ -237,11 +240,12 @@ async def get_order_detail(order_id: str, admin: dict = Depends(require_admin)):
     if not order_result.data:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    messages_result = (
+    messages_result = await (
         sb.table("messages")
         .select("*")
         .eq("order_id", order_id)
         .order("created_at", desc=False)
+        .limit(500)
         .execute()
     )
 
@@ -1,31 +1,42 @@
 """
 REST API 端点 — 前端 + 外部集成
 """
+import asyncio
 import json
+import time
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Optional
 
 from fastapi import APIRouter, Request, HTTPException, Depends, Query, UploadFile, File, Form
-from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, HTMLResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, HTMLResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from config import PROTOCOL_VERSION, PUBLIC_URL, ESCROW_CONTRACT_ADDRESS, USDC_CONTRACT_ADDRESS, PAYMASTER_URL
+from config import EVENTS_WAIT_MAX, EVENTS_LONGPOLL_RECHECK, SSE_HEARTBEAT_INTERVAL, SSE_OVERLAP
 from market import auth
+from market.principal import Principal
+from net.http import http_pool_stats
+from net.sse import SSE_HEADERS, sse_event, sse_comment
+from market.pagination import encode_cursor, decode_cursor
 from market.models import AuthVerifyRequest, RegisterRequest, RegisterSellerRequest, BuyRequest, ListItemRequest, UpdateAddressRequest
-from tg.notify import send_notification as _tg_notify
+from tg.notify import queue_stats as tg_queue_stats
 
 router = APIRouter()
 security = HTTPBearer(auto_error=False)
 
 _market = None
 _manager = None
+_escrow_indexer = None
+_auto_confirmer = None
 
 
-def init(market, manager=None):
-    global _market, _manager
+def init(market, manager=None, escrow_indexer=None, auto_confirmer=None):
+    global _market, _manager, _escrow_indexer, _auto_confirmer
     _market = market
     _manager = manager
+    _escrow_indexer = escrow_indexer
+    _auto_confirmer = auto_confirmer
 
 
 def _err(status_code: int, error: str, **extra) -> JSONResponse:
@@ -33,9 +44,11 @@ def _err(status_code: int, error: str, **extra) -> JSONResponse:
     return JSONResponse(status_code=status_code, content=body)
 
 
-async def get_current_wallet(
+async def get_principal(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-) -> str:
+) -> Principal:
+    """请求级身份：每个请求只解一次 JWT（FastAPI 在同一请求内复用依赖结果）"""
     if not credentials:
         raise HTTPException(
             status_code=401,
@@ -46,7 +59,7 @@ async def get_current_wallet(
             }),
         )
     try:
-        return auth.get_wallet_from_token(credentials.credentials)
+        claims = auth.decode_token(credentials.credentials)
     except ValueError as e:
         raise HTTPException(
             status_code=401,
@@ -56,16 +69,20 @@ async def get_current_wallet(
                 "message": str(e),
             }),
         )
+    principal = Principal(wallet=claims["wallet"].lower(), claims=claims)
+    request.state.principal = principal
+    return principal
 
 
-def _check_registered(wallet: str):
-    agent = (
-        _market.supabase.table("agents")
-        .select("wallet")
-        .eq("wallet", wallet.lower())
-        .execute()
-    )
-    if not agent.data:
+async def get_current_wallet(principal: Principal = Depends(get_principal)) -> str:
+    return principal.wallet
+
+
+async def get_registered_wallet(principal: Principal = Depends(get_principal)) -> str:
+    """已认证 + 已注册（agents 表）；注册状态走 principal_cache"""
+    if principal.registered is None:
+        principal.registered = await _market.is_registered(principal.wallet)
+    if not principal.registered:
         raise HTTPException(status_code=403, detail=json.dumps({
             "protocol_version": PROTOCOL_VERSION,
             "error": "NOT_REGISTERED",
@@ -75,6 +92,7 @@ def _check_registered(wallet: str):
                 "required": ["wallet"],
             },
         }))
+    return principal.wallet
 
 
 # ========== GET /market — 协议文档 ==========
@@ -130,7 +148,11 @@ async def auth_wallet(request: Request):
     if not api_key:
         return _err(400, "MISSING_API_KEY", message="api_key required")
     try:
-        result = await auth.authenticate_wallet_user(api_key, contract=_market.contract if _market else None)
+        result = await auth.authenticate_wallet_user(
+            api_key,
+            contract=_market.contract if _market else None,
+            reader=_market.reader if _market else None,
+        )
         wallet = result["wallet"]
 
         return {
@@ -162,7 +184,7 @@ async def verify_token(request: Request):
 
 @router.post("/market/auth/challenge")
 async def auth_challenge():
-    result = auth.create_challenge(_market.supabase)
+    result = await auth.create_challenge(_market.supabase)
     return {"protocol_version": PROTOCOL_VERSION, **result}
 
 
@@ -171,9 +193,9 @@ async def auth_challenge():
 @router.post("/market/auth/verify")
 async def auth_verify(req: AuthVerifyRequest):
     try:
-        token = auth.verify_challenge(
+        token = await auth.verify_challenge(
             supabase=_market.supabase,
-            contract=_market.contract,
+            verifier=_market.auth_verifier,
             wallet=req.wallet,
             challenge=req.challenge,
             timestamp=req.timestamp,
@@ -240,7 +262,7 @@ async def register_seller(req: RegisterSellerRequest, request: Request,
         )
 
         # 注册成功后重新签发含 token_id 的 JWT
-        token_id = auth._get_token_id(_market.contract, wallet)
+        token_id = await auth._get_token_id(_market.contract, wallet, _market.reader)
         new_token = auth._build_token(wallet, token_id=token_id, api_key=api_key)
 
         return {
@@ -259,47 +281,138 @@ async def register_seller(req: RegisterSellerRequest, request: Request,
 # ========== GET /market/events — 拉取未读事件 ==========
 
 @router.get("/market/events")
-async def get_events(wallet: str = Depends(get_current_wallet)):
-    events = await _market.get_events(wallet)
-    return {"events": events, "count": len(events)}
+async def get_events(
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    wait: float = Query(default=0, ge=0, le=EVENTS_WAIT_MAX),
+    wallet: str = Depends(get_current_wallet),
+):
+    """wait>0 时长轮询：没有事件就挂起，直到有新事件或 wait 秒后返回空页"""
+    try:
+        seq = _manager.event_seq(wallet) if _manager else 0
+        page = await _market.get_events(wallet, cursor=cursor, limit=limit)
+        deadline = time.monotonic() + wait
+        while wait and _manager and not page["events"]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not await _manager.wait_event(wallet, seq, min(remaining, EVENTS_LONGPOLL_RECHECK)):
+                break  # 挂起数已满，按普通拉取返回
+            seq = _manager.event_seq(wallet)
+            page = await _market.get_events(wallet, cursor=cursor, limit=limit)
+    except ValueError as e:
+        return _err(400, "INVALID_REQUEST", message=str(e))
+    return {**page, "count": len(page["events"])}
+
+
+# ========== GET /market/events/stream — SSE 推送 ==========
+
+@router.get("/market/events/stream")
+async def stream_events(
+    request: Request,
+    last_event_id: Optional[str] = Query(default=None, alias="last_event_id"),
+    wallet: str = Depends(get_current_wallet),
+):
+    """
+    Server-Sent Events：payload 与 WS 推送相同，id 是 keyset cursor。
+    重连带 Last-Event-ID 头（或 ?last_event_id=）从断点续传；不带则从最早的未送达事件开始。
+    发出即标记 delivered，空闲时每 SSE_HEARTBEAT_INTERVAL 秒发一行注释心跳。
+    每轮还回看 cursor 之前 SSE_OVERLAP 秒内仍未送达的事件（晚提交的行），以当前 cursor 作为 id 补发，cursor 不回退
+    """
+    cursor = request.headers.get("last-event-id") or last_event_id
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            return _err(400, "INVALID_REQUEST", message="Invalid Last-Event-ID")
+
+    async def gen():
+        nonlocal cursor
+        yield "retry: 3000\n\n"
+        last_write = time.monotonic()
+        while not await request.is_disconnected():
+            seq = _manager.event_seq(wallet) if _manager else 0
+            events, more = await _market.fetch_events(wallet, cursor, 100, include_delivered=cursor is not None)
+            for event in events:
+                cursor = encode_cursor(event["created_at"], event["event_id"])
+                yield sse_event(
+                    {**event["payload"], "event_id": event["event_id"]},
+                    event_id=cursor,
+                    event=event["event_type"],
+                )
+            if cursor:
+                late = await _market.fetch_late_events(wallet, cursor, SSE_OVERLAP)
+                for event in late:
+                    yield sse_event(
+                        {**event["payload"], "event_id": event["event_id"]},
+                        event_id=cursor,
+                        event=event["event_type"],
+                    )
+                events = events + late
+            if events:
+                last_write = time.monotonic()
+                await _market.ack_events(wallet, [e["event_id"] for e in events])
+            if more:
+                continue
+            timeout = min(SSE_HEARTBEAT_INTERVAL, EVENTS_LONGPOLL_RECHECK)
+            if not _manager or not await _manager.wait_event(wallet, seq, timeout):
+                await asyncio.sleep(timeout)  # 挂起数已满，退化成定时回查
+            if time.monotonic() - last_write >= SSE_HEARTBEAT_INTERVAL:
+                last_write = time.monotonic()
+                yield sse_comment()
+
+    return StreamingResponse(gen(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 
 # ========== GET /market/agents — 公开卖家列表 ==========
 
 @router.get("/market/agents")
-async def list_agents():
-    agents = await _market.list_agents()
-    return {"agents": agents, "count": len(agents)}
+async def list_agents(
+    limit: int = Query(default=50, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    try:
+        page = await _market.list_agents(limit=limit, cursor=cursor)
+    except ValueError as e:
+        return _err(400, "INVALID_REQUEST", message=str(e))
+    return {"agents": page["agents"], "count": len(page["agents"]), "next_cursor": page["next_cursor"]}
 
 
 # ========== GET /market/items — 搜索商品 ==========
 
 @router.get("/market/items")
-async def search_items(q: str = "", max_price: Optional[float] = None):
-    items = await _market.search_items(query=q, max_price=max_price)
-    return {"items": items, "count": len(items)}
+async def search_items(
+    q: str = Query(default="", max_length=200),
+    max_price: Optional[float] = None,
+    min_price: Optional[float] = None,
+    item_type: Optional[str] = Query(default=None, alias="type"),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    try:
+        page = await _market.search_items(
+            query=q, max_price=max_price, min_price=min_price,
+            item_type=item_type, limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        return _err(400, "INVALID_REQUEST", message=str(e))
+    return {"items": page["items"], "count": len(page["items"]), "next_cursor": page["next_cursor"]}
 
 
 # ========== GET /market/items/{item_id} — 商品详情 ==========
 
 @router.get("/market/items/{item_id}")
 async def get_item(item_id: str):
-    result = (
-        _market.supabase.table("items")
-        .select("*, agents!inner(wallet, description, avg_rating, total_reviews)")
-        .eq("item_id", item_id)
-        .execute()
-    )
-    if not result.data:
+    item = await _market.get_item(item_id)
+    if not item:
         return _err(404, "NOT_FOUND", message=f"Item {item_id} not found")
-    return result.data[0]
+    return item
 
 
 # ========== POST /market/items — 上架商品 ==========
 
 @router.post("/market/items")
-async def list_item(req: ListItemRequest, wallet: str = Depends(get_current_wallet)):
-    _check_registered(wallet)
+async def list_item(req: ListItemRequest, wallet: str = Depends(get_registered_wallet)):
     try:
         item = await _market.list_item(
             wallet=wallet,
@@ -318,8 +431,7 @@ async def list_item(req: ListItemRequest, wallet: str = Depends(get_current_wall
 # ========== PATCH /market/items/{item_id} — 更新商品 ==========
 
 @router.patch("/market/items/{item_id}")
-async def update_item(item_id: str, request: Request, wallet: str = Depends(get_current_wallet)):
-    _check_registered(wallet)
+async def update_item(item_id: str, request: Request, wallet: str = Depends(get_registered_wallet)):
     body = await request.json()
     try:
         item = await _market.update_item(
@@ -344,8 +456,7 @@ async def update_item(item_id: str, request: Request, wallet: str = Depends(get_
 # ========== PUT /market/address — 保存/更新买家默认地址 ==========
 
 @router.put("/market/address")
-async def update_address(req: UpdateAddressRequest, wallet: str = Depends(get_current_wallet)):
-    _check_registered(wallet)
+async def update_address(req: UpdateAddressRequest, wallet: str = Depends(get_registered_wallet)):
     try:
         address = await _market.update_shipping_address(wallet, req.address.model_dump())
         return {"address": address}
@@ -364,8 +475,7 @@ async def get_address(wallet: str = Depends(get_current_wallet)):
 # ========== POST /market/buy/{item_id} — 下单（402 flow） ==========
 
 @router.post("/market/buy/{item_id}")
-async def buy(item_id: str, req: BuyRequest, request: Request, wallet: str = Depends(get_current_wallet)):
-    _check_registered(wallet)
+async def buy(item_id: str, req: BuyRequest, request: Request, wallet: str = Depends(get_registered_wallet)):
 
     payment_proof = request.headers.get("X-Payment-Proof")
 
@@ -381,38 +491,7 @@ async def buy(item_id: str, req: BuyRequest, request: Request, wallet: str = Dep
             amount_units = int(amount_decimal * 1_000_000)
             expires = (datetime.now(timezone.utc) + timedelta(minutes=5)).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-            # 通过 WS 通知卖家
-            if _manager:
-                order = result["order"]
-                from ws import protocol as P
-                await _manager.send_to(order["seller_wallet"], {
-                    "type": P.ORDER_NEW,
-                    "order_id": order["order_id"],
-                    "item_id": order["item_id"],
-                    "buyer_wallet": order["buyer_wallet"],
-                    "amount": str(order["amount"]),
-                    "buyer_query": order.get("buyer_query"),
-                })
-
-            # Telegram 通知双方
-            order = result["order"]
-            item_row = (
-                _market.supabase.table("items")
-                .select("name")
-                .eq("item_id", order["item_id"])
-                .execute()
-            )
-            item_name = item_row.data[0]["name"] if item_row.data else "?"
-            tg_data = {
-                "order_id": order["order_id"],
-                "amount": str(order["amount"]),
-                "buyer_wallet": order["buyer_wallet"],
-                "item_name": item_name,
-                "buyer_query": order.get("buyer_query"),
-            }
-            await _tg_notify(order["seller_wallet"], "order_new", {**tg_data, "role": "seller"})
-            await _tg_notify(order["buyer_wallet"], "order_new", {**tg_data, "role": "buyer"})
-
+            # WS / Telegram 通知由 outbox 派发器异步完成
             return JSONResponse(
                 status_code=402,
                 content={
@@ -447,50 +526,7 @@ async def buy(item_id: str, req: BuyRequest, request: Request, wallet: str = Dep
                 tx_hash=payment_proof,
             )
 
-            # 通过 WS 通知卖家付款确认
-            if _manager:
-                order_data = (
-                    _market.supabase.table("orders")
-                    .select("*")
-                    .eq("order_id", order_id)
-                    .execute()
-                )
-                if order_data.data:
-                    from ws import protocol as P
-                    o = order_data.data[0]
-                    await _manager.send_to(o["seller_wallet"], {
-                        "type": P.PAYMENT_CONFIRMED,
-                        "order_id": o["order_id"],
-                        "buyer_wallet": o["buyer_wallet"],
-                        "tx_hash": payment_proof,
-                        "amount": str(o["amount"]),
-                    })
-
-            # Telegram 通知双方
-            order_data2 = (
-                _market.supabase.table("orders")
-                .select("*")
-                .eq("order_id", order_id)
-                .execute()
-            )
-            if order_data2.data:
-                o2 = order_data2.data[0]
-                tg_pay = {
-                    "order_id": o2["order_id"],
-                    "amount": str(o2["amount"]),
-                    "buyer_wallet": o2["buyer_wallet"],
-                    "tx_hash": payment_proof,
-                }
-                await _tg_notify(o2["seller_wallet"], "payment_confirmed", {**tg_pay, "role": "seller"})
-                await _tg_notify(o2["buyer_wallet"], "payment_confirmed", {**tg_pay, "role": "buyer"})
-
-            # 如果超时降级为 processing，额外通知买家
-            if result.get("status") == "processing" and order_data2.data:
-                o2 = order_data2.data[0]
-                await _tg_notify(o2["buyer_wallet"], "processing", {
-                    "order_id": o2["order_id"], "role": "buyer",
-                })
-
+            # WS / Telegram 通知由 outbox 派发器异步完成
             return {**result, "protocol_version": PROTOCOL_VERSION}
         except FileNotFoundError as e:
             return _err(404, "NOT_FOUND", message=str(e))
@@ -501,9 +537,17 @@ async def buy(item_id: str, req: BuyRequest, request: Request, wallet: str = Dep
 # ========== GET /market/orders — 我的订单 ==========
 
 @router.get("/market/orders")
-async def my_orders(wallet: str = Depends(get_current_wallet)):
-    orders = await _market.get_wallet_orders(wallet)
-    return {"orders": orders, "count": len(orders)}
+async def my_orders(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    role: Optional[str] = Query(default=None, pattern="^(buyer|seller)$"),
+    wallet: str = Depends(get_current_wallet),
+):
+    try:
+        page = await _market.get_wallet_orders(wallet, limit=limit, cursor=cursor, role=role)
+    except ValueError as e:
+        return _err(400, "INVALID_REQUEST", message=str(e))
+    return {"orders": page["orders"], "count": len(page["orders"]), "next_cursor": page["next_cursor"]}
 
 
 # ========== GET /market/orders/{order_id} — 订单详情 ==========
@@ -522,14 +566,21 @@ async def get_order(order_id: str, wallet: str = Depends(get_current_wallet)):
 # ========== GET /market/orders/{order_id}/messages — 订单消息历史 ==========
 
 @router.get("/market/orders/{order_id}/messages")
-async def get_order_messages(order_id: str, wallet: str = Depends(get_current_wallet)):
+async def get_order_messages(
+    order_id: str,
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    wallet: str = Depends(get_current_wallet),
+):
     try:
-        messages = await _market.get_order_messages(order_id, wallet)
-        return {"messages": messages, "count": len(messages)}
+        page = await _market.get_order_messages(order_id, wallet, limit=limit, cursor=cursor)
+        return {"messages": page["messages"], "count": len(page["messages"]), "next_cursor": page["next_cursor"]}
     except FileNotFoundError as e:
         return _err(404, "NOT_FOUND", message=str(e))
     except PermissionError as e:
         return _err(403, "FORBIDDEN", message=str(e))
+    except ValueError as e:
+        return _err(400, "INVALID_REQUEST", message=str(e))
 
 
 # ========== POST /market/orders/{order_id}/messages — 发消息 ==========
@@ -561,24 +612,7 @@ async def send_message(order_id: str, request: Request, wallet: str = Depends(ge
             direction=direction,
         )
 
-        # WS push（如果对方在线）
-        if _manager:
-            from ws import protocol as P
-            await _manager.send_to(to_wallet, {
-                "type": P.MESSAGE_RECEIVED,
-                "order_id": order_id,
-                "from_wallet": wallet,
-                "content": content,
-            })
-
-        # Telegram 通知
-        from tg.notify import send_notification as _tg
-        await _tg(to_wallet, "message_received", {
-            "order_id": order_id,
-            "from_wallet": wallet,
-            "content": content,
-        })
-
+        # WS / Telegram 通知由 outbox 派发器异步完成
         return {"message_id": result["message_id"], "to_wallet": to_wallet}
 
     except PermissionError as e:
@@ -608,24 +642,7 @@ async def deliver_order(order_id: str, request: Request, wallet: str = Depends(g
             file_url=file_url,
         )
 
-        # WS push（如果买家在线）
-        if _manager:
-            from ws import protocol as P
-            await _manager.send_to(result["buyer_wallet"], {
-                "type": P.DELIVERY,
-                "order_id": result["order_id"],
-                "seller_wallet": result["seller_wallet"],
-                "content": content,
-                "tracking": tracking,
-                "file_url": file_url,
-            })
-
-        # Telegram 通知双方
-        from tg.notify import send_notification as _tg
-        tg_data = {"order_id": result["order_id"], "item_name": result.get("item_name"), "content": content, "tracking": tracking, "file_url": file_url}
-        await _tg(result["buyer_wallet"],  "delivery", {**tg_data, "role": "buyer"})
-        await _tg(result["seller_wallet"], "delivery", {**tg_data, "role": "seller"})
-
+        # WS / agent_events / Telegram 通知由 outbox 派发器异步完成
         return result
 
     except PermissionError as e:
@@ -640,7 +657,7 @@ async def deliver_order(order_id: str, request: Request, wallet: str = Depends(g
 
 @router.get("/market/activity")
 async def get_activity(limit: int = Query(default=10, ge=1, le=50)):
-    result = (
+    result = await (
         _market.supabase.table("orders")
         .select("order_id, buyer_wallet, seller_wallet, amount, status, created_at, updated_at, items!inner(name, type)")
         .order("created_at", desc=True)
@@ -677,17 +694,38 @@ async def health():
     }
 
 
+@router.get("/metrics")
+async def metrics():
+    """运行时指标：HTTP 连接池、RPC 延迟、multicall、登录验签、目录缓存命中率、Telegram 通知队列、WS 出站队列、escrow 索引器、autoConfirm"""
+    return {
+        "http_pools": http_pool_stats(),
+        "rpc": _market.rpc.metrics.snapshot() if _market and _market.rpc else {},
+        "multicall": _market.reader.stats() if _market and _market.reader else {},
+        "auth": _market.auth_verifier.stats() if _market and _market.auth_verifier else {},
+        "catalog_cache": _market.catalog.stats() if _market else {},
+        "telegram_queue": tg_queue_stats(),
+        "ws": _manager.stats() if _manager else {},
+        "escrow_indexer": _escrow_indexer.stats() if _escrow_indexer else {},
+        "autoconfirm": _auto_confirmer.stats() if _auto_confirmer else {},
+    }
+
+
 @router.get("/market/stats")
 async def stats():
     result = await _market.get_stats()
     return {**result, "protocol_version": PROTOCOL_VERSION}
 
 
+@router.get("/market/agents/{wallet}/stats")
+async def seller_stats(wallet: str, days: int = Query(default=30, ge=1, le=365)):
+    """卖家销售统计：累计 + 最近 days 天按日"""
+    return await _market.get_seller_stats(wallet, days=days)
+
+
 # ========== POST /market/upload — 文件上传 ==========
 
 @router.post("/market/upload")
-async def upload_file(file: UploadFile = File(...), wallet: str = Depends(get_current_wallet)):
-    _check_registered(wallet)
+async def upload_file(file: UploadFile = File(...), wallet: str = Depends(get_registered_wallet)):
     from market.storage import upload_file as _upload, MAX_SIZE, ALLOWED_MIMES
 
     content_type = file.content_type or "application/octet-stream"
@@ -742,28 +780,7 @@ async def deliver_file(
             file_size=uploaded["size"],
         )
 
-        # WS push
-        if _manager:
-            from ws import protocol as P
-            await _manager.send_to(result["buyer_wallet"], {
-                "type": P.DELIVERY,
-                "order_id": result["order_id"],
-                "seller_wallet": result["seller_wallet"],
-                "content": content,
-                "file_url": download_url,
-            })
-
-        # Telegram 通知
-        tg_data = {
-            "order_id": result["order_id"],
-            "item_name": result.get("item_name"),
-            "content": content,
-            "file_url": download_url,
-            "role": "buyer",
-        }
-        await _tg_notify(result["buyer_wallet"], "delivery", tg_data)
-        await _tg_notify(result["seller_wallet"], "delivery", {**tg_data, "role": "seller"})
-
+        # WS / agent_events / Telegram 通知由 outbox 派发器异步完成
         return {**result, "file": uploaded, "download_url": download_url}
 
     except PermissionError as e:
@@ -823,7 +840,7 @@ async def download_page(order_id: str, token: str = Query(...)):
         return _err(403, "INVALID_TOKEN", message="Invalid download link")
 
     # 查订单（不做权限检查，token 就是凭证）
-    order_result = (
+    order_result = await (
         _market.supabase.table("orders")
         .select("*, items(name)")
         .eq("order_id", order_id)
@@ -842,7 +859,7 @@ async def download_page(order_id: str, token: str = Query(...)):
         return _err(404, "NO_FILE", message="No file attached to this order")
 
     # 每次访问生成新签名 URL
-    file_url = get_signed_url(_market.supabase, file_path)
+    file_url = await get_signed_url(_market.supabase, file_path)
     if not file_url:
         return _err(500, "SIGNED_URL_FAILED", message="Could not generate download URL")
 
@@ -891,7 +908,7 @@ async def get_order_file(order_id: str, wallet: str = Depends(get_current_wallet
             return _err(404, "NO_FILE", message="No file attached to this order")
 
         from market.storage import get_signed_url
-        url = get_signed_url(_market.supabase, file_path)
+        url = await get_signed_url(_market.supabase, file_path)
         if not url:
             return _err(500, "SIGNED_URL_FAILED", message="Could not generate download URL")
         return RedirectResponse(url=url, status_code=302)
@@ -903,6 +920,13 @@ async def get_order_file(order_id: str, wallet: str = Depends(get_current_wallet
 # ========== GET /market/my-items — 我的商品 ==========
 
 @router.get("/market/my-items")
-async def get_my_items(wallet: str = Depends(get_current_wallet)):
-    items = await _market.get_my_items(wallet)
-    return {"items": items, "count": len(items)}
+async def get_my_items(
+    limit: int = Query(default=50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    wallet: str = Depends(get_current_wallet),
+):
+    try:
+        page = await _market.get_my_items(wallet, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return _err(400, "INVALID_REQUEST", message=str(e))
+    return {"items": page["items"], "count": len(page["items"]), "next_cursor": page["next_cursor"]}
@@ -0,0 +1,230 @@
+"""
+AutoConfirm — 买家超过 CONFIRM_WINDOW 没有 confirm / dispute 的订单，由 operator 调 escrow.autoConfirm 放款
+- 到期队列在 autoconfirm_schedule 表里：orders 触发器在订单进入 paid（或索引器写入 deposited_at）时
+  排入 due_at = deposited_at + CONFIRM_WINDOW，离开可确认状态（completed / refunded / 链上 confirmed / disputed）时删除
+- 调度器睡到最早的 due_at（加随机抖动，最长 AUTOCONFIRM_MAX_SLEEP）再醒来；重启后先把已过期的全部补发
+- isConfirmable 走 Multicall3（自动分片），发送走 TxSubmitter（本地 nonce、连续广播、共享 receipt 轮询）
+- 发出后给该行一个租约（due_at 推后），上链失败 / 暂不可确认按指数退避重排
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Set
+
+from chain.escrow import order_key, OPEN_STATUSES
+from chain.rpc import ChainContract
+from chain.submitter import TxSubmitter
+from config import (
+    ESCROW_CONTRACT_ADDRESS, AUTOCONFIRM_BATCH, AUTOCONFIRM_JITTER, AUTOCONFIRM_MAX_SLEEP,
+    AUTOCONFIRM_RETRY_BASE, TX_RECEIPT_TIMEOUT,
+)
+
+logger = logging.getLogger("pactum.autoconfirm")
+
+ESCROW_ABI = [
+    {
+        "inputs": [{"name": "orderId", "type": "bytes32"}],
+        "name": "autoConfirm",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function",
+    },
+    {
+        "inputs": [{"name": "orderId", "type": "bytes32"}],
+        "name": "isConfirmable",
+        "outputs": [{"name": "", "type": "bool"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+RETRY_MAX = 3600  # 退避上限（秒）
+
+
+def _key_bytes(order_id: str) -> bytes:
+    return bytes.fromhex(order_key(order_id)[2:])
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_ts(value: str) -> datetime:
+    """orders 相关表是 TIMESTAMP（无时区，按 UTC 写入）"""
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+class AutoConfirmer:
+    def __init__(self, market, submitter: TxSubmitter):
+        self.supabase = market.supabase
+        self.submitter = submitter
+        self.escrow = ChainContract(market.rpc, ESCROW_CONTRACT_ADDRESS, ESCROW_ABI)
+        self.reader = market.reader
+        self.confirmed = 0
+        self.failed = 0
+        self.last_run_at: datetime | None = None
+        self.next_due_at: datetime | None = None
+        self._inflight: Set[str] = set()
+        self._task: asyncio.Task | None = None
+        self._callbacks: Set[asyncio.Task] = set()
+
+    def start(self):
+        if self._task is None:
+            self.submitter.start()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.submitter.stop()
+
+    async def _run(self):
+        logger.info(f"[cron] AutoConfirm scheduler started (operator {self.submitter.address})")
+        while True:
+            try:
+                delay = await self.fire_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[cron] AutoConfirm scheduler error: {e}")
+                delay = AUTOCONFIRM_MAX_SLEEP
+            await asyncio.sleep(delay)
+
+    async def fire_due(self) -> float:
+        """发出所有已到期的订单；返回距下一个到期还要睡多久（秒）"""
+        now = _now()
+        self.last_run_at = now
+        result = await (
+            self.supabase.table("autoconfirm_schedule")
+            .select("order_id, due_at, attempts")
+            .lte("due_at", now.isoformat())
+            .order("due_at")
+            .limit(AUTOCONFIRM_BATCH)
+            .execute()
+        )
+        rows = [r for r in result.data or [] if r["order_id"] not in self._inflight]
+        if rows:
+            logger.info(f"[cron] {len(rows)} orders due for autoConfirm")
+            await self._fire(rows)
+        if len(result.data or []) >= AUTOCONFIRM_BATCH:
+            return 0  # 积压（比如重启后补发），马上处理下一批
+
+        nxt = await (
+            self.supabase.table("autoconfirm_schedule")
+            .select("due_at").order("due_at").limit(1).execute()
+        )
+        if not nxt.data:
+            self.next_due_at = None
+            return AUTOCONFIRM_MAX_SLEEP
+        self.next_due_at = _parse_ts(nxt.data[0]["due_at"])
+        delay = (self.next_due_at - _now()).total_seconds() + random.uniform(0, AUTOCONFIRM_JITTER)
+        return min(max(delay, 0.0), AUTOCONFIRM_MAX_SLEEP)
+
+    async def _fire(self, rows: List[Dict[str, Any]]):
+        order_ids = [r["order_id"] for r in rows]
+        attempts = {r["order_id"]: r.get("attempts") or 0 for r in rows}
+
+        flags = await self.reader.many([(self.escrow, "isConfirmable", [_key_bytes(oid)]) for oid in order_ids])
+        confirmable: List[str] = []
+        for oid, ok in zip(order_ids, flags):
+            if isinstance(ok, Exception):
+                await self._reschedule(oid, attempts[oid], f"isConfirmable failed: {ok}")
+            elif ok:
+                confirmable.append(oid)
+            else:
+                # 链上还没到点（区块时间略慢）或已不是 Pending；后者会被索引器写入 escrow_status 后删掉
+                await self._reschedule(oid, attempts[oid], "not confirmable yet")
+
+        for oid in confirmable:
+            try:
+                await self._lease(oid)
+                await self.submit(oid)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"[cron] Failed to autoConfirm {oid}: {e}")
+                await self._reschedule(oid, attempts[oid], str(e))
+
+    async def _lease(self, order_id: str):
+        """发出前把 due_at 推到 receipt 超时之后，进程崩了也会被重新捡起"""
+        lease = _now() + timedelta(seconds=TX_RECEIPT_TIMEOUT + 60)
+        await (
+            self.supabase.table("autoconfirm_schedule")
+            .update({"due_at": lease.isoformat()})
+            .eq("order_id", order_id)
+            .execute()
+        )
+
+    async def _reschedule(self, order_id: str, attempts: int, error: str):
+        delay = min(AUTOCONFIRM_RETRY_BASE * 2 ** attempts, RETRY_MAX)
+        await (
+            self.supabase.table("autoconfirm_schedule")
+            .update({
+                "due_at": (_now() + timedelta(seconds=delay)).isoformat(),
+                "attempts": attempts + 1,
+                "last_error": error[:500],
+            })
+            .eq("order_id", order_id)
+            .execute()
+        )
+
+    async def submit(self, order_id: str):
+        """广播 autoConfirm（在途数满时等空位），上链结果异步处理"""
+        self._inflight.add(order_id)
+        try:
+            data = self.escrow.encodeABI("autoConfirm", [_key_bytes(order_id)])
+            future = await self.submitter.submit(self.escrow.address, data, label="autoConfirm")
+        except BaseException:
+            self._inflight.discard(order_id)
+            raise
+        future.add_done_callback(lambda f: self._spawn(self._on_mined(order_id, f)))
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    async def _on_mined(self, order_id: str, future: asyncio.Future):
+        try:
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error:
+                self.failed += 1
+                logger.error(f"[cron] autoConfirm {order_id} failed: {error}")
+                row = await (
+                    self.supabase.table("autoconfirm_schedule")
+                    .select("attempts").eq("order_id", order_id).execute()
+                )
+                if row.data:
+                    await self._reschedule(order_id, row.data[0].get("attempts") or 0, str(error))
+                return
+            receipt = future.result()
+            await (
+                self.supabase.table("orders")
+                .update({"status": "completed"})
+                .eq("order_id", order_id)
+                .in_("status", OPEN_STATUSES)
+                .execute()
+            )
+            await self.supabase.table("autoconfirm_schedule").delete().eq("order_id", order_id).execute()
+            self.confirmed += 1
+            logger.info(f"[cron] AutoConfirmed order {order_id} tx={receipt.get('transactionHash')}")
+        except Exception as e:
+            logger.error(f"[cron] autoConfirm {order_id} status update failed: {e}")
+        finally:
+            self._inflight.discard(order_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "pending_orders": len(self._inflight),
+            "confirmed": self.confirmed,
+            "failed": self.failed,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "next_due_at": self.next_due_at.isoformat() if self.next_due_at else None,
+            "submitter": self.submitter.stats(),
+        }
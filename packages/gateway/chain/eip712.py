@@ -0,0 +1,195 @@
+"""
+PactumAuth EIP-712 签名本地验证 — 复刻 PactumAgent.verifyEIP712，登录不再每次 eth_call
+- domain / struct hash 和合约构造函数、verifyEIP712 完全一致（对照向量见 contracts/test/PactumAgent.t.sol
+  的 test_verifyEIP712_vectors，scripts/check_eip712_vectors.py 在 Python 侧校验同一组向量）
+- 签名按 OpenZeppelin ECDSA 的规则恢复：65 字节、v ∈ {27, 28}、s 在低半区，否则视为无效
+- 签名人必须是钱包本身（EOA）或该 NFT 的 tokenSigner（Smart Account）；钱包须持有 active 的 agent NFT
+  walletToToken → records / tokenSigner 两轮 multicall，结果按 AUTH_AGENT_CACHE_TTL 缓存（只缓存 active）
+- AUTH_VERIFY_MODE: local（默认）| onchain（沿用 verifyEIP712 eth_call）| both（两边都算，不一致记日志并以链上为准）
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from eth_keys import keys
+from web3 import Web3
+
+from config import CHAIN_ID, AUTH_VERIFY_MODE, AUTH_AGENT_CACHE_TTL, AUTH_AGENT_CACHE_SIZE
+
+logger = logging.getLogger("pactum.eip712")
+
+DOMAIN_TYPEHASH = Web3.keccak(text="EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+AUTH_TYPEHASH = Web3.keccak(text="PactumAuth(address wallet,bytes32 challenge,uint256 timestamp)")
+DOMAIN_NAME = "Pactum"
+DOMAIN_VERSION = "1"
+
+SECP256K1_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+_codec = Web3().codec
+
+
+def domain_separator(chain_id: int, verifying_contract: str) -> bytes:
+    return Web3.keccak(_codec.encode(
+        ["bytes32", "bytes32", "bytes32", "uint256", "address"],
+        [
+            DOMAIN_TYPEHASH,
+            Web3.keccak(text=DOMAIN_NAME),
+            Web3.keccak(text=DOMAIN_VERSION),
+            chain_id,
+            Web3.to_checksum_address(verifying_contract),
+        ],
+    ))
+
+
+def challenge_hash(challenge: str) -> bytes:
+    """challenge 字符串 → 合约里的 bytes32 challenge"""
+    return Web3.keccak(text=challenge)
+
+
+def auth_digest(separator: bytes, wallet: str, challenge: bytes, timestamp: int) -> bytes:
+    struct_hash = Web3.keccak(_codec.encode(
+        ["bytes32", "address", "bytes32", "uint256"],
+        [AUTH_TYPEHASH, Web3.to_checksum_address(wallet), challenge, timestamp],
+    ))
+    return Web3.keccak(b"\x19\x01" + separator + struct_hash)
+
+
+def recover_signer(digest: bytes, signature: bytes) -> Optional[str]:
+    """按 OZ ECDSA.recover 的规则恢复签名人（checksum 地址）；合约会 revert 的签名返回 None"""
+    if len(signature) != 65:
+        return None
+    r = int.from_bytes(signature[:32], "big")
+    s = int.from_bytes(signature[32:64], "big")
+    v = signature[64]
+    if v not in (27, 28) or s > SECP256K1_N // 2:
+        return None
+    try:
+        pub = keys.Signature(vrs=(v - 27, r, s)).recover_public_key_from_msg_hash(digest)
+    except Exception:
+        return None
+    return pub.to_checksum_address()
+
+
+def parse_signature(signature: str) -> bytes:
+    return bytes.fromhex(signature[2:] if signature.startswith("0x") else signature)
+
+
+class AuthVerifier:
+    """PactumAgent 登录签名验证；verify() 返回钱包的 token_id，签名无效 / 未注册 / 已停用抛 ValueError"""
+
+    def __init__(
+        self, contract, reader, chain_id: int = CHAIN_ID, mode: str = AUTH_VERIFY_MODE,
+        ttl: float = AUTH_AGENT_CACHE_TTL, max_size: int = AUTH_AGENT_CACHE_SIZE,
+    ):
+        self.contract = contract
+        self.reader = reader
+        self.mode = mode if mode in ("local", "onchain", "both") else "local"
+        self.ttl = ttl
+        self.max_size = max_size
+        self._chain_id = chain_id or None
+        self._separator: Optional[bytes] = None
+        self._agents: OrderedDict[str, Tuple[int, str, float]] = OrderedDict()  # wallet → (token_id, signer, expires)
+        self.verified = 0
+        self.rejected = 0
+        self.mismatches = 0
+        self.cache_hits = 0
+
+    async def separator(self) -> bytes:
+        if self._separator is None:
+            if self._chain_id is None:
+                self._chain_id = int(await self.contract.rpc.request("eth_chainId", []), 16)
+            self._separator = domain_separator(self._chain_id, self.contract.address)
+        return self._separator
+
+    async def verify(self, wallet: str, challenge: str, timestamp: int, signature: str) -> int:
+        checksum = Web3.to_checksum_address(wallet)
+        challenge_bytes = challenge_hash(challenge)
+        sig_bytes = parse_signature(signature)
+
+        if self.mode == "onchain":
+            is_valid, token_id = await self._verify_onchain(checksum, challenge_bytes, timestamp, sig_bytes)
+        else:
+            token_id = await self._verify_local(checksum, challenge_bytes, timestamp, sig_bytes)
+            is_valid = token_id is not None
+            if self.mode == "both":
+                onchain_valid, onchain_tid = await self._verify_onchain(checksum, challenge_bytes, timestamp, sig_bytes)
+                if onchain_valid != is_valid:
+                    self.mismatches += 1
+                    logger.error(
+                        f"EIP-712 local/on-chain mismatch wallet={checksum} challenge={challenge_bytes.hex()} "
+                        f"timestamp={timestamp} local={is_valid} onchain={onchain_valid}"
+                    )
+                    self._agents.pop(checksum.lower(), None)
+                is_valid, token_id = onchain_valid, onchain_tid
+
+        if not is_valid:
+            self.rejected += 1
+            raise ValueError("EIP-712 signature verification failed")
+        self.verified += 1
+        return token_id
+
+    async def _verify_local(self, wallet: str, challenge: bytes, timestamp: int, signature: bytes) -> Optional[int]:
+        """签名有效且钱包是 active agent 时返回 token_id，否则 None"""
+        recovered = recover_signer(auth_digest(await self.separator(), wallet, challenge, timestamp), signature)
+        if recovered is None:
+            return None
+        agent = await self._agent(wallet)
+        if agent is None:
+            return None
+        token_id, signer = agent
+        if recovered == wallet or recovered == signer:
+            return token_id
+        return None
+
+    async def _verify_onchain(self, wallet: str, challenge: bytes, timestamp: int, signature: bytes) -> Tuple[bool, Optional[int]]:
+        try:
+            is_valid, tid = await self.reader.many([
+                (self.contract, "verifyEIP712", [wallet, challenge, timestamp, signature]),
+                (self.contract, "walletToToken", [wallet]),
+            ])
+        except Exception as e:
+            raise ValueError(f"On-chain verification error: {e}")
+        if isinstance(is_valid, Exception):
+            raise ValueError(f"On-chain verification error: {is_valid}")
+        token_id = tid if not isinstance(tid, Exception) and tid > 0 else None
+        return bool(is_valid), token_id
+
+    async def _agent(self, wallet: str) -> Optional[Tuple[int, str]]:
+        """钱包的 (token_id, tokenSigner)；未注册 / 已停用返回 None（不缓存）"""
+        key = wallet.lower()
+        entry = self._agents.get(key)
+        if entry and time.monotonic() < entry[2]:
+            self._agents.move_to_end(key)
+            self.cache_hits += 1
+            return entry[0], entry[1]
+        self._agents.pop(key, None)
+
+        try:
+            token_id = await self.reader.one(self.contract, "walletToToken", wallet)
+            if not token_id:
+                return None
+            record, signer = await self.reader.many([
+                (self.contract, "records", [token_id]),
+                (self.contract, "tokenSigner", [token_id]),
+            ], strict=True)
+        except Exception as e:
+            raise ValueError(f"On-chain verification error: {e}")
+        if not record[2]:  # AgentRecord.active
+            return None
+
+        signer = Web3.to_checksum_address(signer)
+        self._agents[key] = (token_id, signer, time.monotonic() + self.ttl)
+        while len(self._agents) > self.max_size:
+            self._agents.popitem(last=False)
+        return token_id, signer
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "chain_id": self._chain_id,
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "mismatches": self.mismatches,
+            "cached_agents": len(self._agents),
+            "cache_hits": self.cache_hits,
+        }
@@ -0,0 +1,320 @@
+"""
+PactumEscrow 事件索引器 — 链上状态 → orders
+- 跟踪 Deposited / Confirmed / Disputed / Released / Refunded，checkpoint 持久化在 chain_checkpoints
+- 只处理 head - ESCROW_CONFIRMATIONS 之前的区块（防 reorg），落后时连续追赶
+- orderId = keccak(order_id)，下单时写入 orders.order_id_bytes32（唯一索引），批量 IN 反查订单
+- 确定性的跳过（不是本站的订单、买家/卖家/金额不匹配）不挡 checkpoint；写库失败（网络 / Supabase 出错）
+  checkpoint 只推进到出错事件所在区块之前，按指数退避重试该段 — 迁移都是条件更新，重放已处理的事件无害
+- 状态推进都是条件更新（只从允许的前置状态迁移），和 confirm_payment / 多实例并发安全、可重放
+  Deposited（买家 + 卖家 + 金额都匹配）→ paid，抢到迁移的一方负责触发卖家 endpoint
+  Released → completed，Refunded → refunded，Confirmed / Disputed 只记 escrow_status
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from web3 import Web3
+
+from config import (
+    ESCROW_CONTRACT_ADDRESS, ESCROW_INDEXER_INTERVAL, ESCROW_CONFIRMATIONS,
+    ESCROW_INDEXER_RANGE, ESCROW_INDEXER_START_BLOCK, ESCROW_RETRY_BACKOFF_MAX,
+)
+
+logger = logging.getLogger("pactum.escrow")
+
+CHECKPOINT_NAME = "escrow_events"
+
+
+def _hex(b) -> str:
+    h = b.hex() if isinstance(b, (bytes, bytearray)) else str(b)
+    return (h if h.startswith("0x") else "0x" + h).lower()
+
+
+def order_key(order_id: str) -> str:
+    """订单在合约里的 orderId：keccak256(order_id 字符串)，0x 小写 hex"""
+    return _hex(Web3.keccak(text=str(order_id)))
+
+
+def usdc_units(amount) -> int:
+    """订单金额（USDC，numeric）→ 链上 6 位小数的整数；走 Decimal，避免 float 截断（0.29 → 289999）"""
+    return int(Decimal(str(amount)) * 1_000_000)
+
+
+def deposit_matches(evt: Dict[str, Any], order: Dict[str, Any]) -> bool:
+    """Deposited 事件的买家、卖家、金额是否和订单一致（卖家不对 = 钱托管给了别人，不能算已付款）"""
+    return (
+        evt["address"].lower() == order["buyer_wallet"].lower()
+        and evt["seller"].lower() == order["seller_wallet"].lower()
+        and evt["amount"] == usdc_units(order["amount"])
+    )
+
+
+EVENT_SIGNATURES = {
+    "Deposited": "Deposited(bytes32,address,address,uint256)",
+    "Confirmed": "Confirmed(bytes32,address)",
+    "Disputed": "Disputed(bytes32,address)",
+    "Released": "Released(bytes32,address,uint256,uint256)",
+    "Refunded": "Refunded(bytes32,address,uint256)",
+}
+TOPICS = {_hex(Web3.keccak(text=sig)): name for name, sig in EVENT_SIGNATURES.items()}
+
+# 链上事件 → 订单状态迁移（允许的前置状态）；不在表里的只更新 escrow_status
+OPEN_STATUSES = ["paid", "processing", "needs_clarification", "delivered", "failed"]
+TRANSITIONS = {
+    "Deposited": ("paid", ["created", "pending"]),
+    "Released": ("completed", OPEN_STATUSES),
+    "Refunded": ("refunded", OPEN_STATUSES),
+}
+ESCROW_STATUS = {
+    "Deposited": "deposited",
+    "Confirmed": "confirmed",
+    "Disputed": "disputed",
+    "Released": "released",
+    "Refunded": "refunded",
+}
+
+
+def _is_unique_violation(e: Exception) -> bool:
+    msg = str(e).lower()
+    return "23505" in msg or "duplicate key" in msg
+
+
+def _word(data: str, i: int) -> int:
+    raw = data[2:] if data.startswith("0x") else data
+    return int(raw[i * 64:(i + 1) * 64] or "0", 16)
+
+
+def decode_log(log: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    topics = [_hex(t) for t in log.get("topics") or []]
+    name = TOPICS.get(topics[0]) if topics else None
+    if not name or len(topics) < 3:
+        return None
+    data = _hex(log.get("data") or "0x")
+    evt = {
+        "event": name,
+        "order_key": topics[1],
+        "address": "0x" + topics[2][-40:],  # buyer / confirmedBy / seller
+        "tx_hash": _hex(log["transactionHash"]),
+        "block_number": int(log["blockNumber"], 16),
+        "log_index": int(log["logIndex"], 16),
+    }
+    if name == "Deposited":
+        evt["seller"] = "0x" + topics[3][-40:]
+        evt["amount"] = _word(data, 0)
+    elif name == "Released":
+        evt["seller_amount"] = _word(data, 0)
+        evt["fee"] = _word(data, 1)
+    elif name == "Refunded":
+        evt["amount"] = _word(data, 0)
+    return evt
+
+
+class EscrowIndexer:
+    def __init__(self, market):
+        self.market = market
+        self.supabase = market.supabase
+        self.rpc = market.rpc
+        self.checkpoint: Optional[int] = None
+        self.head: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[float] = None
+        self.applied: Dict[str, int] = {name: 0 for name in EVENT_SIGNATURES}
+        self.mismatched = 0
+        self.errors = 0
+        self.backoff = 0.0  # 写库失败后的退避（秒），_run 据此多睡
+        self._task: asyncio.Task | None = None
+        self._fulfillments: set = set()
+
+    def start(self):
+        if self._task is None and self.rpc and ESCROW_CONTRACT_ADDRESS:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        logger.info("Escrow indexer started")
+        while True:
+            try:
+                caught_up = await self.index_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Escrow indexer error: {e}")
+                caught_up = True
+            if caught_up or self.backoff:
+                await asyncio.sleep(max(ESCROW_INDEXER_INTERVAL, self.backoff))
+
+    # ========== checkpoint ==========
+
+    async def _load_checkpoint(self, safe_head: int) -> int:
+        result = await (
+            self.supabase.table("chain_checkpoints").select("last_block").eq("name", CHECKPOINT_NAME).execute()
+        )
+        if result.data:
+            block = int(result.data[0]["last_block"])
+            logger.info(f"Escrow indexer resuming after block {block}")
+            return block
+        block = ESCROW_INDEXER_START_BLOCK - 1 if ESCROW_INDEXER_START_BLOCK > 0 else safe_head
+        await self._save_checkpoint(block)
+        logger.info(f"Escrow indexer initialized at block {block}")
+        return block
+
+    async def _save_checkpoint(self, block: int):
+        await self.supabase.table("chain_checkpoints").upsert({
+            "name": CHECKPOINT_NAME,
+            "last_block": block,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }).execute()
+
+    # ========== 扫描 ==========
+
+    async def index_once(self) -> bool:
+        """处理一段区块；返回 True 表示已追上安全高度"""
+        self.head = int(await self.rpc.request("eth_blockNumber", []), 16)
+        safe_head = self.head - ESCROW_CONFIRMATIONS
+        if self.checkpoint is None:
+            self.checkpoint = await self._load_checkpoint(safe_head)
+        if safe_head <= self.checkpoint:
+            self.last_run_at = time.time()
+            return True
+
+        from_block = self.checkpoint + 1
+        to_block = min(safe_head, self.checkpoint + ESCROW_INDEXER_RANGE)
+        logs = await self.rpc.request("eth_getLogs", [{
+            "address": Web3.to_checksum_address(ESCROW_CONTRACT_ADDRESS),
+            "fromBlock": hex(from_block),
+            "toBlock": hex(to_block),
+            "topics": [list(TOPICS)],
+        }])
+        events = [e for e in (decode_log(log) for log in logs or []) if e]
+        events.sort(key=lambda e: (e["block_number"], e["log_index"]))
+        failed_block = await self._apply(events) if events else None
+
+        reached = to_block if failed_block is None else failed_block - 1
+        if failed_block is None:
+            self.last_error = None
+            self.backoff = 0.0
+        else:
+            self.backoff = min(max(self.backoff * 2, ESCROW_INDEXER_INTERVAL), ESCROW_RETRY_BACKOFF_MAX)
+            logger.warning(f"Escrow indexer will retry from block {failed_block} in {self.backoff:.0f}s")
+        if reached > self.checkpoint:
+            await self._save_checkpoint(reached)
+            self.checkpoint = reached
+        self.last_run_at = time.time()
+        return failed_block is None and to_block >= safe_head
+
+    async def _block_times(self, blocks: List[int]) -> Dict[int, str]:
+        if not blocks:
+            return {}
+        results = await self.rpc.batch(
+            [("eth_getBlockByNumber", [hex(b), False]) for b in blocks], return_exceptions=True,
+        )
+        times = {}
+        for b, r in zip(blocks, results):
+            if isinstance(r, dict) and r.get("timestamp"):
+                times[b] = datetime.fromtimestamp(int(r["timestamp"], 16), timezone.utc).isoformat()
+        return times
+
+    async def _apply(self, events: List[Dict[str, Any]]) -> Optional[int]:
+        """按顺序应用事件；写库失败时停下，返回出错事件的区块号（之后的事件留给重试）"""
+        keys = list({e["order_key"] for e in events})
+        result = await (
+            self.supabase.table("orders")
+            .select("order_id, order_id_bytes32, buyer_wallet, seller_wallet, amount, status")
+            .in_("order_id_bytes32", keys)
+            .execute()
+        )
+        orders = {row["order_id_bytes32"]: row for row in result.data or []}
+        deposit_blocks = sorted({e["block_number"] for e in events if e["event"] == "Deposited"})
+        block_times = await self._block_times(deposit_blocks)
+
+        for evt in events:
+            order = orders.get(evt["order_key"])
+            if not order:
+                continue  # 不是本站下的单
+            try:
+                won = await self._apply_one(evt, order, block_times)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = f"{evt['event']} {evt['tx_hash']}#{evt['log_index']}: {e}"
+                logger.error(f"Escrow indexer failed to apply {evt['event']} for order {order['order_id']}: {e}")
+                return evt["block_number"]
+            if won and evt["event"] == "Deposited":
+                logger.info(f"Order {order['order_id']} paid via escrow tx {evt['tx_hash']}")
+                task = asyncio.create_task(self.market.fulfill_order(order["order_id"]))
+                self._fulfillments.add(task)
+                task.add_done_callback(self._fulfillments.discard)
+        return None
+
+    async def _apply_one(self, evt: Dict[str, Any], order: Dict[str, Any], block_times: Dict[int, str]) -> bool:
+        fields: Dict[str, Any] = {"escrow_status": ESCROW_STATUS[evt["event"]]}
+        transition = TRANSITIONS.get(evt["event"])
+
+        if evt["event"] == "Deposited":
+            fields["deposited_at"] = block_times.get(evt["block_number"])
+            if not deposit_matches(evt, order):
+                self.mismatched += 1
+                logger.warning(
+                    f"Escrow deposit for order {order['order_id']} does not match "
+                    f"(buyer={evt['address']} seller={evt['seller']} amount={evt['amount']}), not marking paid"
+                )
+                transition = None
+            else:
+                fields["tx_hash"] = evt["tx_hash"]
+
+        won = await self._update(order["order_id"], fields, transition)
+        self.applied[evt["event"]] += 1
+        return won
+
+    async def _update(self, order_id: str, fields: Dict[str, Any], transition) -> bool:
+        """有状态迁移时先做条件更新；没抢到（已被推进）就只补 escrow 字段。返回是否由本次完成迁移"""
+        fields = {k: v for k, v in fields.items() if v is not None}
+        if transition:
+            status, allowed = transition
+            try:
+                result = await self._transition(order_id, {**fields, "status": status}, allowed)
+            except Exception as e:
+                if "tx_hash" not in fields or not _is_unique_violation(e):
+                    raise
+                # orders.tx_hash 唯一：同一笔交易给多个订单 deposit 时，后面的订单不记 tx_hash
+                fields.pop("tx_hash")
+                result = await self._transition(order_id, {**fields, "status": status}, allowed)
+            if result.data:
+                return True
+            fields.pop("tx_hash", None)  # 已由 confirm_payment 写入，别覆盖
+        await self.supabase.table("orders").update(fields).eq("order_id", order_id).execute()
+        return False
+
+    async def _transition(self, order_id: str, fields: Dict[str, Any], allowed: List[str]):
+        return await (
+            self.supabase.table("orders")
+            .update(fields)
+            .eq("order_id", order_id)
+            .in_("status", allowed)
+            .execute()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        lag = None
+        if self.head is not None and self.checkpoint is not None:
+            lag = max(self.head - self.checkpoint, 0)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "checkpoint": self.checkpoint,
+            "head": self.head,
+            "lag_blocks": lag,
+            "applied": dict(self.applied),
+            "mismatched": self.mismatched,
+            "errors": self.errors,
+            "backoff": self.backoff,
+            "last_run_at": self.last_run_at,
+            "last_error": self.last_error,
+        }
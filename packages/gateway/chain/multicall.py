@@ -0,0 +1,153 @@
+"""
+Multicall3 批量只读 — 多个合约的 view 调用合并成一次 aggregate3 eth_call
+- many(): [(contract, fn_name, args), ...] → 结果按输入顺序；单项 revert / 解码失败以异常对象占位
+  超过 MULTICALL_CHUNK 自动分片，各分片放进同一个 JSON-RPC batch 一次发出
+- one(): 单个调用；MULTICALL_WINDOW 秒内并发到来的 one() 合并成一次 many()（比如同时登录的多个钱包）
+- aggregate3 整体失败（节点报错、限制）或返回无法解码（链上没有 Multicall3 时 eth_call 返回 "0x"）时，
+  该分片退回逐个 eth_call 的 JSON-RPC batch
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Sequence, Tuple
+
+from web3 import Web3
+
+from chain.rpc import ChainContract, ChainRpc
+from config import MULTICALL3_ADDRESS, MULTICALL_CHUNK, MULTICALL_WINDOW
+
+logger = logging.getLogger("pactum.multicall")
+
+Call = Tuple[ChainContract, str, Sequence[Any]]  # (contract, fn_name, args)
+
+_AGGREGATE3 = Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+
+
+class CallFailed(RuntimeError):
+    """单个调用在 aggregate3 里 revert"""
+
+
+class MulticallReader:
+    def __init__(
+        self, rpc: ChainRpc, address: str = MULTICALL3_ADDRESS,
+        chunk: int = MULTICALL_CHUNK, window: float = MULTICALL_WINDOW,
+    ):
+        self.rpc = rpc
+        self.address = Web3.to_checksum_address(address)
+        self.chunk = max(1, chunk)
+        self.window = window
+        self._codec = Web3().codec
+        self._queue: List[Tuple[Call, asyncio.Future]] = []
+        self._flush_task: asyncio.Task | None = None
+        self.calls = 0
+        self.batches = 0
+        self.fallbacks = 0
+
+    async def many(self, calls: Sequence[Call], strict: bool = False) -> List[Any]:
+        """批量调用；strict=True 时有任一项失败就抛出第一个错误"""
+        if not calls:
+            return []
+        calls = list(calls)
+        spans = [(i, min(i + self.chunk, len(calls))) for i in range(0, len(calls), self.chunk)]
+        raws = await self.rpc.batch(
+            [("eth_call", [{"to": self.address, "data": self._encode(calls[i:j])}, "latest"]) for i, j in spans],
+            labels=["eth_call:multicall3"] * len(spans),
+            return_exceptions=True,
+        )
+        results: List[Any] = []
+        for (i, j), raw in zip(spans, raws):
+            try:
+                if isinstance(raw, Exception):
+                    raise raw
+                results += self._decode(calls[i:j], raw)
+            except Exception as e:
+                self.fallbacks += 1
+                logger.warning(f"aggregate3 failed ({e}), falling back to plain eth_call batch")
+                results += await self._direct(calls[i:j])
+        self.calls += len(calls)
+        self.batches += len(spans)
+
+        if strict:
+            for r in results:
+                if isinstance(r, Exception):
+                    raise r
+        return results
+
+    async def one(self, contract: ChainContract, fn_name: str, *args) -> Any:
+        """单个调用，和同一窗口内的其它调用合并发出"""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append(((contract, fn_name, args), future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        result = await future
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        queue, self._queue = self._queue, []
+        self._flush_task = None
+        try:
+            results = await self.many([call for call, _ in queue])
+        except Exception as e:
+            results = [e] * len(queue)
+        for (_, future), result in zip(queue, results):
+            if not future.done():
+                future.set_result(result)
+
+    # ========== 编解码 ==========
+
+    def _encode(self, calls: Sequence[Call]) -> str:
+        entries = [
+            (contract.address, True, bytes.fromhex(contract.encodeABI(fn, list(args))[2:]))
+            for contract, fn, args in calls
+        ]
+        return "0x" + (_AGGREGATE3 + self._codec.encode(["(address,bool,bytes)[]"], [entries])).hex()
+
+    def _decode(self, calls: Sequence[Call], raw: str) -> List[Any]:
+        """aggregate3 返回值 → 逐项结果；整体为空 / 解码失败 / 条数不符时抛 ValueError"""
+        data = bytes.fromhex(raw[2:] if raw.startswith("0x") else raw)
+        if not data:
+            raise ValueError(f"empty aggregate3 result (no Multicall3 at {self.address}?)")
+        try:
+            (entries,) = self._codec.decode(["(bool,bytes)[]"], data)
+        except Exception as e:
+            raise ValueError(f"undecodable aggregate3 result: {e}")
+        if len(entries) != len(calls):
+            raise ValueError(f"aggregate3 returned {len(entries)} results for {len(calls)} calls")
+        results: List[Any] = []
+        for (contract, fn, _), (success, data) in zip(calls, entries):
+            if not success:
+                results.append(CallFailed(f"{fn} reverted"))
+                continue
+            try:
+                results.append(contract.decode(fn, "0x" + data.hex()))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def _direct(self, calls: Sequence[Call]) -> List[Any]:
+        raws = await self.rpc.batch(
+            [("eth_call", [{"to": c.address, "data": c.encodeABI(fn, list(args))}, "latest"]) for c, fn, args in calls],
+            labels=[f"eth_call:{fn}" for _, fn, _ in calls],
+            return_exceptions=True,
+        )
+        results: List[Any] = []
+        for (contract, fn, _), raw in zip(calls, raws):
+            if isinstance(raw, Exception):
+                results.append(raw)
+                continue
+            try:
+                results.append(contract.decode(fn, raw))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "calls": self.calls,
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+            "queued": len(self._queue),
+        }
@@ -0,0 +1,176 @@
+"""
+异步链上读取 — JSON-RPC over 共享 httpx 连接池
+- request(): 单个 RPC 调用
+- batch():   多个互不依赖的调用合并成一个 JSON-RPC batch，一次往返
+- ChainContract: 只用 web3 做 ABI 编解码，eth_call 走 ChainRpc（不阻塞事件循环）
+  多合约 / 跨请求合并成一次 eth_call 见 chain/multicall.py
+每个 method 记录调用次数 / 错误数 / 延迟，GET /metrics 暴露
+"""
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+from web3 import Web3
+
+from config import BASE_RPC_URL, RPC_TIMEOUT
+from net.http import http_client
+
+logger = logging.getLogger("pactum.rpc")
+
+Call = Tuple[str, list]  # (method, params)
+
+
+class RpcError(RuntimeError):
+    """JSON-RPC 返回 error 字段"""
+
+    def __init__(self, method: str, error: Any):
+        self.method = method
+        self.error = error
+        super().__init__(f"RPC error ({method}): {error}")
+
+
+class RpcMetrics:
+    """按 method 聚合的延迟统计（进程内）"""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def record(self, method: str, elapsed: float, ok: bool = True):
+        s = self._stats.setdefault(method, {"calls": 0, "errors": 0, "total": 0.0, "max": 0.0})
+        s["calls"] += 1
+        if not ok:
+            s["errors"] += 1
+        s["total"] += elapsed
+        s["max"] = max(s["max"], elapsed)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            method: {
+                "calls": int(s["calls"]),
+                "errors": int(s["errors"]),
+                "avg_ms": round(s["total"] / s["calls"] * 1000, 2) if s["calls"] else 0.0,
+                "max_ms": round(s["max"] * 1000, 2),
+            }
+            for method, s in self._stats.items()
+        }
+
+
+class ChainRpc:
+    def __init__(self, url: str = BASE_RPC_URL, timeout: float = RPC_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.metrics = RpcMetrics()
+        self._ids = itertools.count(1)
+
+    async def _post(self, payload):
+        resp = await http_client("rpc").post(self.url, json=payload, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def request(self, method: str, params: list, label: str | None = None) -> Any:
+        label = label or method
+        start = time.monotonic()
+        ok = False
+        try:
+            data = await self._post({"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": params})
+            if "error" in data:
+                raise RpcError(method, data["error"])
+            ok = True
+            return data.get("result")
+        finally:
+            self.metrics.record(label, time.monotonic() - start, ok)
+
+    async def batch(
+        self, calls: Sequence[Call], labels: Sequence[str] | None = None, return_exceptions: bool = False,
+    ) -> List[Any]:
+        """
+        一次 HTTP 往返发送多个调用，结果按输入顺序返回
+        return_exceptions=True 时单项失败以 RpcError 占位，否则抛出第一个错误
+        """
+        if not calls:
+            return []
+        labels = list(labels or [m for m, _ in calls])
+        ids = [next(self._ids) for _ in calls]
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": m, "params": p}
+            for i, (m, p) in zip(ids, calls)
+        ]
+
+        start = time.monotonic()
+        try:
+            data = await self._post(payload)
+        except Exception:
+            elapsed = time.monotonic() - start
+            for label in labels:
+                self.metrics.record(label, elapsed, ok=False)
+            raise
+        elapsed = time.monotonic() - start
+
+        # 部分节点对整个 batch 只返回一个 error 对象
+        if isinstance(data, dict):
+            data = [{"id": i, "error": data.get("error", data)} for i in ids]
+        by_id = {item.get("id"): item for item in data}
+
+        results: List[Any] = []
+        for i, (method, _), label in zip(ids, calls, labels):
+            item = by_id.get(i) or {"error": "missing response"}
+            if "error" in item:
+                self.metrics.record(label, elapsed, ok=False)
+                results.append(RpcError(method, item["error"]))
+            else:
+                self.metrics.record(label, elapsed)
+                results.append(item.get("result"))
+
+        if not return_exceptions:
+            for r in results:
+                if isinstance(r, RpcError):
+                    raise r
+        return results
+
+
+class ChainContract:
+    """合约只读调用：web3 负责 ABI 编解码，RPC 走 ChainRpc"""
+
+    def __init__(self, rpc: ChainRpc, address: str, abi: list):
+        self.rpc = rpc
+        self.address = Web3.to_checksum_address(address)
+        self._contract = Web3().eth.contract(address=self.address, abi=abi)
+        self._codec = self._contract.w3.codec
+
+    def encodeABI(self, fn_name: str, args: list) -> str:
+        return self._contract.encodeABI(fn_name=fn_name, args=args)
+
+    def _eth_call(self, fn_name: str, args: list) -> Call:
+        data = self.encodeABI(fn_name, args)
+        return "eth_call", [{"to": self.address, "data": data}, "latest"]
+
+    def decode(self, fn_name: str, raw: str) -> Any:
+        outputs = self._contract.get_function_by_name(fn_name).abi["outputs"]
+        types = [o["type"] for o in outputs]
+        values = self._codec.decode(types, bytes.fromhex(raw.replace("0x", "")))
+        return values[0] if len(values) == 1 else tuple(values)
+
+    async def call(self, fn_name: str, *args) -> Any:
+        raw = await self.rpc.request(*self._eth_call(fn_name, list(args)), label=f"eth_call:{fn_name}")
+        return self.decode(fn_name, raw)
+
+    async def batch_call(self, calls: Sequence[Tuple[str, list]], return_exceptions: bool = False) -> List[Any]:
+        """多个只读调用合并成一次 JSON-RPC batch，[(fn_name, args), ...]"""
+        raws = await self.rpc.batch(
+            [self._eth_call(fn, args) for fn, args in calls],
+            labels=[f"eth_call:{fn}" for fn, _ in calls],
+            return_exceptions=return_exceptions,
+        )
+        results = []
+        for (fn, _), raw in zip(calls, raws):
+            if isinstance(raw, Exception):
+                results.append(raw)
+                continue
+            try:
+                results.append(self.decode(fn, raw))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
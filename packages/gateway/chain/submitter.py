@@ -0,0 +1,238 @@
+"""
+异步交易提交器 — operator 账户发交易，不阻塞事件循环
+- nonce 本地维护：首次从 eth_getTransactionCount(pending) 取，之后自增，连续发送不用每笔查链
+- 发送失败（nonce 冲突、余额不足等）时丢弃本地 nonce，下一笔重新同步
+- receipt 超时先用同一 nonce、gasPrice 上调 TX_GAS_BUMP_PERCENT 重发替换交易（最多 TX_MAX_REPLACEMENTS 次），
+  新旧 hash 都继续查 receipt；替换用完仍没上链才判失败并重新同步 nonce
+- 同时在途交易数受 TX_MAX_INFLIGHT 限制，满了 submit() 等待
+- 一个共享的 receipt 轮询 task 把所有在途交易合并成一次 JSON-RPC batch 查询
+submit() 广播后立即返回 future，上链（status=1）时 set_result(receipt)，revert / 超时 set_exception
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from eth_account import Account
+from web3 import Web3
+
+from chain.rpc import ChainRpc, RpcError
+from config import (
+    TX_MAX_INFLIGHT, TX_GAS_LIMIT, TX_RECEIPT_POLL_INTERVAL, TX_RECEIPT_TIMEOUT, TX_GAS_PRICE_TTL,
+    TX_GAS_BUMP_PERCENT, TX_MAX_REPLACEMENTS,
+)
+
+logger = logging.getLogger("pactum.submitter")
+
+
+class TxFailed(RuntimeError):
+    """交易被 revert 或等 receipt 超时"""
+
+
+def _hex(b) -> str:
+    h = b.hex() if isinstance(b, (bytes, bytearray)) else str(b)
+    return h if h.startswith("0x") else "0x" + h
+
+
+class _PendingTx:
+    __slots__ = ("label", "nonce", "tx", "tx_hash", "hashes", "replacements", "sent_at", "future")
+
+    def __init__(self, label: str, nonce: int, tx: Dict[str, Any], tx_hash: str, future: asyncio.Future):
+        self.label = label
+        self.nonce = nonce
+        self.tx = tx  # 未签名的交易参数，替换时改 gasPrice 重签
+        self.tx_hash = tx_hash  # 最新一次广播的 hash
+        self.hashes = [tx_hash]  # 同一 nonce 广播过的所有 hash，任何一个上链都算
+        self.replacements = 0
+        self.sent_at = time.monotonic()
+        self.future = future
+
+
+class TxSubmitter:
+    def __init__(self, rpc: ChainRpc, private_key: str, max_inflight: int = TX_MAX_INFLIGHT):
+        self.rpc = rpc
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self.max_inflight = max_inflight
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._nonce_lock = asyncio.Lock()
+        self._nonce: Optional[int] = None
+        self._chain_id: Optional[int] = None
+        self._gas_price: Optional[int] = None
+        self._gas_price_at = 0.0
+        self._pending: Dict[int, _PendingTx] = {}  # nonce → 在途交易
+        self._wakeup = asyncio.Event()
+        self._poller: asyncio.Task | None = None
+        self.sent = 0
+        self.confirmed = 0
+        self.reverted = 0
+        self.send_errors = 0
+        self.timeouts = 0
+        self.replaced = 0
+        self.resyncs = 0
+
+    def start(self):
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll_receipts())
+
+    async def stop(self):
+        if self._poller:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        for p in self._pending.values():
+            if not p.future.done():
+                p.future.cancel()
+        self._pending.clear()
+
+    # ========== nonce / gas ==========
+
+    async def _next_nonce(self) -> int:
+        async with self._nonce_lock:
+            if self._nonce is None:
+                raw = await self.rpc.request("eth_getTransactionCount", [self.address, "pending"])
+                self._nonce = int(raw, 16)
+            nonce = self._nonce
+            self._nonce += 1
+            return nonce
+
+    def _resync(self):
+        """下一笔重新从链上取 nonce（pending 计数会停在第一个空洞上）"""
+        self._nonce = None
+        self.resyncs += 1
+
+    async def _current_gas_price(self) -> int:
+        if self._gas_price is None or time.monotonic() - self._gas_price_at > TX_GAS_PRICE_TTL:
+            self._gas_price = int(await self.rpc.request("eth_gasPrice", []), 16)
+            self._gas_price_at = time.monotonic()
+        return self._gas_price
+
+    # ========== 发送 ==========
+
+    async def submit(self, to: str, data: str, gas: int = TX_GAS_LIMIT, label: str = "tx") -> asyncio.Future:
+        """签名 + 广播，不等上链；在途数已满时先等空位"""
+        await self._slots.acquire()
+        try:
+            if self._chain_id is None:
+                self._chain_id = int(await self.rpc.request("eth_chainId", []), 16)
+            gas_price = await self._current_gas_price()
+            nonce = await self._next_nonce()
+            tx = {
+                "to": Web3.to_checksum_address(to),
+                "data": data,
+                "value": 0,
+                "gas": gas,
+                "gasPrice": gas_price,
+                "nonce": nonce,
+                "chainId": self._chain_id,
+            }
+            tx_hash = await self._broadcast(tx, label)
+        except BaseException as e:
+            self._slots.release()
+            if not isinstance(e, asyncio.CancelledError):
+                self.send_errors += 1
+                self._resync()
+            raise
+
+        self.sent += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[nonce] = _PendingTx(label, nonce, tx, tx_hash, future)
+        self._wakeup.set()
+        return future
+
+    async def _broadcast(self, tx: Dict[str, Any], label: str) -> str:
+        signed = self.account.sign_transaction(tx)
+        raw = getattr(signed, "raw_transaction", None) or signed.rawTransaction
+        try:
+            await self.rpc.request("eth_sendRawTransaction", [_hex(raw)], label=f"eth_sendRawTransaction:{label}")
+        except RpcError as e:
+            if "already known" not in str(e).lower():  # 重复广播同一笔不算失败
+                raise
+        return _hex(signed.hash)
+
+    async def _replace(self, p: _PendingTx) -> bool:
+        """同一 nonce 提高 gasPrice 重发；返回 False 表示没发出去（调用方判失败）"""
+        bumped = p.tx["gasPrice"] * (100 + TX_GAS_BUMP_PERCENT) // 100 + 1
+        try:
+            tx = dict(p.tx, gasPrice=max(bumped, await self._current_gas_price()))
+            tx_hash = await self._broadcast(tx, f"{p.label}:replace")
+        except RpcError as e:
+            if "nonce too low" in str(e).lower():
+                # 旧的某一笔刚好上链了，继续等它的 receipt（也计一次，防止 nonce 被别的交易占掉时无限等）
+                p.replacements += 1
+                p.sent_at = time.monotonic()
+                return True
+            logger.warning(f"Replacing {p.label} tx nonce={p.nonce} failed: {e}")
+            return False
+        self.replaced += 1
+        p.replacements += 1
+        p.tx = tx
+        p.tx_hash = tx_hash
+        p.hashes.append(tx_hash)
+        p.sent_at = time.monotonic()
+        logger.info(f"Replaced {p.label} tx nonce={p.nonce} gasPrice={tx['gasPrice']} → {tx_hash}")
+        return True
+
+    # ========== receipt 轮询 ==========
+
+    async def _poll_receipts(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            await asyncio.sleep(TX_RECEIPT_POLL_INTERVAL)
+            try:
+                await self._check_receipts()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Receipt poll failed: {e}")
+
+    async def _check_receipts(self):
+        pending = list(self._pending.values())
+        if not pending:
+            return
+        calls = [("eth_getTransactionReceipt", [h]) for p in pending for h in p.hashes]
+        results = iter(await self.rpc.batch(calls, return_exceptions=True))
+        now = time.monotonic()
+        for p in pending:
+            found = [r for r in (next(results) for _ in p.hashes) if isinstance(r, dict)]
+            receipt = found[0] if found else None
+            if receipt is not None:
+                if int(receipt.get("status", "0x0"), 16) == 1:
+                    self.confirmed += 1
+                    self._finish(p, result=receipt)
+                else:
+                    self.reverted += 1
+                    self._finish(p, error=TxFailed(f"{p.label} tx {p.tx_hash} reverted"))
+            elif now - p.sent_at > TX_RECEIPT_TIMEOUT:
+                if p.replacements < TX_MAX_REPLACEMENTS and await self._replace(p):
+                    continue
+                self.timeouts += 1
+                self._resync()
+                self._finish(p, error=TxFailed(f"{p.label} tx {p.tx_hash} not mined after {p.replacements} replacements"))
+
+    def _finish(self, p: _PendingTx, result: Any = None, error: Exception | None = None):
+        self._pending.pop(p.nonce, None)
+        self._slots.release()
+        if p.future.done():
+            return
+        if error:
+            p.future.set_exception(error)
+        else:
+            p.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "nonce": self._nonce,
+            "inflight": len(self._pending),
+            "max_inflight": self.max_inflight,
+            "sent": self.sent,
+            "confirmed": self.confirmed,
+            "reverted": self.reverted,
+            "send_errors": self.send_errors,
+            "timeouts": self.timeouts,
+            "replaced": self.replaced,
+            "resyncs": self.resyncs,
+        }
@@ -9,21 +9,53 @@ load_dotenv()
 # Supabase
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "15"))  # PostgREST 单次请求超时（秒）
 
 # 区块链
 BASE_RPC_URL = os.getenv("BASE_RPC_URL", "")
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))  # 单次 JSON-RPC 请求超时（秒）
 PACTUM_AGENT_CONTRACT_ADDRESS = os.getenv("PACTUM_AGENT_CONTRACT_ADDRESS", "")
+MULTICALL3_ADDRESS = os.getenv("MULTICALL3_ADDRESS", "0xcA11bde05977b3631167028862bE2a173976CA11")  # 各链同一地址
+MULTICALL_CHUNK = int(os.getenv("MULTICALL_CHUNK", "200"))  # 单次 aggregate3 最多调用数
+MULTICALL_WINDOW = float(os.getenv("MULTICALL_WINDOW", "0.005"))  # 并发单个调用的合并窗口（秒）
+CHAIN_ID = int(os.getenv("CHAIN_ID", "0"))  # EIP-712 domain 用，0 = 启动后首次登录时查 eth_chainId
 
 # Escrow
 ESCROW_CONTRACT_ADDRESS = os.getenv("ESCROW_CONTRACT_ADDRESS", "0xc61ec6B42ada753A952Edf1F3E6416502682F720")
 USDC_CONTRACT_ADDRESS = os.getenv("USDC_CONTRACT_ADDRESS", "0x036CbD53842c5426634e7929541eC2318f3dCF7e")
 PAYMASTER_URL = os.getenv("PAYMASTER_URL", "")
 
+# Escrow 事件索引器
+ESCROW_INDEXER_ENABLED = os.getenv("ESCROW_INDEXER_ENABLED", "true").lower() == "true"
+ESCROW_INDEXER_INTERVAL = float(os.getenv("ESCROW_INDEXER_INTERVAL", "4"))  # 追上后的轮询间隔（秒）
+ESCROW_CONFIRMATIONS = int(os.getenv("ESCROW_CONFIRMATIONS", "3"))  # 只处理 head - N 之前的区块
+ESCROW_INDEXER_RANGE = int(os.getenv("ESCROW_INDEXER_RANGE", "2000"))  # 单次 getLogs 最大区块数
+ESCROW_INDEXER_START_BLOCK = int(os.getenv("ESCROW_INDEXER_START_BLOCK", "0"))  # 首次部署起点，0 = 当前高度
+ESCROW_RETRY_BACKOFF_MAX = float(os.getenv("ESCROW_RETRY_BACKOFF_MAX", "300"))  # 写库失败后重试同一段的最长退避（秒）
+
+# AutoConfirm（operator 发 escrow.autoConfirm）；多 worker 部署时只在一个实例上开启，避免 nonce 冲突
+DEPLOYER_PRIVATE_KEY = os.getenv("DEPLOYER_PRIVATE_KEY", "")
+AUTOCONFIRM_ENABLED = os.getenv("AUTOCONFIRM_ENABLED", "true").lower() == "true"
+AUTOCONFIRM_BATCH = int(os.getenv("AUTOCONFIRM_BATCH", "500"))  # 每次最多处理的到期订单数
+AUTOCONFIRM_JITTER = float(os.getenv("AUTOCONFIRM_JITTER", "30"))  # 到期后随机延迟上限（秒），错开同一时刻到期的一批
+AUTOCONFIRM_MAX_SLEEP = float(os.getenv("AUTOCONFIRM_MAX_SLEEP", "300"))  # 调度器最长睡眠（秒），兜底新排入的订单
+AUTOCONFIRM_RETRY_BASE = float(os.getenv("AUTOCONFIRM_RETRY_BASE", "60"))  # 失败 / 暂不可确认的退避基数（秒）
+TX_MAX_INFLIGHT = int(os.getenv("TX_MAX_INFLIGHT", "16"))  # 同时在途（已广播未上链）的交易数
+TX_GAS_LIMIT = int(os.getenv("TX_GAS_LIMIT", "100000"))
+TX_GAS_PRICE_TTL = float(os.getenv("TX_GAS_PRICE_TTL", "30"))  # eth_gasPrice 缓存（秒）
+TX_RECEIPT_POLL_INTERVAL = float(os.getenv("TX_RECEIPT_POLL_INTERVAL", "2"))  # receipt 轮询间隔（秒）
+TX_RECEIPT_TIMEOUT = float(os.getenv("TX_RECEIPT_TIMEOUT", "180"))  # 超过多久没上链就提价替换 / 最终判失败（秒）
+TX_GAS_BUMP_PERCENT = int(os.getenv("TX_GAS_BUMP_PERCENT", "25"))  # 替换交易的 gasPrice 涨幅（节点一般要求 ≥10%）
+TX_MAX_REPLACEMENTS = int(os.getenv("TX_MAX_REPLACEMENTS", "3"))  # 同一 nonce 最多替换几次，用完仍没上链才判失败
+
 # JWT
 JWT_SECRET = os.getenv("JWT_SECRET", "")
 JWT_ALGORITHM = "HS256"
 JWT_TTL_HOURS = 24 * 7  # 7 days
 CHALLENGE_TTL_MINUTES = 5
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "local").lower()  # local | onchain | both（本地验签 + verifyEIP712 交叉核对）
+AUTH_AGENT_CACHE_TTL = float(os.getenv("AUTH_AGENT_CACHE_TTL", "60"))  # 钱包 → (token_id, tokenSigner) 缓存（秒），停用最多延迟这么久生效
+AUTH_AGENT_CACHE_SIZE = int(os.getenv("AUTH_AGENT_CACHE_SIZE", "4096"))
 
 # Resend (admin email verification)
 RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
@@ -32,6 +64,62 @@ ADMIN_FROM_EMAIL = os.getenv("ADMIN_FROM_EMAIL", "admin@pactum.cc")
 # Wallet Service
 WALLET_SERVICE_URL = os.getenv("WALLET_SERVICE_URL", "http://localhost:8001")
 
+# 出站 HTTP 连接池（每个上游一个）
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+HTTP_PER_HOST_MAX_CONNECTIONS = int(os.getenv("HTTP_PER_HOST_MAX_CONNECTIONS", "10"))  # 卖家 endpoint 每个 host 的连接上限
+HTTP_MAX_HOSTS = int(os.getenv("HTTP_MAX_HOSTS", "256"))  # 按 host 分池的客户端数上限（LRU）
+
+# 缓存
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "true").lower() == "true"
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "2048"))  # 条目上限（LRU）
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "10"))  # 商品/搜索/卖家列表缓存有效期（秒）
+
+# Telegram 通知队列
+TG_NOTIFY_WORKERS = int(os.getenv("TG_NOTIFY_WORKERS", "4"))
+TG_NOTIFY_QUEUE_SIZE = int(os.getenv("TG_NOTIFY_QUEUE_SIZE", "10000"))
+TG_CHAT_INTERVAL = float(os.getenv("TG_CHAT_INTERVAL", "1.0"))  # 同一 chat 两条消息最小间隔（秒）
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "25"))  # 全局每秒最多发送条数（Telegram 上限 30）
+TG_BINDING_CACHE_TTL = float(os.getenv("TG_BINDING_CACHE_TTL", "300"))  # wallet → chat_ids 缓存（秒）
+
+# WebSocket 单连接并发
+WS_MAX_INFLIGHT = int(os.getenv("WS_MAX_INFLIGHT", "8"))  # 同一连接最多同时处理的消息数
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))  # 每个连接的出站队列长度
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))  # 单帧写超时（秒），超时视为死连接
+WS_OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "store").lower()  # 推送队列满：store（转存 agent_events）| disconnect
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "20"))  # 服务端心跳间隔（秒），0 关闭
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))  # 多久收不到客户端任何帧就断开（秒）
+
+# GET /market/events 长轮询
+EVENTS_WAIT_MAX = float(os.getenv("EVENTS_WAIT_MAX", "30"))  # wait 参数上限（秒）
+EVENTS_LONGPOLL_MAX = int(os.getenv("EVENTS_LONGPOLL_MAX", "1000"))  # 每个 worker 同时挂起的请求上限，超出直接返回
+EVENTS_LONGPOLL_RECHECK = float(os.getenv("EVENTS_LONGPOLL_RECHECK", "5"))  # 挂起期间多久回查一次（兜底别的 worker 写入的事件）
+
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))  # /market/events/stream 心跳（秒）
+SSE_OVERLAP = float(os.getenv("SSE_OVERLAP", "120"))  # 流每轮回看 cursor 之前多少秒（兜底晚提交的事件）
+
+# 多 worker WebSocket 路由
+WS_BACKPLANE = os.getenv("WS_BACKPLANE", "memory").lower()  # memory | postgres
+DATABASE_URL = os.getenv("DATABASE_URL", "")  # postgres backplane 用的直连 DSN（LISTEN/NOTIFY）
+WS_PRESENCE_TTL = float(os.getenv("WS_PRESENCE_TTL", "90"))  # presence 多久没刷新视为下线（秒）
+WS_REMOTE_ACK_TIMEOUT = float(os.getenv("WS_REMOTE_ACK_TIMEOUT", "2"))  # 转发给别的 worker 后等回执（秒），超时存离线
+WS_BACKPLANE_RECONNECT_MAX = float(os.getenv("WS_BACKPLANE_RECONNECT_MAX", "30"))  # LISTEN 连接断开后重连的最长退避（秒）
+
+# Outbox 派发器
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))  # 没有 kick 时的轮询间隔（秒）
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "60"))  # 领取后多久没完成可被其他实例重领
+OUTBOX_RETENTION_DAYS = float(os.getenv("OUTBOX_RETENTION_DAYS", "7"))  # 已处理的行保留多久
+OUTBOX_DEAD_RETENTION_DAYS = float(os.getenv("OUTBOX_DEAD_RETENTION_DAYS", "30"))  # 死信（last_error 非空）保留多久
+OUTBOX_PURGE_INTERVAL = float(os.getenv("OUTBOX_PURGE_INTERVAL", "3600"))  # 清理间隔（秒）
+
+# 请求身份缓存（已解码 JWT + 已注册钱包）
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))  # 秒
+
 # 服务
 PORT = int(os.getenv("PORT", 8000))
 PUBLIC_URL = os.getenv("PUBLIC_URL", "https://api.pactum.cc")
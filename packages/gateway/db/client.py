@@ -0,0 +1,32 @@
+"""
+Supabase 异步单例客户端 — 所有 PostgREST / Storage 调用都 await，不阻塞事件循环
+MarketService、REST 路由、WS handler、Telegram 共用同一个客户端（同一个 httpx 连接池）
+"""
+from supabase import AsyncClient, AsyncClientOptions
+
+from config import SUPABASE_URL, SUPABASE_KEY, SUPABASE_TIMEOUT
+
+_client: AsyncClient | None = None
+
+
+def get_supabase() -> AsyncClient:
+    global _client
+    if _client is None:
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set")
+        # service key 不需要会话，直接构造即可（acreate_client 只多了一步 get_session）
+        _client = AsyncClient(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            AsyncClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT),
+        )
+    return _client
+
+
+async def close_supabase():
+    """lifespan 关闭时释放连接池"""
+    global _client
+    if _client is None:
+        return
+    await _client.postgrest.aclose()
+    _client = None
@@ -44,6 +44,9 @@ CREATE TABLE IF NOT EXISTS orders (
     result JSONB,
     shipping_address JSONB,
     buyer_query TEXT,
+    order_id_bytes32 TEXT UNIQUE,        -- keccak256(order_id)，escrow 合约里的 orderId（索引器反查）
+    escrow_status TEXT,                  -- 链上状态：deposited / confirmed / disputed / released / refunded
+    deposited_at TIMESTAMP,              -- Deposited 所在区块时间（CONFIRM_WINDOW 起点）
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW()
 );
@@ -88,9 +91,78 @@ CREATE TABLE IF NOT EXISTS agent_events (
     event_type TEXT NOT NULL,
     payload JSONB NOT NULL,
     delivered BOOLEAN DEFAULT FALSE,
+    dedupe_key TEXT UNIQUE,              -- outbox 写入的事件: 'outbox:<id>'，handler 重试时不会重复插入
     created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- outbox: 订单副作用（WS / agent_events / Telegram），由触发器和状态变更同事务写入
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGSERIAL PRIMARY KEY,
+    kind TEXT NOT NULL,
+    order_id UUID,
+    ref_id UUID,                         -- message_received: message_id
+    attempts INT NOT NULL DEFAULT 0,
+    available_at TIMESTAMP DEFAULT NOW(),
+    locked_until TIMESTAMP,
+    processed_at TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- ws_presence: 哪个 gateway worker 持有 wallet 的 WebSocket（WS_BACKPLANE=postgres）
+CREATE TABLE IF NOT EXISTS ws_presence (
+    wallet TEXT PRIMARY KEY,
+    worker_id TEXT NOT NULL,
+    heartbeat_at TIMESTAMP DEFAULT NOW()
+);
+
+-- chain_checkpoints: 链上事件索引器的断点（重启后续扫）
+CREATE TABLE IF NOT EXISTS chain_checkpoints (
+    name TEXT PRIMARY KEY,
+    last_block BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- autoconfirm_schedule: autoConfirm 到期队列，due_at = deposited_at + CONFIRM_WINDOW（由 orders 触发器维护）
+CREATE TABLE IF NOT EXISTS autoconfirm_schedule (
+    order_id UUID PRIMARY KEY REFERENCES orders(order_id) ON DELETE CASCADE,
+    due_at TIMESTAMP NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+-- 统计 rollup：由触发器在写事务里增量维护，/market/stats、/admin/overview、卖家统计只读几行
+-- metric: sellers / items / items_active / orders / volume / status:<status>
+-- 每个 metric 拆成 16 个 shard，写入随机挑一个，并发订单写不会排队等同一行锁；读取时按 metric 求和
+CREATE TABLE IF NOT EXISTS market_rollup (
+    metric TEXT NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    value NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (metric, shard)
+);
+
+-- 卖家累计 + 按订单创建日（UTC）分桶；paid_orders / volume 只算 paid/processing/delivered/completed
+CREATE TABLE IF NOT EXISTS seller_stats (
+    seller_wallet TEXT PRIMARY KEY,
+    orders INT NOT NULL DEFAULT 0,
+    paid_orders INT NOT NULL DEFAULT 0,
+    completed_orders INT NOT NULL DEFAULT 0,
+    volume NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS seller_daily_stats (
+    seller_wallet TEXT NOT NULL,
+    day DATE NOT NULL,
+    orders INT NOT NULL DEFAULT 0,
+    paid_orders INT NOT NULL DEFAULT 0,
+    completed_orders INT NOT NULL DEFAULT 0,
+    volume NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (seller_wallet, day)
+);
+
 -- 索引
 CREATE INDEX IF NOT EXISTS idx_challenges_expires ON auth_challenges(expires_at);
 CREATE INDEX IF NOT EXISTS idx_items_fts ON items USING GIN (
@@ -103,7 +175,23 @@ CREATE INDEX IF NOT EXISTS idx_orders_seller ON orders(seller_wallet);
 CREATE INDEX IF NOT EXISTS idx_orders_item ON orders(item_id);
 CREATE INDEX IF NOT EXISTS idx_agents_group ON agents(telegram_group_id);
 CREATE INDEX IF NOT EXISTS idx_messages_order ON messages(order_id);
-CREATE INDEX IF NOT EXISTS idx_events_wallet_undelivered ON agent_events(wallet) WHERE delivered = FALSE;
+CREATE INDEX IF NOT EXISTS idx_events_wallet_undelivered ON agent_events(wallet, created_at, event_id) WHERE delivered = FALSE;
+-- /market/agents 分页（keyset on registered_at, wallet）+ 嵌入 active items
+CREATE INDEX IF NOT EXISTS idx_agents_registered ON agents(registered_at DESC, wallet DESC);
+CREATE INDEX IF NOT EXISTS idx_items_seller_active ON items(seller_wallet, created_at DESC) WHERE status = 'active';
+-- 列表 keyset 分页（created_at, id），深翻页只扫一页
+CREATE INDEX IF NOT EXISTS idx_orders_buyer_created ON orders(buyer_wallet, created_at DESC, order_id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_seller_created ON orders(seller_wallet, created_at DESC, order_id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created_at DESC, order_id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders(status, created_at DESC, order_id DESC);
+CREATE INDEX IF NOT EXISTS idx_items_seller_created ON items(seller_wallet, created_at DESC, item_id DESC);
+CREATE INDEX IF NOT EXISTS idx_items_created ON items(created_at DESC, item_id DESC);
+CREATE INDEX IF NOT EXISTS idx_items_status_created ON items(status, created_at DESC, item_id DESC);
+CREATE INDEX IF NOT EXISTS idx_messages_order_created ON messages(order_id, created_at, message_id);
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(available_at, id) WHERE processed_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_outbox_processed ON outbox(processed_at) WHERE processed_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_ws_presence_worker ON ws_presence(worker_id);
+CREATE INDEX IF NOT EXISTS idx_autoconfirm_due ON autoconfirm_schedule(due_at);
 
 -- 更新时间戳触发器
 CREATE OR REPLACE FUNCTION update_updated_at()
@@ -124,6 +212,298 @@ CREATE TRIGGER orders_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at();
 
+-- 商品全文检索（GET /market/items + WS search）
+-- 有 q: websearch_to_tsquery 匹配 idx_items_fts 表达式，按 ts_rank 降序
+-- 空 q: rank = created_at epoch，即按上架时间倒序
+-- keyset: (rank, item_id) < (after_rank, after_id)，page_limit 上限 101（= MAX 100 + 1 探测行）
+CREATE OR REPLACE FUNCTION search_items(
+    q TEXT DEFAULT '',
+    min_price NUMERIC DEFAULT NULL,
+    max_price NUMERIC DEFAULT NULL,
+    item_type TEXT DEFAULT NULL,
+    after_rank DOUBLE PRECISION DEFAULT NULL,
+    after_id UUID DEFAULT NULL,
+    page_limit INT DEFAULT 21
+)
+RETURNS TABLE (
+    item_id UUID,
+    seller_wallet TEXT,
+    name TEXT,
+    description TEXT,
+    price DECIMAL(10,6),
+    type TEXT,
+    endpoint TEXT,
+    requires_shipping BOOLEAN,
+    status TEXT,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    agents JSONB,
+    rank DOUBLE PRECISION
+)
+LANGUAGE sql STABLE AS $$
+    WITH query AS (
+        SELECT CASE WHEN coalesce(search_items.q, '') = '' THEN NULL
+                    ELSE websearch_to_tsquery('english', search_items.q) END AS tsq
+    ),
+    hits AS (
+        SELECT i.*,
+               CASE WHEN query.tsq IS NULL THEN extract(epoch FROM i.created_at)::float8
+                    ELSE ts_rank(to_tsvector('english', i.name || ' ' || i.description), query.tsq)::float8
+               END AS rank
+        FROM items i, query
+        WHERE i.status = 'active'
+          AND (query.tsq IS NULL OR to_tsvector('english', i.name || ' ' || i.description) @@ query.tsq)
+          AND (search_items.min_price IS NULL OR i.price >= search_items.min_price)
+          AND (search_items.max_price IS NULL OR i.price <= search_items.max_price)
+          AND (search_items.item_type IS NULL OR i.type = search_items.item_type)
+    )
+    SELECT h.item_id, h.seller_wallet, h.name, h.description, h.price, h.type, h.endpoint,
+           h.requires_shipping, h.status, h.created_at, h.updated_at,
+           jsonb_build_object(
+               'wallet', a.wallet,
+               'description', a.description,
+               'avg_rating', a.avg_rating,
+               'total_reviews', a.total_reviews
+           ) AS agents,
+           h.rank
+    FROM hits h
+    JOIN agents a ON a.wallet = h.seller_wallet
+    WHERE search_items.after_rank IS NULL
+       OR (h.rank, h.item_id) < (search_items.after_rank, search_items.after_id)
+    ORDER BY h.rank DESC, h.item_id DESC
+    LIMIT least(greatest(search_items.page_limit, 1), 101);
+$$;
+
+-- outbox 触发器：订单/消息状态变更时写入待派发事件
+-- processing 延后 35s（卖家 endpoint 超时 30s），派发时仍是 processing 才通知买家
+CREATE OR REPLACE FUNCTION outbox_orders()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO outbox (kind, order_id) VALUES ('order_new', NEW.order_id);
+    ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+        IF NEW.status = 'paid' THEN
+            INSERT INTO outbox (kind, order_id) VALUES ('payment_confirmed', NEW.order_id);
+        ELSIF NEW.status = 'processing' THEN
+            INSERT INTO outbox (kind, order_id, available_at)
+            VALUES ('processing', NEW.order_id, NOW() + INTERVAL '35 seconds');
+        ELSIF NEW.status = 'delivered' THEN
+            INSERT INTO outbox (kind, order_id) VALUES ('delivery', NEW.order_id);
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_outbox
+    AFTER INSERT OR UPDATE OF status ON orders
+    FOR EACH ROW
+    EXECUTE FUNCTION outbox_orders();
+
+CREATE OR REPLACE FUNCTION outbox_messages()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO outbox (kind, order_id, ref_id) VALUES ('message_received', NEW.order_id, NEW.message_id);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER messages_outbox
+    AFTER INSERT ON messages
+    FOR EACH ROW
+    EXECUTE FUNCTION outbox_messages();
+
+-- 派发器领取一批到期事件：SKIP LOCKED + 租约，多个 gateway 实例不会重复领取
+CREATE OR REPLACE FUNCTION claim_outbox(batch_size INT DEFAULT 50, lease_seconds INT DEFAULT 60)
+RETURNS SETOF outbox
+LANGUAGE sql AS $$
+    UPDATE outbox o
+    SET locked_until = NOW() + make_interval(secs => lease_seconds),
+        attempts = o.attempts + 1
+    WHERE o.id IN (
+        SELECT id FROM outbox
+        WHERE processed_at IS NULL
+          AND available_at <= NOW()
+          AND (locked_until IS NULL OR locked_until < NOW())
+        ORDER BY id
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING o.*;
+$$;
+
+-- 清理已处理的 outbox 行：成功的保留 retention_seconds，死信（last_error 非空）保留 dead_retention_seconds
+-- 每次最多删 batch_size 行，返回删除数；调用方返回满批时继续
+CREATE OR REPLACE FUNCTION purge_outbox(
+    retention_seconds INT DEFAULT 604800,
+    dead_retention_seconds INT DEFAULT 2592000,
+    batch_size INT DEFAULT 5000
+)
+RETURNS INT
+LANGUAGE sql AS $$
+    WITH doomed AS (
+        SELECT id FROM outbox
+        WHERE processed_at < NOW() - make_interval(secs => LEAST(retention_seconds, dead_retention_seconds))
+          AND processed_at < NOW() - make_interval(secs => CASE WHEN last_error IS NULL
+                                                               THEN retention_seconds
+                                                               ELSE dead_retention_seconds END)
+        ORDER BY processed_at
+        LIMIT batch_size
+    ), deleted AS (
+        DELETE FROM outbox o USING doomed WHERE o.id = doomed.id RETURNING 1
+    )
+    SELECT count(*)::int FROM deleted;
+$$;
+
+-- autoConfirm 到期队列：订单进入可确认状态时排入，离开（completed / refunded / failed，或链上 confirmed / disputed）时删除
+-- 先按状态变更时间排，索引器写入 deposited_at（区块时间）后校正；已在退避中的（attempts > 0）不动
+-- failed 不自动放款，留给 operator 裁定；INTERVAL 和合约 CONFIRM_WINDOW（1 days）一致
+CREATE OR REPLACE FUNCTION schedule_autoconfirm()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.status IN ('paid','processing','needs_clarification','delivered')
+       AND COALESCE(NEW.escrow_status, 'deposited') = 'deposited' THEN
+        INSERT INTO autoconfirm_schedule (order_id, due_at)
+        VALUES (NEW.order_id, COALESCE(NEW.deposited_at, NOW()) + INTERVAL '1 day')
+        ON CONFLICT (order_id) DO NOTHING;
+        IF NEW.deposited_at IS NOT NULL AND NEW.deposited_at IS DISTINCT FROM OLD.deposited_at THEN
+            UPDATE autoconfirm_schedule SET due_at = NEW.deposited_at + INTERVAL '1 day'
+            WHERE order_id = NEW.order_id AND attempts = 0;
+        END IF;
+    ELSE
+        DELETE FROM autoconfirm_schedule WHERE order_id = NEW.order_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_autoconfirm
+    AFTER UPDATE OF status, escrow_status, deposited_at ON orders
+    FOR EACH ROW
+    EXECUTE FUNCTION schedule_autoconfirm();
+
+-- rollup 触发器：每行变更按 -旧行 +新行 记账，插入/改状态/删除都对得上
+CREATE OR REPLACE FUNCTION rollup_add(p_metric TEXT, p_delta NUMERIC)
+RETURNS VOID
+LANGUAGE sql AS $$
+    INSERT INTO market_rollup (metric, shard, value) VALUES (p_metric, floor(random() * 16)::smallint, p_delta)
+    ON CONFLICT (metric, shard) DO UPDATE
+    SET value = market_rollup.value + EXCLUDED.value, updated_at = NOW();
+$$;
+
+CREATE OR REPLACE FUNCTION rollup_order_delta(o orders, dir INT)
+RETURNS VOID AS $$
+DECLARE
+    paid INT := CASE WHEN o.status IN ('paid','processing','delivered','completed') THEN dir ELSE 0 END;
+    completed INT := CASE WHEN o.status = 'completed' THEN dir ELSE 0 END;
+BEGIN
+    PERFORM rollup_add('orders', dir);
+    PERFORM rollup_add('status:' || o.status, dir);
+    IF paid <> 0 THEN
+        PERFORM rollup_add('volume', paid * o.amount);
+    END IF;
+
+    INSERT INTO seller_stats AS s (seller_wallet, orders, paid_orders, completed_orders, volume)
+    VALUES (o.seller_wallet, dir, paid, completed, paid * o.amount)
+    ON CONFLICT (seller_wallet) DO UPDATE SET
+        orders = s.orders + EXCLUDED.orders,
+        paid_orders = s.paid_orders + EXCLUDED.paid_orders,
+        completed_orders = s.completed_orders + EXCLUDED.completed_orders,
+        volume = s.volume + EXCLUDED.volume,
+        updated_at = NOW();
+
+    INSERT INTO seller_daily_stats AS d (seller_wallet, day, orders, paid_orders, completed_orders, volume)
+    VALUES (o.seller_wallet, o.created_at::date, dir, paid, completed, paid * o.amount)
+    ON CONFLICT (seller_wallet, day) DO UPDATE SET
+        orders = d.orders + EXCLUDED.orders,
+        paid_orders = d.paid_orders + EXCLUDED.paid_orders,
+        completed_orders = d.completed_orders + EXCLUDED.completed_orders,
+        volume = d.volume + EXCLUDED.volume;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION rollup_orders()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM rollup_order_delta(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM rollup_order_delta(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER orders_rollup
+    AFTER INSERT OR DELETE OR UPDATE OF status, amount ON orders
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_orders();
+
+CREATE OR REPLACE FUNCTION rollup_items()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM rollup_add('items', -1);
+        IF OLD.status = 'active' THEN PERFORM rollup_add('items_active', -1); END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM rollup_add('items', 1);
+        IF NEW.status = 'active' THEN PERFORM rollup_add('items_active', 1); END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER items_rollup
+    AFTER INSERT OR DELETE OR UPDATE OF status ON items
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_items();
+
+CREATE OR REPLACE FUNCTION rollup_agents()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM rollup_add('sellers', CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER agents_rollup
+    AFTER INSERT OR DELETE ON agents
+    FOR EACH ROW
+    EXECUTE FUNCTION rollup_agents();
+
+-- 从明细表全量重建（首次上线 / 对账）；锁住三张源表，期间写入会等待
+CREATE OR REPLACE FUNCTION rebuild_rollups()
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE agents, items, orders IN SHARE MODE;
+    DELETE FROM market_rollup;
+    DELETE FROM seller_stats;
+    DELETE FROM seller_daily_stats;
+
+    INSERT INTO market_rollup (metric, value)
+    SELECT 'sellers', count(*) FROM agents
+    UNION ALL SELECT 'items', count(*) FROM items
+    UNION ALL SELECT 'items_active', count(*) FROM items WHERE status = 'active'
+    UNION ALL SELECT 'orders', count(*) FROM orders
+    UNION ALL SELECT 'volume', coalesce(sum(amount), 0) FROM orders
+        WHERE status IN ('paid','processing','delivered','completed')
+    UNION ALL SELECT 'status:' || status, count(*) FROM orders GROUP BY status;
+
+    INSERT INTO seller_daily_stats (seller_wallet, day, orders, paid_orders, completed_orders, volume)
+    SELECT seller_wallet, created_at::date, count(*),
+           count(*) FILTER (WHERE status IN ('paid','processing','delivered','completed')),
+           count(*) FILTER (WHERE status = 'completed'),
+           coalesce(sum(amount) FILTER (WHERE status IN ('paid','processing','delivered','completed')), 0)
+    FROM orders GROUP BY seller_wallet, created_at::date;
+
+    INSERT INTO seller_stats (seller_wallet, orders, paid_orders, completed_orders, volume)
+    SELECT seller_wallet, sum(orders), sum(paid_orders), sum(completed_orders), sum(volume)
+    FROM seller_daily_stats GROUP BY seller_wallet;
+END;
+$$ LANGUAGE plpgsql;
+
 -- Row Level Security (RLS)
 ALTER TABLE agents ENABLE ROW LEVEL SECURITY;
 ALTER TABLE items ENABLE ROW LEVEL SECURITY;
@@ -131,12 +511,22 @@ ALTER TABLE orders ENABLE ROW LEVEL SECURITY;
 ALTER TABLE messages ENABLE ROW LEVEL SECURITY;
 ALTER TABLE auth_challenges ENABLE ROW LEVEL SECURITY;
 ALTER TABLE agent_events ENABLE ROW LEVEL SECURITY;
+ALTER TABLE outbox ENABLE ROW LEVEL SECURITY;
+ALTER TABLE ws_presence ENABLE ROW LEVEL SECURITY;
+ALTER TABLE chain_checkpoints ENABLE ROW LEVEL SECURITY;
+ALTER TABLE autoconfirm_schedule ENABLE ROW LEVEL SECURITY;
+ALTER TABLE market_rollup ENABLE ROW LEVEL SECURITY;
+ALTER TABLE seller_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE seller_daily_stats ENABLE ROW LEVEL SECURITY;
 
 -- 允许所有人读取
 CREATE POLICY "Allow public read on agents" ON agents FOR SELECT USING (true);
 CREATE POLICY "Allow public read on items" ON items FOR SELECT USING (true);
 CREATE POLICY "Allow public read on orders" ON orders FOR SELECT USING (true);
 CREATE POLICY "Allow public read on messages" ON messages FOR SELECT USING (true);
+CREATE POLICY "Allow public read on market_rollup" ON market_rollup FOR SELECT USING (true);
+CREATE POLICY "Allow public read on seller_stats" ON seller_stats FOR SELECT USING (true);
+CREATE POLICY "Allow public read on seller_daily_stats" ON seller_daily_stats FOR SELECT USING (true);
 
 -- 只允许 service_role 写入
 CREATE POLICY "Allow service role insert on agents" ON agents FOR INSERT WITH CHECK (true);
@@ -148,3 +538,31 @@ CREATE POLICY "Allow service role update on orders" ON orders FOR UPDATE USING (
 CREATE POLICY "Allow service role all on auth_challenges" ON auth_challenges FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Allow service role insert on messages" ON messages FOR INSERT WITH CHECK (true);
 CREATE POLICY "Allow service role all on agent_events" ON agent_events FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Allow service role all on outbox" ON outbox FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Allow service role all on ws_presence" ON ws_presence FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Allow service role all on chain_checkpoints" ON chain_checkpoints FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Allow service role all on autoconfirm_schedule" ON autoconfirm_schedule FOR ALL USING (true) WITH CHECK (true);
+
+-- ========== 迁移（已有表执行） ==========
+-- agent_events 分页 drain 需要 (wallet, created_at, event_id) 复合索引
+-- DROP INDEX IF EXISTS idx_events_wallet_undelivered;
+-- CREATE INDEX idx_events_wallet_undelivered ON agent_events(wallet, created_at, event_id) WHERE delivered = FALSE;
+-- outbox: 执行上面的 outbox 表、idx_outbox_pending、outbox_orders / outbox_messages 触发器和 claim_outbox()
+-- outbox 清理：执行上面的 idx_outbox_processed 和 purge_outbox()
+-- outbox 事件幂等：ALTER TABLE agent_events ADD COLUMN IF NOT EXISTS dedupe_key TEXT UNIQUE;
+-- ws_presence: 执行上面的 ws_presence 表 + idx_ws_presence_worker（WS_BACKPLANE=postgres 时需要）
+-- 列表分页：执行上面的 idx_*_created 索引；之后 idx_orders_buyer / idx_orders_seller / idx_messages_order 是前缀冗余，可以 DROP
+-- rollup: 执行上面的 market_rollup / seller_stats / seller_daily_stats 表、rollup_* 函数和触发器，然后 SELECT rebuild_rollups();
+-- rollup 分片（已建过单行版 market_rollup 的库）：DROP TABLE market_rollup; 重新执行上面的 market_rollup 表、
+--   RLS policy 和 rollup_add()，然后 SELECT rebuild_rollups();
+-- escrow 索引器：
+--   ALTER TABLE orders ADD COLUMN IF NOT EXISTS order_id_bytes32 TEXT UNIQUE;
+--   ALTER TABLE orders ADD COLUMN IF NOT EXISTS escrow_status TEXT;
+--   ALTER TABLE orders ADD COLUMN IF NOT EXISTS deposited_at TIMESTAMP;
+--   执行上面的 chain_checkpoints 表 + RLS policy，然后 python scripts/backfill_order_keys.py 回填旧订单的 order_id_bytes32
+-- autoConfirm 到期队列：执行上面的 autoconfirm_schedule 表、idx_autoconfirm_due、schedule_autoconfirm() + orders_autoconfirm 触发器和 RLS，
+--   然后把已在途的订单排进去（重启后调度器会立即补发已过期的）：
+--   INSERT INTO autoconfirm_schedule (order_id, due_at)
+--   SELECT order_id, COALESCE(deposited_at, updated_at) + INTERVAL '1 day' FROM orders
+--   WHERE status IN ('paid','processing','needs_clarification','delivered') AND COALESCE(escrow_status, 'deposited') = 'deposited'
+--   ON CONFLICT (order_id) DO NOTHING;
@@ -6,7 +6,6 @@ import asyncio
 import logging
 import sys
 from contextlib import asynccontextmanager
-from datetime import datetime, timezone, timedelta
 
 import os
 
@@ -14,10 +13,24 @@ import uvicorn
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 
-from config import PORT, PROTOCOL_VERSION, ESCROW_CONTRACT_ADDRESS, BASE_RPC_URL
+from config import (
+    PORT, PROTOCOL_VERSION, ESCROW_CONTRACT_ADDRESS, WS_MAX_INFLIGHT, ESCROW_INDEXER_ENABLED,
+    AUTOCONFIRM_ENABLED, DEPLOYER_PRIVATE_KEY,
+)
+from db.client import close_supabase
+from net.http import init_http_clients, close_http_clients
 from market.service import MarketService
 from ws.connection import ConnectionManager
+from ws.backplane import new_backplane
+from ws.presence import new_presence
 from ws.handler import WSHandler
+from ws.session import WSSession
+from ws import protocol as P
+from market.outbox import OutboxDispatcher
+from chain.escrow import EscrowIndexer
+from chain.autoconfirm import AutoConfirmer
+from chain.submitter import TxSubmitter
+from tg.notify import send_notification
 from api.routes import router, init as init_routes
 
 logging.basicConfig(
@@ -30,10 +43,10 @@ logger = logging.getLogger("pactum-gateway")
 # ========== 初始化 ==========
 
 market = MarketService()
-manager = ConnectionManager(market.supabase)
+manager = ConnectionManager(market, backplane=new_backplane(), presence=new_presence(market.supabase))
 ws_handler = WSHandler(market, manager)
-
-init_routes(market, manager)
+outbox_dispatcher = OutboxDispatcher(market, manager, notify=send_notification)
+escrow_indexer = EscrowIndexer(market)
 
 # ========== Telegram Bot ==========
 
@@ -45,94 +58,25 @@ if TELEGRAM_BOT_TOKEN:
     from tg import notify as tg_notify
     _tg_bot = PactumBot(TELEGRAM_BOT_TOKEN, market.supabase)
     tg_notify.init(_tg_bot.bot, market.supabase)
+    # /bind /unbind 可能落在任一 worker，绑定缓存失效要广播给所有 worker
+    manager.on_broadcast("tg_binding", lambda data: tg_notify.invalidate_binding(data.get("wallet", "")))
+    tg_notify.set_broadcast(lambda wallet: manager.broadcast("tg_binding", {"wallet": wallet}))
     logger.info("Telegram bot initialized")
 else:
     logger.warning("TELEGRAM_BOT_TOKEN not set — Telegram bot disabled")
 
 
-# ========== AutoConfirm Cron ==========
-
-ESCROW_ABI = [
-    {
-        "inputs": [{"name": "orderId", "type": "bytes32"}],
-        "name": "autoConfirm",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"name": "orderId", "type": "bytes32"}],
-        "name": "isConfirmable",
-        "outputs": [{"name": "", "type": "bool"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-]
-
-DEPLOYER_PRIVATE_KEY = None  # 从环境变量读
-
-
-async def auto_confirm_loop():
-    """每小时扫描 paid 订单，超过1天调 autoConfirm"""
-    import os
-    from web3 import Web3
-
-    pk = os.getenv("DEPLOYER_PRIVATE_KEY")
-    if not pk or not BASE_RPC_URL or not ESCROW_CONTRACT_ADDRESS:
-        logger.warning("[cron] AutoConfirm disabled — missing DEPLOYER_PRIVATE_KEY or RPC/escrow config")
-        return
-
-    w3 = Web3(Web3.HTTPProvider(BASE_RPC_URL))
-    escrow = w3.eth.contract(
-        address=Web3.to_checksum_address(ESCROW_CONTRACT_ADDRESS),
-        abi=ESCROW_ABI,
-    )
-    account = w3.eth.account.from_key(pk)
-
-    while True:
-        try:
-            # 查 paid 状态且超过1天的订单
-            cutoff = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
-            result = (
-                market.supabase.table("orders")
-                .select("order_id, tx_hash")
-                .eq("status", "paid")
-                .lt("updated_at", cutoff)
-                .execute()
-            )
-            orders = result.data or []
-            if orders:
-                logger.info(f"[cron] Found {len(orders)} orders eligible for autoConfirm")
-
-            for order in orders:
-                try:
-                    order_id_bytes32 = Web3.keccak(text=order["order_id"])
-                    confirmable = escrow.functions.isConfirmable(order_id_bytes32).call()
-                    if not confirmable:
-                        continue
-
-                    tx = escrow.functions.autoConfirm(order_id_bytes32).build_transaction({
-                        "from": account.address,
-                        "nonce": w3.eth.get_transaction_count(account.address),
-                        "gas": 100000,
-                        "gasPrice": w3.eth.gas_price,
-                    })
-                    signed = account.sign_transaction(tx)
-                    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-                    w3.eth.wait_for_transaction_receipt(tx_hash, timeout=60)
-
-                    market.supabase.table("orders").update(
-                        {"status": "completed"}
-                    ).eq("order_id", order["order_id"]).execute()
-
-                    logger.info(f"[cron] AutoConfirmed order {order['order_id']} tx={tx_hash.hex()}")
-                except Exception as e:
-                    logger.error(f"[cron] Failed to autoConfirm {order['order_id']}: {e}")
+# ========== AutoConfirm ==========
 
-        except Exception as e:
-            logger.error(f"[cron] AutoConfirm loop error: {e}")
+auto_confirmer = None
+if not AUTOCONFIRM_ENABLED:
+    logger.info("[cron] AutoConfirm disabled on this instance (AUTOCONFIRM_ENABLED=false)")
+elif DEPLOYER_PRIVATE_KEY and market.rpc and ESCROW_CONTRACT_ADDRESS:
+    auto_confirmer = AutoConfirmer(market, TxSubmitter(market.rpc, DEPLOYER_PRIVATE_KEY))
+else:
+    logger.warning("[cron] AutoConfirm disabled — missing DEPLOYER_PRIVATE_KEY or RPC/escrow config")
 
-        await asyncio.sleep(3600)  # 每小时跑一次
+init_routes(market, manager, escrow_indexer, auto_confirmer)
 
 
 # ========== Lifespan ==========
@@ -140,7 +84,15 @@ async def auto_confirm_loop():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info(f"Pactum Gateway v{PROTOCOL_VERSION} started")
-    asyncio.create_task(auto_confirm_loop())
+    init_http_clients()
+    if auto_confirmer:
+        auto_confirmer.start()
+    if _tg_bot:
+        tg_notify.start()
+    await manager.start()
+    outbox_dispatcher.start()
+    if ESCROW_INDEXER_ENABLED:
+        escrow_indexer.start()
 
     # 设置 Telegram webhook
     if _tg_bot:
@@ -156,12 +108,20 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    if auto_confirmer:
+        await auto_confirmer.stop()
+    await escrow_indexer.stop()
+    await outbox_dispatcher.stop()
+    await manager.stop()
     if _tg_bot:
+        await tg_notify.stop()
         try:
             await _tg_bot.bot.delete_webhook()
             await _tg_bot.app.shutdown()
         except Exception:
             pass
+    await close_http_clients()
+    await close_supabase()
     logger.info("Pactum Gateway shutting down")
 
 
@@ -200,27 +160,53 @@ async def telegram_webhook(request: Request):
 
 @app.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
+    """
+    同一连接上的消息并发处理（最多 WS_MAX_INFLIGHT 个在途），响应用 reply_to 对应请求 id
+    /ws?ordered=true 时逐条处理、按发送顺序回复；auth 总是串行处理
+    所有写出都经 WSSession 的出站队列（响应、推送、心跳）
+    """
     await ws.accept()
-    wallet = None
+    session = WSSession(ws)
+    ws.state.session = session
+    session.start()
+    ordered = ws.query_params.get("ordered", "").lower() in ("1", "true")
+    inflight = asyncio.Semaphore(1 if ordered else WS_MAX_INFLIGHT)
+    pending: set[asyncio.Task] = set()
+
+    async def dispatch(msg):
+        try:
+            response = await ws_handler.handle(ws, msg)
+            if response:
+                await session.send(response)
+        except Exception as e:
+            logger.debug(f"WS reply dropped: {e}")
+        finally:
+            inflight.release()
 
     try:
         while True:
             msg = await ws.receive_json()
-            response = await ws_handler.handle(ws, msg)
-
-            # 认证成功后记录 wallet
-            if not wallet:
-                wallet = getattr(ws.state, "wallet", None)
-
-            if response:
-                await ws.send_json(response)
+            session.touch()
+            if isinstance(msg, dict) and msg.get("type") == P.PONG:
+                continue
+            await inflight.acquire()  # 在途满了就先不读下一帧（背压）
+            if ordered or not isinstance(msg, dict) or msg.get("type") == "auth":
+                await dispatch(msg)
+            else:
+                task = asyncio.create_task(dispatch(msg))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
     except WebSocketDisconnect:
         pass
     except Exception as e:
         logger.error(f"WS error: {e}")
     finally:
+        # 在途请求（比如 pay）继续跑完，回复会因连接已关闭被丢弃
+        wallet = getattr(ws.state, "wallet", None)
         if wallet:
-            manager.disconnect(wallet)
+            await manager.disconnect(wallet, ws)
+        await session.close()
+        await session.wait_closed()
 
 
 if __name__ == "__main__":
@@ -5,11 +5,12 @@ JWT payload: { wallet, token_id (可选), api_key (用于注册时 mint), iat, e
 import uuid
 from datetime import datetime, timedelta, timezone
 
-import httpx
 import jwt
-from supabase import Client
+from supabase import AsyncClient
 from web3 import Web3
 
+from market.principal import principal_cache
+from net.http import http_client
 from config import JWT_SECRET, JWT_ALGORITHM, JWT_TTL_HOURS, CHALLENGE_TTL_MINUTES, WALLET_SERVICE_URL
 
 
@@ -28,11 +29,11 @@ def _build_token(wallet: str, token_id: int | None = None, api_key: str | None =
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
 
-def create_challenge(supabase: Client) -> dict:
+async def create_challenge(supabase: AsyncClient) -> dict:
     challenge = str(uuid.uuid4())
     expires_at = datetime.now(timezone.utc) + timedelta(minutes=CHALLENGE_TTL_MINUTES)
 
-    supabase.table("auth_challenges").insert({
+    await supabase.table("auth_challenges").insert({
         "challenge": challenge,
         "expires_at": expires_at.isoformat(),
         "used": False,
@@ -44,16 +45,16 @@ def create_challenge(supabase: Client) -> dict:
     }
 
 
-def verify_challenge(
-    supabase: Client,
-    contract,
+async def verify_challenge(
+    supabase: AsyncClient,
+    verifier,
     wallet: str,
     challenge: str,
     timestamp: int,
     signature: str,
 ) -> str:
     """验证 EIP-712 签名，返回 JWT token"""
-    result = (
+    result = await (
         supabase.table("auth_challenges")
         .select("*")
         .eq("challenge", challenge)
@@ -70,41 +71,33 @@ def verify_challenge(
     if datetime.now(timezone.utc) > expires_at:
         raise ValueError("Challenge expired")
 
-    supabase.table("auth_challenges").update(
+    await supabase.table("auth_challenges").update(
         {"used": True, "wallet": wallet.lower()}
     ).eq("challenge", challenge).execute()
 
-    # 链上验证
-    if contract:
+    # 本地 EIP-712 验签（AUTH_VERIFY_MODE 可切到链上 verifyEIP712 或两边交叉核对）
+    token_id = None
+    if verifier:
         try:
-            checksum = Web3.to_checksum_address(wallet)
-            challenge_bytes = Web3.keccak(text=challenge)
-            sig_bytes = bytes.fromhex(signature.replace("0x", ""))
-
-            is_valid = contract.functions.verifyEIP712(
-                checksum, challenge_bytes, timestamp, sig_bytes
-            ).call()
-
-            print(f"[AUTH] wallet={checksum} challenge_bytes={challenge_bytes.hex()} timestamp={timestamp} sig_len={len(sig_bytes)} is_valid={is_valid}")
-
-            if not is_valid:
-                raise ValueError("EIP-712 signature verification failed on-chain")
+            token_id = await verifier.verify(wallet, challenge, timestamp, signature)
         except ValueError:
             raise
         except Exception as e:
-            raise ValueError(f"On-chain verification error: {e}")
+            raise ValueError(f"Signature verification error: {e}")
     else:
-        print(f"[DEV] Skipping on-chain verification for {wallet}")
+        print(f"[DEV] Skipping signature verification for {wallet}")
 
-    # 查链上 NFT token_id
-    token_id = _get_token_id(contract, wallet)
     return _build_token(wallet, token_id=token_id)
 
 
 def decode_token(token: str) -> dict:
-    """解码 JWT，返回完整 payload（含 wallet, token_id, api_key）"""
+    """解码 JWT，返回完整 payload（含 wallet, token_id, api_key）；同一 token 走 principal_cache"""
+    cached = principal_cache.get_claims(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        principal_cache.put_claims(token, payload)
         return payload
     except jwt.ExpiredSignatureError:
         raise ValueError("Token expired")
@@ -117,19 +110,22 @@ def get_wallet_from_token(token: str) -> str:
     return decode_token(token)["wallet"]
 
 
-def _get_token_id(contract, wallet: str) -> int | None:
-    """查链上 walletToToken，返回 token_id（0 表示未注册）"""
+async def _get_token_id(contract, wallet: str, reader=None) -> int | None:
+    """查链上 walletToToken，返回 token_id（0 表示未注册）；有 reader 时和并发登录合并成一次 multicall"""
     if not contract:
         return None
     try:
         checksum = Web3.to_checksum_address(wallet)
-        tid = contract.functions.walletToToken(checksum).call()
+        if reader:
+            tid = await reader.one(contract, "walletToToken", checksum)
+        else:
+            tid = await contract.call("walletToToken", checksum)
         return tid if tid > 0 else None
     except Exception:
         return None
 
 
-async def authenticate_wallet_user(api_key: str, contract=None) -> dict:
+async def authenticate_wallet_user(api_key: str, contract=None, reader=None) -> dict:
     """
     用 Wallet Service API key 认证：
     1. 调 Wallet GET /v1/balance 验证 key
@@ -137,19 +133,19 @@ async def authenticate_wallet_user(api_key: str, contract=None) -> dict:
     3. 查链上 NFT token_id
     4. 签发 JWT（含 token_id + api_key）
     """
-    async with httpx.AsyncClient(timeout=15) as client:
-        resp = await client.get(
-            f"{WALLET_SERVICE_URL}/v1/balance",
-            headers={"Authorization": f"Bearer {api_key}"},
-        )
-        if resp.status_code != 200:
-            raise ValueError("Invalid Wallet API key")
-        data = resp.json()
+    resp = await http_client("wallet").get(
+        f"{WALLET_SERVICE_URL}/v1/balance",
+        headers={"Authorization": f"Bearer {api_key}"},
+        timeout=15,
+    )
+    if resp.status_code != 200:
+        raise ValueError("Invalid Wallet API key")
+    data = resp.json()
 
     wallet = data["wallet_address"].lower()
 
     # 查链上 NFT
-    token_id = _get_token_id(contract, wallet)
+    token_id = await _get_token_id(contract, wallet, reader)
 
     token = _build_token(wallet, token_id=token_id, api_key=api_key)
     return {
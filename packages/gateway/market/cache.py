@@ -0,0 +1,71 @@
+"""
+商品目录内存缓存 — LRU + TTL，按命名空间分桶
+- item:   (item_id,)            → 商品详情
+- search: (query, filters, ...) → 搜索结果页
+- agents: (limit, cursor)       → 卖家列表页
+写路径（list_item / update_item / delete_item / register_*）精确失效，TTL 兜底其他进程/直接改库
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+_MISSING = object()
+
+
+class CatalogCache:
+    def __init__(self, max_size: int = 2048, ttl_seconds: float = 10, enabled: bool = True):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: OrderedDict[tuple, tuple[Any, float]] = OrderedDict()  # (ns, key) → (value, expires)
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+    def get(self, ns: str, key: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        entry = self._entries.get((ns, key))
+        if entry is None or time.monotonic() > entry[1]:
+            if entry is not None:
+                self._entries.pop((ns, key), None)
+            self._misses[ns] = self._misses.get(ns, 0) + 1
+            return default
+        self._entries.move_to_end((ns, key))
+        self._hits[ns] = self._hits.get(ns, 0) + 1
+        return entry[0]
+
+    def put(self, ns: str, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        self._entries[(ns, key)] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end((ns, key))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, ns: str, key: Hashable = _MISSING) -> None:
+        """删除单个 key；不传 key 时清空整个命名空间"""
+        if key is not _MISSING:
+            self._entries.pop((ns, key), None)
+            return
+        self.invalidate_where(ns, lambda _k, _v: True)
+
+    def invalidate_where(self, ns: str, predicate: Callable[[Any, Any], bool]) -> None:
+        stale = [k for k, (v, _) in self._entries.items() if k[0] == ns and predicate(k[1], v)]
+        for k in stale:
+            self._entries.pop(k, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        namespaces = set(self._hits) | set(self._misses)
+        out: Dict[str, Any] = {"enabled": self.enabled, "entries": len(self._entries), "max_size": self.max_size}
+        for ns in sorted(namespaces):
+            hits, misses = self._hits.get(ns, 0), self._misses.get(ns, 0)
+            out[ns] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            }
+        return out
+
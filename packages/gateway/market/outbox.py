@@ -0,0 +1,246 @@
+"""
+Transactional outbox — 订单副作用（WS 推送 / agent_events / Telegram）的后台派发
+- outbox 行由 orders / messages 上的触发器写入，和状态变更在同一个事务里（见 db/schema.sql）
+- OutboxDispatcher 用 claim_outbox() 领取一批（SKIP LOCKED + 租约，多实例安全），
+  按 kind 重新读取订单/消息当前状态后扇出；失败按指数退避重试，超过上限记为死信
+- 写路径调 kick() 唤醒派发器，不用等下一次轮询
+- 每 OUTBOX_PURGE_INTERVAL 秒用 purge_outbox() 分批删掉过了保留期的已处理行（死信保留更久）
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from config import (
+    OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, OUTBOX_MAX_ATTEMPTS, OUTBOX_LEASE_SECONDS,
+    OUTBOX_RETENTION_DAYS, OUTBOX_DEAD_RETENTION_DAYS, OUTBOX_PURGE_INTERVAL,
+)
+from ws import protocol as P
+
+logger = logging.getLogger("pactum.outbox")
+
+_wakeup = asyncio.Event()
+
+PURGE_BATCH_SIZE = 5000
+
+
+def kick():
+    """写路径提交后调用：立即唤醒派发器"""
+    _wakeup.set()
+
+
+class OutboxDispatcher:
+    def __init__(self, market, manager, notify: Callable[[str, str, dict], Awaitable[None]]):
+        self.market = market
+        self.manager = manager
+        self.notify = notify
+        self.supabase = market.supabase
+        self._task: asyncio.Task | None = None
+        self._purged_at = time.monotonic()  # 启动后先等一个间隔再清理
+        self.purged = 0
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {
+            "order_new": self._order_new,
+            "payment_confirmed": self._payment_confirmed,
+            "processing": self._processing,
+            "delivery": self._delivery,
+            "message_received": self._message_received,
+        }
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        logger.info("Outbox dispatcher started")
+        while True:
+            try:
+                n = await self.dispatch_once()
+                if n >= OUTBOX_BATCH_SIZE:
+                    continue  # 还有积压，马上领下一批
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox dispatch error: {e}")
+            if time.monotonic() - self._purged_at >= OUTBOX_PURGE_INTERVAL:
+                self._purged_at = time.monotonic()
+                try:
+                    await self.purge()
+                except Exception as e:
+                    logger.error(f"Outbox purge error: {e}")
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def purge(self) -> int:
+        """分批删除过了保留期的已处理行，返回删除总数"""
+        total = 0
+        while True:
+            result = await self.supabase.rpc("purge_outbox", {
+                "retention_seconds": int(OUTBOX_RETENTION_DAYS * 86400),
+                "dead_retention_seconds": int(OUTBOX_DEAD_RETENTION_DAYS * 86400),
+                "batch_size": PURGE_BATCH_SIZE,
+            }).execute()
+            n = int(result.data or 0)
+            total += n
+            if n < PURGE_BATCH_SIZE:
+                break
+        if total:
+            self.purged += total
+            logger.info(f"Outbox purged {total} processed rows")
+        return total
+
+    async def dispatch_once(self) -> int:
+        result = await self.supabase.rpc("claim_outbox", {
+            "batch_size": OUTBOX_BATCH_SIZE,
+            "lease_seconds": OUTBOX_LEASE_SECONDS,
+        }).execute()
+        rows = result.data or []
+        done: List[int] = []
+        for row in rows:
+            handler = self._handlers.get(row["kind"])
+            try:
+                if handler:
+                    await handler(row)
+                else:
+                    logger.warning(f"Outbox: unknown kind {row['kind']} (id={row['id']})")
+                done.append(row["id"])
+            except Exception as e:
+                await self._retry(row, e)
+
+        if done:
+            await (
+                self.supabase.table("outbox")
+                .update({"processed_at": _now().isoformat(), "locked_until": None, "last_error": None})
+                .in_("id", done)
+                .execute()
+            )
+        return len(rows)
+
+    async def _retry(self, row: Dict[str, Any], error: Exception):
+        attempts = row.get("attempts") or 1
+        update: Dict[str, Any] = {"last_error": str(error)[:500], "locked_until": None}
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            update["processed_at"] = _now().isoformat()  # 死信：保留 last_error 便于排查
+            logger.error(f"Outbox {row['kind']} id={row['id']} gave up after {attempts} attempts: {error}")
+        else:
+            update["available_at"] = (_now() + timedelta(seconds=min(2 ** attempts, 300))).isoformat()
+            logger.warning(f"Outbox {row['kind']} id={row['id']} attempt {attempts} failed: {error}")
+        await self.supabase.table("outbox").update(update).eq("id", row["id"]).execute()
+
+    # ========== 扇出 ==========
+
+    async def _load_order(self, order_id: str) -> Dict[str, Any] | None:
+        result = await (
+            self.supabase.table("orders")
+            .select("*, items(name)")
+            .eq("order_id", order_id)
+            .execute()
+        )
+        return result.data[0] if result.data else None
+
+    async def _order_new(self, row: Dict[str, Any]):
+        order = await self._load_order(row["order_id"])
+        if not order:
+            return
+        await self.manager.send_to(order["seller_wallet"], {
+            "type": P.ORDER_NEW,
+            "order_id": order["order_id"],
+            "item_id": order["item_id"],
+            "buyer_wallet": order["buyer_wallet"],
+            "amount": str(order["amount"]),
+            "buyer_query": order.get("buyer_query"),
+        })
+        tg_data = {
+            "order_id": order["order_id"],
+            "amount": str(order["amount"]),
+            "buyer_wallet": order["buyer_wallet"],
+            "item_name": (order.get("items") or {}).get("name", "?"),
+            "buyer_query": order.get("buyer_query"),
+        }
+        await self.notify(order["seller_wallet"], "order_new", {**tg_data, "role": "seller"})
+        await self.notify(order["buyer_wallet"], "order_new", {**tg_data, "role": "buyer"})
+
+    async def _payment_confirmed(self, row: Dict[str, Any]):
+        order = await self._load_order(row["order_id"])
+        if not order:
+            return
+        await self.manager.send_to(order["seller_wallet"], {
+            "type": P.PAYMENT_CONFIRMED,
+            "order_id": order["order_id"],
+            "buyer_wallet": order["buyer_wallet"],
+            "tx_hash": order.get("tx_hash"),
+            "amount": str(order["amount"]),
+        })
+        tg_data = {
+            "order_id": order["order_id"],
+            "amount": str(order["amount"]),
+            "buyer_wallet": order["buyer_wallet"],
+            "tx_hash": order.get("tx_hash") or "",
+        }
+        await self.notify(order["seller_wallet"], "payment_confirmed", {**tg_data, "role": "seller"})
+        await self.notify(order["buyer_wallet"], "payment_confirmed", {**tg_data, "role": "buyer"})
+
+    async def _processing(self, row: Dict[str, Any]):
+        """触发器把这条延后到卖家 endpoint 超时之后；到时仍是 processing 才通知买家"""
+        order = await self._load_order(row["order_id"])
+        if not order or order["status"] != "processing":
+            return
+        await self.notify(order["buyer_wallet"], "processing", {
+            "order_id": order["order_id"], "role": "buyer",
+        })
+
+    async def _delivery(self, row: Dict[str, Any]):
+        order = await self._load_order(row["order_id"])
+        if not order:
+            return
+        result = order.get("result") or {}
+        delivery = {
+            "order_id": order["order_id"],
+            "content": result.get("content"),
+            "tracking": result.get("tracking"),
+            "file_url": result.get("file_url"),
+        }
+        # 买家可通过 GET /market/events 拉取；经 manager 写入，本 worker 上挂起的长轮询 / SSE 立即唤醒
+        # 后面的推送 / 通知失败会重试整个 handler，按 outbox id 去重，不会写出第二条 order_delivered
+        await self.manager.store_event(
+            order["buyer_wallet"], "order_delivered", delivery, dedupe_key=f"outbox:{row['id']}",
+        )
+        await self.manager.send_to(order["buyer_wallet"], {
+            "type": P.DELIVERY,
+            "seller_wallet": order["seller_wallet"],
+            **delivery,
+        })
+        tg_data = {**delivery, "item_name": (order.get("items") or {}).get("name")}
+        await self.notify(order["buyer_wallet"], "delivery", {**tg_data, "role": "buyer"})
+        await self.notify(order["seller_wallet"], "delivery", {**tg_data, "role": "seller"})
+
+    async def _message_received(self, row: Dict[str, Any]):
+        result = await (
+            self.supabase.table("messages")
+            .select("*")
+            .eq("message_id", row["ref_id"])
+            .execute()
+        )
+        if not result.data:
+            return
+        m = result.data[0]
+        payload = {
+            "order_id": m["order_id"],
+            "from_wallet": m["from_wallet"],
+            "content": m["content"],
+        }
+        await self.manager.send_to(m["to_wallet"], {"type": P.MESSAGE_RECEIVED, **payload})
+        await self.notify(m["to_wallet"], "message_received", payload)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
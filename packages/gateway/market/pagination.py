@@ -0,0 +1,59 @@
+"""
+Keyset 分页 — 不透明 cursor = base64url(json [排序列值, 主键])
+下一页条件: (ts, id) < (cursor_ts, cursor_id)（desc）或 >（asc），配合 (ts, id) 复合索引
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def clamp_limit(limit: Optional[int], default: int = DEFAULT_LIMIT, maximum: int = MAX_LIMIT) -> int:
+    if not limit or limit < 1:
+        return default
+    return min(int(limit), maximum)
+
+
+def encode_cursor(ts: Any, key: Any) -> str:
+    raw = json.dumps([ts, key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return str(ts), str(key)
+
+
+def ts_minus(ts: str, seconds: float) -> str:
+    """cursor 里的时间戳往前挪 seconds 秒（解析不了就原样返回）"""
+    try:
+        parsed = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except ValueError:
+        return ts
+    return (parsed - timedelta(seconds=seconds)).isoformat()
+
+
+def apply_keyset(qb, cursor: Optional[str], limit: int, ts_col: str, id_col: str, desc: bool = True):
+    """给 PostgREST 查询加排序 + cursor 条件，多取 1 行用来判断是否还有下一页"""
+    if cursor:
+        ts, key = decode_cursor(cursor)
+        op = "lt" if desc else "gt"
+        # 值里有 : . 等保留字符，PostgREST 要求加双引号
+        qb = qb.or_(f'{ts_col}.{op}."{ts}",and({ts_col}.eq."{ts}",{id_col}.{op}."{key}")')
+    return qb.order(ts_col, desc=desc).order(id_col, desc=desc).limit(limit + 1)
+
+
+def split_page(rows: List[Dict[str, Any]], limit: int, ts_col: str, id_col: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """截断到 limit 行，返回 (rows, next_cursor)；没有下一页时 next_cursor=None"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[ts_col], last[id_col])
@@ -0,0 +1,78 @@
+"""
+请求级身份 — 每个请求只解一次 JWT、只查一次注册状态
+PrincipalCache: 已解码 token（有效期不超过 JWT exp）+ 已注册钱包，LRU + TTL
+注册流程直接写入缓存；只缓存「已注册」，未注册每次都回库确认
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from config import PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL
+
+
+@dataclass
+class Principal:
+    wallet: str
+    claims: Dict[str, Any] = field(default_factory=dict)
+    registered: Optional[bool] = None  # None = 还没查过
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return self.claims.get("api_key")
+
+
+class PrincipalCache:
+    def __init__(self, max_size: int = 4096, ttl_seconds: float = 60):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._tokens: OrderedDict[str, tuple[dict, float]] = OrderedDict()  # sha256(token) → (claims, expires)
+        self._registered: OrderedDict[str, float] = OrderedDict()  # wallet → expires
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get_claims(self, token: str) -> Optional[dict]:
+        key = self._token_key(token)
+        entry = self._tokens.get(key)
+        if not entry:
+            return None
+        claims, expires = entry
+        if time.time() > expires:
+            self._tokens.pop(key, None)
+            return None
+        self._tokens.move_to_end(key)
+        return claims
+
+    def put_claims(self, token: str, claims: dict) -> None:
+        expires = time.time() + self.ttl_seconds
+        if "exp" in claims:
+            expires = min(expires, float(claims["exp"]))
+        self._tokens[self._token_key(token)] = (claims, expires)
+        self._trim(self._tokens)
+
+    def is_registered(self, wallet: str) -> bool:
+        wallet = wallet.lower()
+        expires = self._registered.get(wallet)
+        if expires is None:
+            return False
+        if time.monotonic() > expires:
+            self._registered.pop(wallet, None)
+            return False
+        self._registered.move_to_end(wallet)
+        return True
+
+    def mark_registered(self, wallet: str) -> None:
+        self._registered[wallet.lower()] = time.monotonic() + self.ttl_seconds
+        self._registered.move_to_end(wallet.lower())
+        self._trim(self._registered)
+
+    def _trim(self, entries: OrderedDict) -> None:
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+
+
+# 全局缓存实例
+principal_cache = PrincipalCache(max_size=PRINCIPAL_CACHE_SIZE, ttl_seconds=PRINCIPAL_CACHE_TTL)
@@ -1,26 +1,52 @@
 """
 Pactum Marketplace Service — 核心业务逻辑
 """
+import asyncio
 import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple
 
 import httpx
-from supabase import create_client, Client
+from supabase import AsyncClient
 from web3 import Web3
 
 from config import (
-    SUPABASE_URL, SUPABASE_KEY,
     PACTUM_AGENT_CONTRACT_ADDRESS, BASE_RPC_URL,
     ESCROW_CONTRACT_ADDRESS, USDC_CONTRACT_ADDRESS, PAYMASTER_URL,
-    WALLET_SERVICE_URL,
+    WALLET_SERVICE_URL, CATALOG_CACHE_ENABLED, CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL,
 )
 
 logger = logging.getLogger("pactum.market")
+from chain.rpc import ChainRpc, ChainContract
+from chain.eip712 import AuthVerifier
+from chain.escrow import order_key, usdc_units
+from chain.multicall import MulticallReader
+from db.client import get_supabase
+from net.http import http_client, host_client
+from market import outbox
+from market.cache import CatalogCache
 from market.models import ShippingAddress
+from market.principal import principal_cache
+from market.pagination import clamp_limit, apply_keyset, split_page, encode_cursor, decode_cursor, ts_minus
 from market.address import validate_shipping_address
 
 
+AGENTS_PAGE_DEFAULT = 50
+AGENT_ITEMS_LIMIT = 50  # 每个卖家最多嵌入的 active items
+EVENTS_PAGE_DEFAULT = 100
+EVENTS_PAGE_MAX = 500
+SEARCH_PAGE_DEFAULT = 20
+SEARCH_PAGE_MAX = 100
+SEARCH_QUERY_MAX_LEN = 200
+ORDERS_PAGE_DEFAULT = 20
+ORDERS_PAGE_MAX = 100
+MESSAGES_PAGE_DEFAULT = 100
+MESSAGES_PAGE_MAX = 500
+MY_ITEMS_PAGE_DEFAULT = 50
+MY_ITEMS_PAGE_MAX = 100
+
 # PactumAgent 合约 ABI（最小集）
 CONTRACT_ABI = [
     {
@@ -47,6 +73,26 @@ CONTRACT_ABI = [
         "stateMutability": "view",
         "type": "function",
     },
+    {
+        "inputs": [{"name": "", "type": "uint256"}],
+        "name": "records",
+        "outputs": [
+            {"name": "agentCardHash", "type": "bytes32"},
+            {"name": "registeredAt", "type": "uint256"},
+            {"name": "active", "type": "bool"},
+            {"name": "totalRating", "type": "uint256"},
+            {"name": "reviewCount", "type": "uint256"},
+        ],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [{"name": "", "type": "uint256"}],
+        "name": "tokenSigner",
+        "outputs": [{"name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
     {
         "inputs": [
             {"name": "wallet", "type": "address"},
@@ -74,16 +120,17 @@ CONTRACT_ABI = [
 
 class MarketService:
     def __init__(self):
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        self.w3 = Web3(Web3.HTTPProvider(BASE_RPC_URL)) if BASE_RPC_URL else None
-
-        if PACTUM_AGENT_CONTRACT_ADDRESS and self.w3:
-            self.contract = self.w3.eth.contract(
-                address=Web3.to_checksum_address(PACTUM_AGENT_CONTRACT_ADDRESS),
-                abi=CONTRACT_ABI,
-            )
+        self.supabase: AsyncClient = get_supabase()
+        self.catalog = CatalogCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL, enabled=CATALOG_CACHE_ENABLED)
+        self.rpc = ChainRpc(BASE_RPC_URL) if BASE_RPC_URL else None
+        self.reader = MulticallReader(self.rpc) if self.rpc else None
+
+        if PACTUM_AGENT_CONTRACT_ADDRESS and self.rpc:
+            self.contract = ChainContract(self.rpc, PACTUM_AGENT_CONTRACT_ADDRESS, CONTRACT_ABI)
+            self.auth_verifier = AuthVerifier(self.contract, self.reader)
         else:
             self.contract = None
+            self.auth_verifier = None
 
     # ========== 注册 ==========
 
@@ -92,10 +139,18 @@ class MarketService:
     ) -> Dict[str, Any]:
         card_hash = "0x" + hashlib.sha256((description or "").encode()).hexdigest()
 
+        # isRegistered + walletToToken 合并成一次 multicall
+        token_id = None
         if self.contract:
             try:
                 checksum = Web3.to_checksum_address(wallet)
-                if not self.contract.functions.isRegistered(checksum).call():
+                registered, token_id = await self.reader.many([
+                    (self.contract, "isRegistered", [checksum]),
+                    (self.contract, "walletToToken", [checksum]),
+                ])
+                if isinstance(registered, Exception):
+                    raise registered
+                if not registered:
                     raise PermissionError(
                         f"Wallet {wallet} not registered on-chain (no PactumAgent NFT)"
                     )
@@ -104,7 +159,7 @@ class MarketService:
             except Exception as e:
                 raise PermissionError(f"On-chain verification failed: {e}")
 
-        existing = (
+        existing = await (
             self.supabase.table("agents")
             .select("wallet")
             .eq("wallet", wallet.lower())
@@ -117,9 +172,9 @@ class MarketService:
         total_reviews = 0
         if self.contract:
             try:
-                checksum = Web3.to_checksum_address(wallet)
-                token_id = self.contract.functions.walletToToken(checksum).call()
-                stats = self.contract.functions.getAgentStats(token_id).call()
+                if isinstance(token_id, Exception):
+                    raise token_id
+                stats = await self.reader.one(self.contract, "getAgentStats", token_id)  # 依赖 token_id，第二轮
                 avg_rating = stats[0] / 100
                 total_reviews = stats[1]
             except Exception as e:
@@ -135,12 +190,31 @@ class MarketService:
         if telegram_group_id:
             data["telegram_group_id"] = telegram_group_id
 
-        result = self.supabase.table("agents").insert(data).execute()
+        result = await self.supabase.table("agents").insert(data).execute()
         if not result.data:
             raise RuntimeError("Failed to insert agent")
 
+        self.catalog.invalidate("agents")
+        principal_cache.mark_registered(wallet)
         return result.data[0]
 
+    # ========== 注册状态 ==========
+
+    async def is_registered(self, wallet: str) -> bool:
+        """agents 表里有没有这个钱包；命中 principal_cache 时不查库"""
+        if principal_cache.is_registered(wallet):
+            return True
+        result = await (
+            self.supabase.table("agents")
+            .select("wallet")
+            .eq("wallet", wallet.lower())
+            .execute()
+        )
+        if not result.data:
+            return False
+        principal_cache.mark_registered(wallet)
+        return True
+
     # ========== 人类卖家注册 ==========
 
     async def register_seller(
@@ -155,7 +229,7 @@ class MarketService:
         wallet_lower = wallet.lower()
         card_hash = "0x" + hashlib.sha256((description or "").encode()).hexdigest()
 
-        existing = (
+        existing = await (
             self.supabase.table("agents")
             .select("wallet, endpoint")
             .eq("wallet", wallet_lower)
@@ -167,7 +241,7 @@ class MarketService:
         if self.contract:
             try:
                 checksum = Web3.to_checksum_address(wallet)
-                if self.contract.functions.isRegistered(checksum).call():
+                if await self.reader.one(self.contract, "isRegistered", checksum):
                     need_mint = False
             except Exception as e:
                 logger.warning(f"isRegistered check failed: {e}")
@@ -186,7 +260,9 @@ class MarketService:
             if email is not None:
                 update_data["email"] = email
             if update_data:
-                self.supabase.table("agents").update(update_data).eq("wallet", wallet_lower).execute()
+                await self.supabase.table("agents").update(update_data).eq("wallet", wallet_lower).execute()
+                self._invalidate_seller(wallet_lower)
+            principal_cache.mark_registered(wallet_lower)
             return {**existing.data[0], **update_data}
         else:
             # 新建
@@ -200,9 +276,11 @@ class MarketService:
             }
             if email:
                 data["email"] = email
-            result = self.supabase.table("agents").insert(data).execute()
+            result = await self.supabase.table("agents").insert(data).execute()
             if not result.data:
                 raise RuntimeError("Failed to insert agent")
+            self.catalog.invalidate("agents")
+            principal_cache.mark_registered(wallet_lower)
             return result.data[0]
 
     async def _mint_agent_nft(self, api_key: str, card_hash: str, wallet: str):
@@ -217,18 +295,18 @@ class MarketService:
         calldata = self.contract.encodeABI(fn_name="registerAgent", args=[card_hash_bytes, signer])
 
         try:
-            async with httpx.AsyncClient(timeout=60) as client:
-                resp = await client.post(
-                    f"{WALLET_SERVICE_URL}/v1/contract-call",
-                    headers={"Authorization": f"Bearer {api_key}"},
-                    json={
-                        "contract_address": PACTUM_AGENT_CONTRACT_ADDRESS,
-                        "calldata": calldata,
-                    },
-                )
-                resp.raise_for_status()
-                result = resp.json()
-                logger.info(f"NFT minted for {wallet}: tx={result.get('tx_hash')}")
+            resp = await http_client("wallet").post(
+                f"{WALLET_SERVICE_URL}/v1/contract-call",
+                headers={"Authorization": f"Bearer {api_key}"},
+                json={
+                    "contract_address": PACTUM_AGENT_CONTRACT_ADDRESS,
+                    "calldata": calldata,
+                },
+                timeout=60,
+            )
+            resp.raise_for_status()
+            result = resp.json()
+            logger.info(f"NFT minted for {wallet}: tx={result.get('tx_hash')}")
         except Exception as e:
             logger.error(f"NFT mint failed for {wallet}: {e}")
             raise ValueError(f"Failed to mint PactumAgent NFT: {e}")
@@ -245,13 +323,7 @@ class MarketService:
         endpoint: str = None,
         requires_shipping: bool = False,
     ) -> Dict[str, Any]:
-        agent = (
-            self.supabase.table("agents")
-            .select("wallet")
-            .eq("wallet", wallet.lower())
-            .execute()
-        )
-        if not agent.data:
+        if not await self.is_registered(wallet):
             raise PermissionError(f"Wallet {wallet} not registered")
 
         if item_type not in ("digital", "physical"):
@@ -271,9 +343,10 @@ class MarketService:
             "status": "active",
         }
 
-        result = self.supabase.table("items").insert(data).execute()
+        result = await self.supabase.table("items").insert(data).execute()
         if not result.data:
             raise RuntimeError("Failed to insert item")
+        self._invalidate_listings()
         return result.data[0]
 
     # ========== 更新商品 ==========
@@ -289,7 +362,7 @@ class MarketService:
         endpoint: str = None,
         requires_shipping: bool = None,
     ) -> Dict[str, Any]:
-        result = (
+        result = await (
             self.supabase.table("items")
             .select("item_id, seller_wallet, status")
             .eq("item_id", item_id)
@@ -323,18 +396,19 @@ class MarketService:
         if not update:
             raise ValueError("No fields to update")
 
-        updated = (
+        updated = await (
             self.supabase.table("items")
             .update(update)
             .eq("item_id", item_id)
             .execute()
         )
+        self._invalidate_item(item_id)
         return updated.data[0]
 
     # ========== 删除商品 ==========
 
     async def delete_item(self, item_id: str, wallet: str) -> Dict[str, Any]:
-        result = (
+        result = await (
             self.supabase.table("items")
             .select("item_id, seller_wallet, status")
             .eq("item_id", item_id)
@@ -347,26 +421,64 @@ class MarketService:
         if result.data[0]["status"] == "deleted":
             raise ValueError("Item already deleted")
 
-        updated = (
+        updated = await (
             self.supabase.table("items")
             .update({"status": "deleted"})
             .eq("item_id", item_id)
             .execute()
         )
+        self._invalidate_item(item_id)
         return {"item_id": item_id, "status": "deleted"}
 
+    # ========== 商品详情 ==========
+
+    async def get_item(self, item_id: str) -> Optional[Dict[str, Any]]:
+        cached = self.catalog.get("item", item_id)
+        if cached is not None:
+            return cached
+
+        result = await (
+            self.supabase.table("items")
+            .select("*, agents!inner(wallet, description, avg_rating, total_reviews)")
+            .eq("item_id", item_id)
+            .execute()
+        )
+        if not result.data:
+            return None
+        self.catalog.put("item", item_id, result.data[0])
+        return result.data[0]
+
+    # ========== 目录缓存失效 ==========
+
+    def _invalidate_listings(self):
+        """上架/下架影响所有搜索页和卖家列表页（嵌入了 active items）"""
+        self.catalog.invalidate("search")
+        self.catalog.invalidate("agents")
+
+    def _invalidate_item(self, item_id: str):
+        self.catalog.invalidate("item", item_id)
+        self._invalidate_listings()
+
+    def _invalidate_seller(self, wallet: str):
+        """卖家资料变更：该卖家商品详情里嵌入的 agents 信息也要失效"""
+        self.catalog.invalidate_where("item", lambda _k, item: item.get("seller_wallet") == wallet)
+        self._invalidate_listings()
+
     # ========== 我的商品 ==========
 
-    async def get_my_items(self, wallet: str) -> List[Dict[str, Any]]:
-        result = (
+    async def get_my_items(self, wallet: str, limit: int = None, cursor: str = None) -> Dict[str, Any]:
+        """卖家自己的商品，按 (created_at, item_id) 倒序分页"""
+        limit = clamp_limit(limit, MY_ITEMS_PAGE_DEFAULT, MY_ITEMS_PAGE_MAX)
+        qb = (
             self.supabase.table("items")
             .select("*")
             .eq("seller_wallet", wallet.lower())
             .neq("status", "deleted")
-            .order("created_at", desc=True)
-            .execute()
         )
-        return result.data if result.data else []
+        qb = apply_keyset(qb, cursor, limit, ts_col="created_at", id_col="item_id")
+        result = await qb.execute()
+        items, next_cursor = split_page(result.data or [], limit, "created_at", "item_id")
+        return {"items": items, "next_cursor": next_cursor}
 
     # ========== 地址管理 ==========
 
@@ -375,7 +487,7 @@ class MarketService:
         addr = ShippingAddress(**address)
         validate_shipping_address(addr)
 
-        self.supabase.table("agents").update(
+        await self.supabase.table("agents").update(
             {"shipping_address": addr.model_dump()}
         ).eq("wallet", wallet.lower()).execute()
 
@@ -383,7 +495,7 @@ class MarketService:
 
     async def get_shipping_address(self, wallet: str) -> Optional[dict]:
         """查询 agents 表的默认地址。"""
-        result = (
+        result = await (
             self.supabase.table("agents")
             .select("shipping_address")
             .eq("wallet", wallet.lower())
@@ -395,50 +507,82 @@ class MarketService:
 
     # ========== 卖家列表 ==========
 
-    async def list_agents(self) -> List[Dict[str, Any]]:
-        """公开接口：返回所有 agent 及其 active items。"""
-        agents_result = (
+    async def list_agents(self, limit: int = None, cursor: str = None) -> Dict[str, Any]:
+        """
+        公开接口：分页返回 agent 及其 active items。
+        一次嵌入查询 agents → items(status=active)，结果按 (limit, cursor) 进目录缓存，
+        多个请求共享同一份，上架/改商品/卖家注册时失效。
+        """
+        limit = clamp_limit(limit, default=AGENTS_PAGE_DEFAULT)
+        key = (limit, cursor or "")
+        cached = self.catalog.get("agents", key)
+        if cached is not None:
+            return cached
+
+        qb = (
             self.supabase.table("agents")
-            .select("wallet, description, avg_rating, total_reviews, registered_at")
-            .order("registered_at", desc=True)
-            .execute()
+            .select(
+                "wallet, description, avg_rating, total_reviews, registered_at, "
+                "items(item_id, name, description, price, type, requires_shipping, status)"
+            )
+            .eq("items.status", "active")
+            .order("created_at", desc=True, foreign_table="items")
+            .limit(AGENT_ITEMS_LIMIT, foreign_table="items")
         )
-        agents = agents_result.data or []
-
-        # 批量查各 agent 的 active items
+        qb = apply_keyset(qb, cursor, limit, ts_col="registered_at", id_col="wallet")
+        result = await qb.execute()
+        agents, next_cursor = split_page(result.data or [], limit, "registered_at", "wallet")
         for agent in agents:
-            items_result = (
-                self.supabase.table("items")
-                .select("item_id, name, description, price, type, requires_shipping, status")
-                .eq("seller_wallet", agent["wallet"])
-                .eq("status", "active")
-                .order("created_at", desc=True)
-                .execute()
-            )
-            agent["items"] = items_result.data or []
+            agent["items"] = agent.get("items") or []
 
-        return agents
+        page = {"agents": agents, "next_cursor": next_cursor}
+        self.catalog.put("agents", key, page)
+        return page
 
     # ========== 搜索 ==========
 
     async def search_items(
-        self, query: str = "", max_price: float = None
-    ) -> List[Dict[str, Any]]:
-        qb = (
-            self.supabase.table("items")
-            .select("*, agents!inner(wallet, description, avg_rating, total_reviews)")
-            .eq("status", "active")
-        )
+        self,
+        query: str = "",
+        max_price: float = None,
+        min_price: float = None,
+        item_type: str = None,
+        limit: int = None,
+        cursor: str = None,
+    ) -> Dict[str, Any]:
+        """
+        全文检索（search_items RPC，走 idx_items_fts）：
+        有 query 时按 ts_rank 降序，空 query 按上架时间倒序；cursor = (rank, item_id)
+        """
+        limit = clamp_limit(limit, SEARCH_PAGE_DEFAULT, SEARCH_PAGE_MAX)
+        if item_type is not None and item_type not in ("digital", "physical"):
+            raise ValueError("type must be 'digital' or 'physical'")
 
-        if query:
-            qb = qb.or_(f"name.ilike.%{query}%,description.ilike.%{query}%")
+        params: Dict[str, Any] = {
+            "q": (query or "").strip()[:SEARCH_QUERY_MAX_LEN],
+            "min_price": min_price,
+            "max_price": max_price,
+            "item_type": item_type,
+            "page_limit": limit + 1,
+        }
+        if cursor:
+            key, item_id = decode_cursor(cursor)
+            try:
+                params["after_rank"] = float(key)
+                params["after_id"] = str(uuid.UUID(item_id))
+            except ValueError:
+                raise ValueError("Invalid cursor")
 
-        if max_price is not None:
-            qb = qb.lte("price", max_price)
+        cache_key = tuple(sorted(params.items()))
+        cached = self.catalog.get("search", cache_key)
+        if cached is not None:
+            return cached
 
-        qb = qb.order("created_at", desc=True)
-        result = qb.execute()
-        return result.data if result.data else []
+        result = await self.supabase.rpc("search_items", params).execute()
+        items, next_cursor = split_page(result.data or [], limit, "rank", "item_id")
+        page = {"items": items, "next_cursor": next_cursor}
+        self.catalog.put("search", cache_key, page)
+        return page
 
     # ========== 下单 ==========
 
@@ -449,7 +593,7 @@ class MarketService:
         shipping_address: Dict = None,
         buyer_query: str = None,
     ) -> Dict[str, Any]:
-        item_result = (
+        item_result = await (
             self.supabase.table("items")
             .select("*")
             .eq("item_id", item_id)
@@ -478,7 +622,10 @@ class MarketService:
             validate_shipping_address(addr)
             resolved_address = addr.model_dump()
 
+        order_id = str(uuid.uuid4())
         data = {
+            "order_id": order_id,
+            "order_id_bytes32": order_key(order_id),  # 索引器按它反查链上事件
             "item_id": item_id,
             "buyer_wallet": buyer_wallet.lower(),
             "seller_wallet": item["seller_wallet"],
@@ -489,9 +636,10 @@ class MarketService:
         if resolved_address:
             data["shipping_address"] = resolved_address
 
-        result = self.supabase.table("orders").insert(data).execute()
+        result = await self.supabase.table("orders").insert(data).execute()
         if not result.data:
             raise RuntimeError("Failed to create order")
+        outbox.kick()
 
         order = result.data[0]
         return {
@@ -506,7 +654,7 @@ class MarketService:
                 "escrow": {
                     "contract": ESCROW_CONTRACT_ADDRESS,
                     "usdc_contract": USDC_CONTRACT_ADDRESS,
-                    "order_id_bytes32": Web3.keccak(text=order["order_id"]).hex(),
+                    "order_id_bytes32": order["order_id_bytes32"],
                     "paymaster_url": PAYMASTER_URL,
                     "steps": [
                         "1. approve USDC to escrow contract (type(uint256).max, only needed once)",
@@ -518,8 +666,8 @@ class MarketService:
 
     # ========== 确认支付 ==========
 
-    async def confirm_payment(self, order_id: str, tx_hash: str) -> Dict[str, Any]:
-        order_result = (
+    async def _load_order_with_item(self, order_id: str) -> Dict[str, Any]:
+        order_result = await (
             self.supabase.table("orders")
             .select("*, items(*)")
             .eq("order_id", order_id)
@@ -527,32 +675,53 @@ class MarketService:
         )
         if not order_result.data:
             raise FileNotFoundError(f"Order {order_id} not found")
+        return order_result.data[0]
+
+    @staticmethod
+    def _payment_result(order: Dict[str, Any]) -> Dict[str, Any]:
+        """订单已被推进（索引器先看到了 Deposited）时，按当前状态回给买家"""
+        result = {"order_id": order["order_id"], "status": order["status"]}
+        if order.get("result"):
+            result["result"] = order["result"]
+        if order["status"] == "paid":
+            result["message"] = "Payment confirmed. Awaiting seller fulfillment."
+        return result
 
-        order = order_result.data[0]
+    async def confirm_payment(self, order_id: str, tx_hash: str) -> Dict[str, Any]:
+        order = await self._load_order_with_item(order_id)
         if order["status"] not in ("created", "pending"):
+            # 索引器已按链上 Deposited 推进：O(1) 查表即可，不再拉 receipt
+            if order.get("tx_hash") and order["tx_hash"].lower() == tx_hash.lower():
+                return self._payment_result(order)
             raise ValueError(f"Order status is '{order['status']}', expected 'created' or 'pending'")
 
+        # 索引器还没追到（确认数不够 / 未启用）→ 回退到按 receipt 校验
         # Deposited(bytes32 indexed orderId, address indexed buyer, address indexed seller, uint256 amount)
         DEPOSITED_TOPIC = Web3.keccak(text="Deposited(bytes32,address,address,uint256)").hex()
 
-        if self.w3:
+        if self.rpc:
             try:
-                self.w3.eth.get_transaction(tx_hash)
-                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
-                if receipt["status"] != 1:
+                tx, receipt = await self.rpc.batch([
+                    ("eth_getTransactionByHash", [tx_hash]),
+                    ("eth_getTransactionReceipt", [tx_hash]),
+                ])
+                if not tx or not receipt:
+                    raise ValueError("Transaction not found or not yet mined")
+                if int(receipt["status"], 16) != 1:
                     raise ValueError("Transaction failed on-chain")
 
                 # 验证 Deposited event
-                expected_order_bytes32 = Web3.keccak(text=order_id).hex()
+                expected_order_bytes32 = order.get("order_id_bytes32") or order_key(order_id)
                 expected_buyer = order["buyer_wallet"].lower()
-                expected_amount = int(float(order["amount"]) * 1_000_000)
+                expected_seller = order["seller_wallet"].lower()
+                expected_amount = usdc_units(order["amount"])
                 escrow_addr = ESCROW_CONTRACT_ADDRESS.lower()
 
                 found = False
                 for log in receipt["logs"]:
                     if log["address"].lower() != escrow_addr:
                         continue
-                    topics = [t.hex() if isinstance(t, bytes) else t for t in log["topics"]]
+                    topics = [(t.hex() if isinstance(t, bytes) else t).lower() for t in log["topics"]]
                     if len(topics) < 4:
                         continue
                     if topics[0] != DEPOSITED_TOPIC:
@@ -560,11 +729,13 @@ class MarketService:
                     # topics[1] = orderId, topics[2] = buyer, topics[3] = seller
                     log_order_id = topics[1]
                     log_buyer = "0x" + topics[2][-40:]
+                    log_seller = "0x" + topics[3][-40:]
                     # amount is in data (non-indexed)
                     log_amount = int(log["data"].hex() if isinstance(log["data"], bytes) else log["data"], 16)
 
                     if (log_order_id == expected_order_bytes32
                             and log_buyer.lower() == expected_buyer
+                            and log_seller.lower() == expected_seller
                             and log_amount == expected_amount):
                         found = True
                         break
@@ -579,7 +750,7 @@ class MarketService:
             except Exception as e:
                 raise ValueError(f"Transaction verification failed: {e}")
 
-        existing_tx = (
+        existing_tx = await (
             self.supabase.table("orders")
             .select("order_id")
             .eq("tx_hash", tx_hash)
@@ -588,10 +759,33 @@ class MarketService:
         if existing_tx.data:
             raise ValueError(f"tx_hash {tx_hash} already used")
 
-        self.supabase.table("orders").update(
-            {"status": "paid", "tx_hash": tx_hash}
-        ).eq("order_id", order_id).execute()
+        # 条件迁移：和索引器并发时只有一方成功，成功的一方负责触发卖家 endpoint
+        updated = await (
+            self.supabase.table("orders")
+            .update({"status": "paid", "tx_hash": tx_hash})
+            .eq("order_id", order_id)
+            .in_("status", ["created", "pending"])
+            .execute()
+        )
+        if not updated.data:
+            return self._payment_result(await self._load_order_with_item(order_id))
+        outbox.kick()
+        return await self._fulfill(order)
+
+    async def fulfill_order(self, order_id: str) -> Dict[str, Any]:
+        """索引器把订单推进到 paid 后调用（买家没回报 tx 也能发货）"""
+        try:
+            order = await self._load_order_with_item(order_id)
+            outbox.kick()
+            if order["status"] != "paid":
+                return self._payment_result(order)  # 同一批里已被 Released / Refunded 推进
+            return await self._fulfill(order)
+        except Exception as e:
+            logger.error(f"Order {order_id}: fulfillment after escrow deposit failed: {e}")
+            return {"order_id": order_id, "status": "paid"}
 
+    async def _fulfill(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        order_id = order["order_id"]
         item = order.get("items")
 
         # 解析 endpoint: item.endpoint > agent.endpoint
@@ -599,7 +793,7 @@ class MarketService:
         if item:
             endpoint = item.get("endpoint")
         if not endpoint:
-            agent_row = (
+            agent_row = await (
                 self.supabase.table("agents")
                 .select("endpoint")
                 .eq("wallet", order["seller_wallet"])
@@ -610,21 +804,21 @@ class MarketService:
 
         # digital + 有 endpoint → 调 seller endpoint
         if item and item.get("type") == "digital" and endpoint:
-            self.supabase.table("orders").update(
+            await self.supabase.table("orders").update(
                 {"status": "processing"}
             ).eq("order_id", order_id).execute()
 
             try:
-                async with httpx.AsyncClient(timeout=30) as client:
-                    resp = await client.post(
-                        endpoint,
-                        json={
-                            "order_id": order_id,
-                            "buyer_query": order.get("buyer_query", ""),
-                        },
-                    )
-                    resp.raise_for_status()
-                    result_data = resp.json()
+                resp = await host_client("seller", endpoint).post(
+                    endpoint,
+                    json={
+                        "order_id": order_id,
+                        "buyer_query": order.get("buyer_query", ""),
+                    },
+                    timeout=30,
+                )
+                resp.raise_for_status()
+                result_data = resp.json()
 
                 result_status = result_data.get("status", "ok")
 
@@ -633,7 +827,7 @@ class MarketService:
                     return {"order_id": order_id, "status": "processing"}
 
                 # 同步完成
-                self.supabase.table("orders").update(
+                await self.supabase.table("orders").update(
                     {"status": "completed", "result": result_data}
                 ).eq("order_id", order_id).execute()
 
@@ -643,7 +837,7 @@ class MarketService:
                 logger.info(f"Order {order_id}: seller endpoint timeout, degrading to processing")
                 return {"order_id": order_id, "status": "processing"}
             except Exception as e:
-                self.supabase.table("orders").update(
+                await self.supabase.table("orders").update(
                     {"status": "failed", "result": {"error": str(e)}}
                 ).eq("order_id", order_id).execute()
                 return {"order_id": order_id, "status": "failed", "error": str(e)}
@@ -660,7 +854,7 @@ class MarketService:
         self, order_id: str, wallet: str, content: str = None, tracking: str = None,
         file_url: str = None, file_path: str = None, file_size: int = None,
     ) -> Dict[str, Any]:
-        order_result = (
+        order_result = await (
             self.supabase.table("orders")
             .select("*, items(name, type)")
             .eq("order_id", order_id)
@@ -689,19 +883,8 @@ class MarketService:
         if result_data:
             update["result"] = result_data
 
-        self.supabase.table("orders").update(update).eq("order_id", order_id).execute()
-
-        # 写 agent_events 表 — 买家可通过 GET /market/events 拉取
-        self.supabase.table("agent_events").insert({
-            "wallet": order["buyer_wallet"],
-            "event_type": "order_delivered",
-            "payload": {
-                "order_id": order_id,
-                "content": content,
-                "tracking": tracking,
-                "file_url": file_url,
-            },
-        }).execute()
+        await self.supabase.table("orders").update(update).eq("order_id", order_id).execute()
+        outbox.kick()
 
         item = order.get("items") or {}
         return {
@@ -725,32 +908,33 @@ class MarketService:
             "content": content,
             "direction": direction,
         }
-        result = self.supabase.table("messages").insert(data).execute()
+        result = await self.supabase.table("messages").insert(data).execute()
         if not result.data:
             raise RuntimeError("Failed to insert message")
+        outbox.kick()
         return result.data[0]
 
     # ========== 查消息 ==========
 
-    async def get_order_messages(self, order_id: str, wallet: str) -> List[Dict[str, Any]]:
-        """查询订单消息历史，只有买卖双方可以看。"""
+    async def get_order_messages(
+        self, order_id: str, wallet: str, limit: int = None, cursor: str = None
+    ) -> Dict[str, Any]:
+        """查询订单消息历史（从旧到新分页），只有买卖双方可以看。"""
         order = await self.get_order(order_id, wallet)
         if not order:
             raise FileNotFoundError(f"Order {order_id} not found")
 
-        result = (
-            self.supabase.table("messages")
-            .select("*")
-            .eq("order_id", order_id)
-            .order("created_at", desc=False)
-            .execute()
-        )
-        return result.data if result.data else []
+        limit = clamp_limit(limit, MESSAGES_PAGE_DEFAULT, MESSAGES_PAGE_MAX)
+        qb = self.supabase.table("messages").select("*").eq("order_id", order_id)
+        qb = apply_keyset(qb, cursor, limit, ts_col="created_at", id_col="message_id", desc=False)
+        result = await qb.execute()
+        messages, next_cursor = split_page(result.data or [], limit, "created_at", "message_id")
+        return {"messages": messages, "next_cursor": next_cursor}
 
     # ========== 查订单 ==========
 
     async def get_order(self, order_id: str, wallet: str) -> Optional[Dict[str, Any]]:
-        result = (
+        result = await (
             self.supabase.table("orders")
             .select("*, items(name, type, endpoint)")
             .eq("order_id", order_id)
@@ -765,53 +949,127 @@ class MarketService:
             raise PermissionError("Not authorized to view this order")
         return order
 
-    async def get_wallet_orders(self, wallet: str) -> List[Dict[str, Any]]:
+    async def get_wallet_orders(
+        self, wallet: str, limit: int = None, cursor: str = None, role: str = None
+    ) -> Dict[str, Any]:
+        """
+        买入 + 卖出的订单，按 (created_at, order_id) 倒序分页。
+        买方、卖方各走自己的 (wallet, created_at, order_id) 索引取 limit+1 行再归并，
+        深翻页也只扫一页的量；role=buyer|seller 只查一边。
+        """
+        if role not in (None, "buyer", "seller"):
+            raise ValueError("role must be buyer or seller")
+        limit = clamp_limit(limit, ORDERS_PAGE_DEFAULT, ORDERS_PAGE_MAX)
         w = wallet.lower()
-        result = (
-            self.supabase.table("orders")
-            .select("*, items(name, type, price)")
-            .or_(f"buyer_wallet.eq.{w},seller_wallet.eq.{w}")
-            .order("created_at", desc=True)
-            .limit(20)
-            .execute()
-        )
-        return result.data if result.data else []
+
+        def side(col: str):
+            qb = self.supabase.table("orders").select("*, items(name, type, price)").eq(col, w)
+            return apply_keyset(qb, cursor, limit, ts_col="created_at", id_col="order_id").execute()
+
+        cols = [f"{role}_wallet"] if role else ["buyer_wallet", "seller_wallet"]
+        results = await asyncio.gather(*(side(col) for col in cols))
+        merged = {row["order_id"]: row for r in results for row in (r.data or [])}  # 自买自卖去重
+        rows = sorted(merged.values(), key=lambda o: (o["created_at"], o["order_id"]), reverse=True)
+        orders, next_cursor = split_page(rows[:limit + 1], limit, "created_at", "order_id")
+        return {"orders": orders, "next_cursor": next_cursor}
 
     # ========== Events ==========
 
-    async def get_events(self, wallet: str) -> List[Dict[str, Any]]:
-        """查询未送达的 agent_events，返回后标记 delivered=true"""
-        result = (
-            self.supabase.table("agent_events")
-            .select("*")
+    async def fetch_events(
+        self, wallet: str, cursor: str = None, limit: int = EVENTS_PAGE_DEFAULT, include_delivered: bool = False
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        按 (created_at, event_id) 顺序取一页未送达的 agent_events，返回 (events, next_cursor)
+        include_delivered=True 时 cursor 之后的全部返回（SSE 按 Last-Event-ID 续传）
+        """
+        qb = self.supabase.table("agent_events").select("*").eq("wallet", wallet.lower())
+        if not include_delivered:
+            qb = qb.eq("delivered", False)
+        qb = apply_keyset(qb, cursor, limit, ts_col="created_at", id_col="event_id", desc=False)
+        result = await qb.execute()
+        events, next_cursor = split_page(result.data or [], limit, "created_at", "event_id")
+        return events, next_cursor
+
+    async def fetch_late_events(self, wallet: str, cursor: str, overlap: float) -> List[Dict[str, Any]]:
+        """
+        cursor 之前 overlap 秒内仍未送达的事件。created_at 取的是写入事务的开始时间，
+        晚提交的行可能带着比 cursor 更早的时间戳，只按 keyset 往后翻会永远跳过它们
+        """
+        ts, key = decode_cursor(cursor)
+        result = await (
+            self.supabase.table("agent_events").select("*")
             .eq("wallet", wallet.lower())
             .eq("delivered", False)
-            .order("created_at", desc=False)
+            .gte("created_at", ts_minus(ts, overlap))
+            .lte("created_at", ts)
+            .order("created_at").order("event_id")
+            .limit(EVENTS_PAGE_MAX)
             .execute()
         )
-        events = result.data or []
-
-        # 标记已送达
-        for event in events:
-            self.supabase.table("agent_events").update(
-                {"delivered": True}
-            ).eq("event_id", event["event_id"]).execute()
+        # 同一时间戳、id 在 cursor 之后的归正常翻页
+        return [e for e in result.data or [] if e["created_at"] != ts or e["event_id"] < key]
+
+    async def ack_events(self, wallet: str, event_ids: List[str]) -> int:
+        """一次 UPDATE ... WHERE event_id IN (...) 标记已送达（只能标记自己的事件）"""
+        if not event_ids:
+            return 0
+        result = await (
+            self.supabase.table("agent_events")
+            .update({"delivered": True})
+            .eq("wallet", wallet.lower())
+            .in_("event_id", event_ids)
+            .execute()
+        )
+        return len(result.data or [])
 
-        return events
+    async def get_events(self, wallet: str, cursor: str = None, limit: int = None) -> Dict[str, Any]:
+        """
+        HTTP 拉取：取一页未送达事件，整页一次性标记 delivered=true。
+        next_cursor 指向本页最后一条，has_more 表示还有下一页可以继续拉。
+        """
+        limit = clamp_limit(limit, default=EVENTS_PAGE_DEFAULT, maximum=EVENTS_PAGE_MAX)
+        events, next_cursor = await self.fetch_events(wallet, cursor, limit)
+        await self.ack_events(wallet, [e["event_id"] for e in events])
+        last_cursor = encode_cursor(events[-1]["created_at"], events[-1]["event_id"]) if events else cursor
+        return {"events": events, "next_cursor": last_cursor, "has_more": next_cursor is not None}
 
     # ========== 统计 ==========
 
+    async def get_rollup(self) -> Dict[str, float]:
+        """market_rollup 全表（由触发器维护，每个 metric 若干 shard）→ {metric: 各 shard 之和}"""
+        result = await self.supabase.table("market_rollup").select("metric, value").execute()
+        metrics: Dict[str, float] = {}
+        for row in result.data or []:
+            metrics[row["metric"]] = metrics.get(row["metric"], 0.0) + float(row["value"])
+        return metrics
+
     async def get_stats(self) -> Dict[str, int]:
-        agents = self.supabase.table("agents").select("wallet", count="exact").execute()
-        items = (
-            self.supabase.table("items")
-            .select("item_id", count="exact")
-            .eq("status", "active")
-            .execute()
+        rollup = await self.get_rollup()
+        return {
+            "sellers": int(rollup.get("sellers", 0)),
+            "items": int(rollup.get("items_active", 0)),
+            "orders": int(rollup.get("orders", 0)),
+        }
+
+    async def get_seller_stats(self, wallet: str, days: int = 30) -> Dict[str, Any]:
+        """卖家累计销售 + 最近 days 天按日分桶（seller_stats / seller_daily_stats）"""
+        w = wallet.lower()
+        since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat()
+        total, daily = await asyncio.gather(
+            self.supabase.table("seller_stats").select("*").eq("seller_wallet", w).execute(),
+            self.supabase.table("seller_daily_stats")
+            .select("day, orders, paid_orders, completed_orders, volume")
+            .eq("seller_wallet", w)
+            .gte("day", since)
+            .order("day", desc=False)
+            .execute(),
         )
-        orders = self.supabase.table("orders").select("order_id", count="exact").execute()
+        row = total.data[0] if total.data else {}
         return {
-            "sellers": agents.count or 0,
-            "items": items.count or 0,
-            "orders": orders.count or 0,
+            "wallet": w,
+            "orders": row.get("orders", 0),
+            "paid_orders": row.get("paid_orders", 0),
+            "completed_orders": row.get("completed_orders", 0),
+            "volume": float(row.get("volume") or 0),
+            "daily": [{**d, "volume": float(d["volume"])} for d in daily.data or []],
         }
@@ -6,7 +6,7 @@ import hmac
 import uuid
 from typing import Optional
 
-from supabase import Client
+from supabase import AsyncClient
 
 from config import JWT_SECRET
 
@@ -29,7 +29,7 @@ def _build_path(wallet: str, filename: str, subfolder: str = "uploads", order_id
 
 
 async def upload_file(
-    supabase: Client,
+    supabase: AsyncClient,
     wallet: str,
     filename: str,
     content: bytes,
@@ -43,11 +43,11 @@ async def upload_file(
         raise ValueError(f"Unsupported file type: {content_type}. Allowed: {', '.join(sorted(ALLOWED_MIMES))}")
 
     path = _build_path(wallet, filename, subfolder, order_id)
-    supabase.storage.from_(BUCKET).upload(
+    await supabase.storage.from_(BUCKET).upload(
         path, content, {"content-type": content_type}
     )
 
-    signed = supabase.storage.from_(BUCKET).create_signed_url(path, 3600)
+    signed = await supabase.storage.from_(BUCKET).create_signed_url(path, 3600)
     signed_url = signed.get("signedURL") or signed.get("signedUrl", "")
 
     return {
@@ -58,8 +58,8 @@ async def upload_file(
     }
 
 
-def get_signed_url(supabase: Client, path: str, ttl: int = 3600) -> str:
-    signed = supabase.storage.from_(BUCKET).create_signed_url(path, ttl)
+async def get_signed_url(supabase: AsyncClient, path: str, ttl: int = 3600) -> str:
+    signed = await supabase.storage.from_(BUCKET).create_signed_url(path, ttl)
     return signed.get("signedURL") or signed.get("signedUrl", "")
 
 
@@ -0,0 +1,163 @@
+"""
+出站 HTTP 客户端注册表 — 每个上游一个长生命周期 httpx.AsyncClient
+复用 TCP/TLS 连接（keep-alive），每个上游独立连接上限，可选 HTTP/2
+卖家 endpoint 按 host 分池（HTTP_PER_HOST_MAX_CONNECTIONS，LRU 最多 HTTP_MAX_HOSTS 个），
+一个慢卖家占满的只是它自己的池，不会拖住其他卖家的履约
+lifespan 启动时 init_http_clients()，关闭时 close_http_clients()
+"""
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Set
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import (
+    HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY, HTTP2_ENABLED,
+    HTTP_PER_HOST_MAX_CONNECTIONS, HTTP_MAX_HOSTS,
+)
+
+logger = logging.getLogger("pactum.http")
+
+DEFAULT_TIMEOUT = 30
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HttpClientRegistry:
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2_ENABLED,
+        per_host_max_connections: int = HTTP_PER_HOST_MAX_CONNECTIONS,
+        max_hosts: int = HTTP_MAX_HOSTS,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.host_limits = httpx.Limits(
+            max_connections=per_host_max_connections,
+            max_keepalive_connections=min(max_keepalive, per_host_max_connections),
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.max_hosts = max_hosts
+        self.http2 = http2 and _http2_available()
+        if http2 and not self.http2:
+            logger.warning("HTTP2_ENABLED but h2 is not installed — falling back to HTTP/1.1")
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._hosts: OrderedDict[str, httpx.AsyncClient] = OrderedDict()  # "name:host" → client
+        self._retiring: Set[asyncio.Task] = set()
+
+    def get(self, name: str, timeout: float = DEFAULT_TIMEOUT) -> httpx.AsyncClient:
+        """按上游名字取共享客户端（同名复用同一个连接池），单次请求可用 timeout= 覆盖"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=timeout, limits=self.limits, http2=self.http2)
+            self._clients[name] = client
+        return client
+
+    def for_url(self, name: str, url: str, timeout: float = DEFAULT_TIMEOUT) -> httpx.AsyncClient:
+        """按 url 的 host 取独立连接池的客户端（每个 host 连接数受 host_limits 约束）"""
+        key = f"{name}:{urlsplit(url).netloc.lower()}"
+        client = self._hosts.get(key)
+        if client is not None and not client.is_closed:
+            self._hosts.move_to_end(key)
+            return client
+        client = httpx.AsyncClient(timeout=timeout, limits=self.host_limits, http2=self.http2)
+        self._hosts[key] = client
+        while len(self._hosts) > self.max_hosts:
+            _, evicted = self._hosts.popitem(last=False)
+            self._retire(evicted)
+        return client
+
+    def _retire(self, client: httpx.AsyncClient):
+        """被 LRU 淘汰的客户端可能还有请求在飞，等一个超时周期再关"""
+        async def close_later():
+            await asyncio.sleep(DEFAULT_TIMEOUT)
+            await client.aclose()
+
+        try:
+            task = asyncio.get_running_loop().create_task(close_later())
+        except RuntimeError:
+            return
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    async def aclose(self):
+        for task in list(self._retiring):
+            task.cancel()
+        for client in [*self._clients.values(), *self._hosts.values()]:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"HTTP client close failed: {e}")
+        self._clients.clear()
+        self._hosts.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池使用率 gauge：每个上游（及每个卖家 host）的连接数 / 使用中 / 空闲 / 上限"""
+        out = {}
+        for name, client in self._clients.items():
+            out[name] = _pool_stats(client, self.limits)
+        for name, client in self._hosts.items():
+            out[name] = _pool_stats(client, self.host_limits)
+        return out
+
+
+def _pool_stats(client: httpx.AsyncClient, limits: httpx.Limits) -> Dict[str, Any]:
+    """httpx 没有公开的连接池计数，只能读内部的 _transport._pool；版本不兼容时只报上限"""
+    limit = limits.max_connections or 0
+    try:
+        pool = client._transport._pool
+        conns = list(pool.connections)
+        idle = sum(1 for c in conns if c.is_idle())
+    except Exception:
+        return {"connections": None, "in_use": None, "idle": None, "max": limit, "utilization": None}
+    in_use = len(conns) - idle
+    return {
+        "connections": len(conns),
+        "in_use": in_use,
+        "idle": idle,
+        "max": limit,
+        "utilization": round(in_use / limit, 3) if limit else 0.0,
+    }
+
+
+_registry: HttpClientRegistry | None = None
+
+
+def init_http_clients() -> HttpClientRegistry:
+    global _registry
+    if _registry is None:
+        _registry = HttpClientRegistry()
+    return _registry
+
+
+def http_client(name: str, timeout: float = DEFAULT_TIMEOUT) -> httpx.AsyncClient:
+    return init_http_clients().get(name, timeout=timeout)
+
+
+def host_client(name: str, url: str, timeout: float = DEFAULT_TIMEOUT) -> httpx.AsyncClient:
+    return init_http_clients().for_url(name, url, timeout=timeout)
+
+
+async def close_http_clients():
+    global _registry
+    if _registry is not None:
+        await _registry.aclose()
+        _registry = None
+
+
+def http_pool_stats() -> Dict[str, Any]:
+    return _registry.stats() if _registry else {}
@@ -0,0 +1,47 @@
+"""
+回填旧订单的 orders.order_id_bytes32（= keccak256(order_id)），escrow 索引器靠它反查订单
+
+用法（在 packages/gateway 下，配好 SUPABASE_URL / SUPABASE_KEY）:
+    python scripts/backfill_order_keys.py --batch 500
+
+可重复执行：每轮只取 order_id_bytes32 为空的订单，直到没有为止。
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chain.escrow import order_key  # noqa: E402
+from db.client import get_supabase, close_supabase  # noqa: E402
+
+
+async def main(batch: int):
+    db = get_supabase()
+    total = 0
+    try:
+        while True:
+            result = await (
+                db.table("orders").select("order_id")
+                .is_("order_id_bytes32", "null").limit(batch).execute()
+            )
+            rows = result.data or []
+            if not rows:
+                break
+            await asyncio.gather(*(
+                db.table("orders").update({"order_id_bytes32": order_key(r["order_id"])})
+                .eq("order_id", r["order_id"]).execute()
+                for r in rows
+            ))
+            total += len(rows)
+            print(f"backfilled {total}")
+    finally:
+        await close_supabase()
+    print(f"done: {total} orders")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=500)
+    asyncio.run(main(parser.parse_args().batch))
@@ -0,0 +1,105 @@
+"""
+/market/items 并发延迟压测 — 对比同步 / 异步 Supabase 客户端
+
+用法（先起一个 gateway，分别在改动前后的版本上各跑一次）:
+    python scripts/bench_items.py --url http://localhost:8000 --clients 200 --requests 20
+
+每个虚拟客户端串行发 --requests 次 GET /market/items，200 个客户端同时跑，
+最后输出 p50 / p90 / p99 / max 延迟和吞吐。加 --ws 会额外保持一条 WS 连接
+持续 ping，统计事件循环被阻塞时 ping 的往返延迟。
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+def _pct(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+async def _client(http: httpx.AsyncClient, path: str, n: int, latencies: list[float], errors: list[str]):
+    for _ in range(n):
+        start = time.perf_counter()
+        try:
+            resp = await http.get(path)
+            resp.raise_for_status()
+        except Exception as e:
+            errors.append(str(e))
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def _ws_pinger(url: str, stop: asyncio.Event, rtts: list[float]):
+    import websockets
+
+    ws_url = url.replace("http", "ws", 1).rstrip("/") + "/ws"
+    async with websockets.connect(ws_url) as ws:
+        i = 0
+        while not stop.is_set():
+            i += 1
+            start = time.perf_counter()
+            await ws.send(json.dumps({"type": "ping", "id": f"p{i}"}))
+            await ws.recv()
+            rtts.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.05)
+
+
+async def run(url: str, clients: int, requests: int, query: str, with_ws: bool):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    latencies: list[float] = []
+    errors: list[str] = []
+    rtts: list[float] = []
+    path = f"/market/items?q={query}" if query else "/market/items"
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as http:
+        # 预热
+        await http.get(path)
+
+        stop = asyncio.Event()
+        pinger = asyncio.create_task(_ws_pinger(url, stop, rtts)) if with_ws else None
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            _client(http, path, requests, latencies, errors) for _ in range(clients)
+        ))
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        if pinger:
+            await pinger
+
+    total = len(latencies)
+    print(f"GET {path}  clients={clients}  requests/client={requests}")
+    print(f"  ok={total}  errors={len(errors)}  elapsed={elapsed:.2f}s  rps={total / elapsed:.1f}")
+    if latencies:
+        print(
+            f"  latency ms: p50={_pct(latencies, 50):.1f}  p90={_pct(latencies, 90):.1f}  "
+            f"p99={_pct(latencies, 99):.1f}  max={max(latencies):.1f}  mean={statistics.mean(latencies):.1f}"
+        )
+    if rtts:
+        print(f"  ws ping ms: p50={_pct(rtts, 50):.1f}  p99={_pct(rtts, 99):.1f}  max={max(rtts):.1f}")
+    if errors:
+        print(f"  first error: {errors[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pactum gateway /market/items latency benchmark")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--query", default="")
+    parser.add_argument("--ws", action="store_true", help="measure WS ping latency during the run")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.clients, args.requests, args.query, args.ws))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+EIP-712 登录签名对照向量 — 校验 Python 实现和 PactumAgent.sol 算出的 domain / digest / 签名一致
+向量和 contracts/test/PactumAgent.t.sol 的 test_verifyEIP712_vectors_* 是同一组常量（forge 侧校验合约）；
+这里校验 gateway/chain/eip712.py 和 registry-agent/src/eip712.py 两份实现
+
+用法（在 packages/gateway 下）:
+    python scripts/check_eip712_vectors.py
+
+私钥与 forge makeAddrAndKey 相同：keccak256(name)。任一项不一致时退出码非 0。
+"""
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from eth_account import Account  # noqa: E402
+from web3 import Web3  # noqa: E402
+
+CHAIN_ID = 84532
+CONTRACT = "0x0000000000000000000000000000000000007A17"
+CHALLENGE = Web3.keccak(text="random-challenge")
+TIMESTAMP = 1700000000
+AUTH_TYPEHASH = "0x6cc7f9054f828b2492c12bb0449b405cdbf41c87b525811a492b94be42231f19"
+DOMAIN_SEPARATOR = "0x6c01a494da20ce3cd672b476bd29361fcdbf541e3461ae60c0b4d2688aad40f7"
+EOA_DIGEST = "0xaa65a99acb2df7b88618817683ea61e8b44522c4519e2fac3c782b0b396aff17"
+EOA_SIG = (
+    "0x661c107c0704e2d9b1dce709755e5a6aba10728e221c0db335d4276e635e8b4b"
+    "11cdaf91953e4244700673e270ec357508b19d8a32e34ab0eda69bda98fa0b481b"
+)
+EOA_SIG_HIGH_S = (
+    "0x661c107c0704e2d9b1dce709755e5a6aba10728e221c0db335d4276e635e8b4b"
+    "ee32506e6ac1bdbb8ff98c1d8f13ca89b1fd3f5c7c65558ad22bc2b2373c35f91c"
+)
+SA_DIGEST = "0x621eb2683b46c46260027972090fcec80715405736e0e1a9534e0e9497b85648"
+SA_SIG = (
+    "0xed810a2218d503c0ba8c363e0ce43a1d90196cd570068786c549683029bc9a2f"
+    "17f13afe80d30310a24e73cf8cc3588cb1d84ea7f17fbb802a04d1afb0112b401c"
+)
+
+
+def _key(name: str) -> bytes:
+    return Web3.keccak(text=name)
+
+
+def _addr(name: str) -> str:
+    return Account.from_key(_key(name)).address
+
+
+def _hex(b: bytes) -> str:
+    h = bytes(b).hex()
+    return h if h.startswith("0x") else "0x" + h
+
+
+def _load(path: str, name: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def check(impl) -> list:
+    errors = []
+
+    def expect(label, got, want):
+        if got != want:
+            errors.append(f"{label}: got {got}, want {want}")
+
+    alice, bob, charlie = _addr("alice"), _addr("bob"), _addr("charlie")
+    sep = impl.domain_separator(CHAIN_ID, CONTRACT)
+    expect("AUTH_TYPEHASH", _hex(impl.AUTH_TYPEHASH), AUTH_TYPEHASH)
+    expect("DOMAIN_SEPARATOR", _hex(sep), DOMAIN_SEPARATOR)
+
+    for label, wallet, signer_key, digest_want, sig_want, signer in (
+        ("eoa", alice, _key("alice"), EOA_DIGEST, EOA_SIG, alice),
+        ("smart_account", charlie, _key("bob"), SA_DIGEST, SA_SIG, bob),
+    ):
+        digest = impl.auth_digest(sep, wallet, CHALLENGE, TIMESTAMP)
+        expect(f"{label} digest", _hex(digest), digest_want)
+        signed = Account._sign_hash(digest, signer_key)
+        expect(f"{label} signature", _hex(signed.signature), sig_want)
+        expect(f"{label} recover", impl.recover_signer(digest, bytes.fromhex(sig_want[2:])), signer)
+        other = impl.auth_digest(sep, wallet, CHALLENGE, TIMESTAMP + 1)
+        if impl.recover_signer(other, bytes.fromhex(sig_want[2:])) == signer:
+            errors.append(f"{label}: signature accepted for a different timestamp")
+
+    digest = bytes.fromhex(EOA_DIGEST[2:])
+    expect("high-s rejected", impl.recover_signer(digest, bytes.fromhex(EOA_SIG_HIGH_S[2:])), None)
+    sig = bytearray.fromhex(EOA_SIG[2:])
+    sig[64] -= 27
+    expect("v in {0,1} rejected", impl.recover_signer(digest, bytes(sig)), None)
+    expect("64-byte signature rejected", impl.recover_signer(digest, bytes.fromhex(EOA_SIG[2:])[:64]), None)
+    return errors
+
+
+def main() -> int:
+    impls = {
+        "gateway/chain/eip712.py": _load(os.path.join(ROOT, "chain", "eip712.py"), "gateway_eip712"),
+        "registry-agent/src/eip712.py": _load(
+            os.path.join(ROOT, "..", "registry-agent", "src", "eip712.py"), "registry_eip712",
+        ),
+    }
+    failed = 0
+    for name, impl in impls.items():
+        errors = check(impl)
+        failed += len(errors)
+        print(f"{name}: {'ok' if not errors else 'FAILED'}")
+        for e in errors:
+            print(f"  {e}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
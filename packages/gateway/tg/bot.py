@@ -12,6 +12,7 @@ from telegram.ext import (
 )
 
 from market import auth
+from tg import notify
 
 logger = logging.getLogger("pactum.telegram")
 
@@ -71,7 +72,7 @@ class PactumBot:
             return
 
         try:
-            wallet = auth.decode_token(text)
+            wallet = auth.decode_token(text)["wallet"]
         except (ValueError, KeyError) as e:
             await update.message.reply_text(f"Invalid JWT: {e}")
             return
@@ -80,9 +81,10 @@ class PactumBot:
         try:
             # upsert — 同一 chat_id + wallet 只存一条（lowercase 统一）
             wallet = wallet.lower()
-            self.supabase.table("telegram_bindings").upsert(
+            await self.supabase.table("telegram_bindings").upsert(
                 {"chat_id": chat_id, "wallet": wallet}
             ).execute()
+            await notify.binding_changed(wallet)
 
             await update.message.reply_text(
                 f"Bound! Wallet: {wallet[:6]}...{wallet[-4:]}\n"
@@ -98,7 +100,7 @@ class PactumBot:
 
     async def _cmd_orders(self, update: Update, ctx):
         chat_id = update.message.chat_id
-        wallets = self._get_wallets(chat_id)
+        wallets = await self._get_wallets(chat_id)
         if not wallets:
             await update.message.reply_text("Not bound. Paste your JWT to bind first.")
             return
@@ -107,7 +109,7 @@ class PactumBot:
         try:
             for wallet in wallets:
                 label = f"{wallet[:6]}...{wallet[-4:]}"
-                bought = (
+                bought = await (
                     self.supabase.table("orders")
                     .select("order_id, status, amount, created_at, items(name)")
                     .eq("buyer_wallet", wallet)
@@ -115,7 +117,7 @@ class PactumBot:
                     .limit(5)
                     .execute()
                 )
-                sold = (
+                sold = await (
                     self.supabase.table("orders")
                     .select("order_id, status, amount, created_at, items(name)")
                     .eq("seller_wallet", wallet)
@@ -149,7 +151,7 @@ class PactumBot:
 
     async def _cmd_order(self, update: Update, ctx):
         chat_id = update.message.chat_id
-        wallets = self._get_wallets(chat_id)
+        wallets = await self._get_wallets(chat_id)
         if not wallets:
             await update.message.reply_text("Not bound. Paste your JWT to bind first.")
             return
@@ -160,7 +162,7 @@ class PactumBot:
 
         order_id = ctx.args[0]
         try:
-            result = (
+            result = await (
                 self.supabase.table("orders")
                 .select("*, items(name, type)")
                 .eq("order_id", order_id)
@@ -173,7 +175,7 @@ class PactumBot:
         if not result.data:
             # 尝试 prefix 匹配
             try:
-                result = (
+                result = await (
                     self.supabase.table("orders")
                     .select("*, items(name, type)")
                     .like("order_id", f"{order_id}%")
@@ -228,7 +230,7 @@ class PactumBot:
         if ctx.args:
             prefix = ctx.args[0].lower()
             try:
-                result = (
+                result = await (
                     self.supabase.table("telegram_bindings")
                     .select("wallet")
                     .eq("chat_id", chat_id)
@@ -243,7 +245,8 @@ class PactumBot:
                 return
             try:
                 for w in matched:
-                    self.supabase.table("telegram_bindings").delete().eq("chat_id", chat_id).eq("wallet", w).execute()
+                    await self.supabase.table("telegram_bindings").delete().eq("chat_id", chat_id).eq("wallet", w).execute()
+                    await notify.binding_changed(w)
             except Exception as e:
                 await update.message.reply_text(f"Unbind failed: {e}")
                 return
@@ -252,7 +255,7 @@ class PactumBot:
         else:
             # 列出已绑定的 wallet，提示用法
             try:
-                result = (
+                result = await (
                     self.supabase.table("telegram_bindings")
                     .select("wallet")
                     .eq("chat_id", chat_id)
@@ -273,9 +276,9 @@ class PactumBot:
 
     # ========== helpers ==========
 
-    def _get_wallets(self, chat_id: int) -> list[str]:
+    async def _get_wallets(self, chat_id: int) -> list[str]:
         try:
-            result = (
+            result = await (
                 self.supabase.table("telegram_bindings")
                 .select("wallet")
                 .eq("chat_id", chat_id)
@@ -286,8 +289,8 @@ class PactumBot:
             logger.error(f"Failed to get wallets for chat_id={chat_id}: {e}")
             return []
 
-    def _get_wallet(self, chat_id: int) -> str | None:
-        wallets = self._get_wallets(chat_id)
+    async def _get_wallet(self, chat_id: int) -> str | None:
+        wallets = await self._get_wallets(chat_id)
         return wallets[0] if wallets else None
 
     async def process_update(self, update_data: dict):
@@ -1,13 +1,41 @@
 """
 Telegram 通知推送 — 订单状态变更时发送消息给绑定的用户
+请求处理只入队（send_notification 不等 Telegram），后台 worker 池负责：
+- wallet → chat_ids 绑定查询（带 TTL 缓存，/bind /unbind 时经 backplane 广播让所有 worker 失效，
+  广播发不出去时退回 TG_BINDING_CACHE_TTL 过期）
+- 按 chat 限速（Telegram: 同一 chat ~1 条/秒，全局 ~30 条/秒），429 时按 retry_after 退避
+  消息先进每个 chat 的待发队列，sender 按「可发送时间」小顶堆取到期的 chat 发一条，
+  还没到点的 chat 不占 sender（不会因为一个 chat 刷屏挡住别的 chat）；空闲 chat 的节流记录定期清理
 """
+import asyncio
+import heapq
 import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
 from telegram import Bot
+from telegram.error import RetryAfter
+
+from config import TG_NOTIFY_WORKERS, TG_NOTIFY_QUEUE_SIZE, TG_CHAT_INTERVAL, TG_GLOBAL_RATE, TG_BINDING_CACHE_TTL
 
 logger = logging.getLogger("pactum.telegram")
 
 _bot: Bot | None = None
 _supabase = None
+_queue: asyncio.Queue | None = None
+_workers: List[asyncio.Task] = []
+_broadcast: Optional[Callable[[str], Awaitable[Any]]] = None  # wallet → 通知所有 worker 失效绑定缓存
+
+_bindings: Dict[str, Tuple[List[int], float]] = {}  # wallet → (chat_ids, expires)
+_chat_pending: Dict[int, Deque[Tuple[str, int]]] = {}  # chat_id → [(text, 429 重试次数)]；有条目 = 已在 _due 堆里
+_chat_next: Dict[int, float] = {}  # chat_id → 下一次允许发送的时间
+_due: List[Tuple[float, int]] = []  # (可发送时间, chat_id) 小顶堆，每个 chat 最多一项
+_due_changed: asyncio.Event | None = None
+_senders: List[asyncio.Task] = []
+CHAT_NEXT_PRUNE = 1024  # _chat_next 超过这么多条时清掉已过期的空闲 chat
+_global_next = 0.0
+_global_lock = asyncio.Lock()
 
 
 def init(bot: Bot, supabase):
@@ -16,34 +44,221 @@ def init(bot: Bot, supabase):
     _supabase = supabase
 
 
+def start(workers: int = TG_NOTIFY_WORKERS):
+    """lifespan 启动时调用：创建队列 + worker 池"""
+    global _queue, _due_changed
+    if not _bot or _workers:
+        return
+    _queue = asyncio.Queue(maxsize=TG_NOTIFY_QUEUE_SIZE)
+    _due_changed = asyncio.Event()
+    for i in range(workers):
+        _workers.append(asyncio.create_task(_worker(i)))
+        _senders.append(asyncio.create_task(_sender()))
+    logger.info(f"Telegram notify workers started: {workers}")
+
+
+async def stop(timeout: float = 5):
+    """lifespan 关闭时调用：尽量发完队列里剩余的通知，然后取消 worker"""
+    global _queue, _due_changed
+    deadline = time.monotonic() + timeout
+    if _queue is not None:
+        try:
+            await asyncio.wait_for(_queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Telegram notify queue not drained: {_queue.qsize()} pending")
+    while _chat_pending and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    if _chat_pending:
+        logger.warning(f"Telegram notify: {_pending_messages()} messages for {len(_chat_pending)} chats not sent")
+    for task in _workers + _senders:
+        task.cancel()
+    await asyncio.gather(*_workers, *_senders, return_exceptions=True)
+    _workers.clear()
+    _senders.clear()
+    _chat_pending.clear()
+    _due.clear()
+    _queue = None
+    _due_changed = None
+
+
+def set_broadcast(broadcast: Callable[[str], Awaitable[Any]]):
+    """多 worker 时注册广播函数（main.py 接到 ConnectionManager.broadcast）"""
+    global _broadcast
+    _broadcast = broadcast
+
+
+def invalidate_binding(wallet: str):
+    """只清本 worker 的缓存（收到广播时调用）"""
+    _bindings.pop(wallet.lower(), None)
+
+
+async def binding_changed(wallet: str):
+    """/bind /unbind 后调用：本 worker 立即失效，再广播给其他 worker"""
+    invalidate_binding(wallet)
+    if not _broadcast:
+        return
+    try:
+        if not await _broadcast(wallet.lower()):
+            logger.warning(f"Binding invalidation for {wallet} not broadcast, other workers expire in {TG_BINDING_CACHE_TTL}s")
+    except Exception as e:
+        logger.warning(f"Binding invalidation broadcast failed: {e}")
+
+
+def queue_stats() -> dict:
+    return {
+        "workers": len(_workers),
+        "pending": _queue.qsize() if _queue else 0,
+        "max": TG_NOTIFY_QUEUE_SIZE,
+        "chats_waiting": len(_chat_pending),
+        "messages_waiting": _pending_messages(),
+    }
+
+
+def _pending_messages() -> int:
+    return sum(len(q) for q in _chat_pending.values())
+
+
 async def send_notification(wallet: str, event_type: str, data: dict):
-    """向绑定了该 wallet 的所有 Telegram 账号推送通知"""
+    """向绑定了该 wallet 的所有 Telegram 账号推送通知（只入队，立即返回）"""
     if not _bot or not _supabase:
         return
-
+    if _queue is None:
+        # worker 未启动（比如脚本里直接调用）→ 同步发送
+        await _deliver(wallet, event_type, data)
+        return
     try:
-        result = (
-            _supabase.table("telegram_bindings")
-            .select("chat_id")
-            .eq("wallet", wallet.lower())
-            .execute()
-        )
-        if not result.data:
-            return
-
-        text = _format_message(event_type, data)
-        if not text:
-            return
-
-        for row in result.data:
-            chat_id = row["chat_id"]
+        _queue.put_nowait((wallet.lower(), event_type, data))
+    except asyncio.QueueFull:
+        logger.warning(f"Telegram notify queue full, dropped: {event_type} → {wallet[:8]}...")
+
+
+async def _worker(n: int):
+    while True:
+        wallet, event_type, data = await _queue.get()
+        try:
+            await _deliver(wallet, event_type, data)
+        except Exception as e:
+            logger.error(f"Telegram notification failed: {event_type} → {wallet[:8]}... : {e}")
+        finally:
+            _queue.task_done()
+
+
+async def _deliver(wallet: str, event_type: str, data: dict):
+    text = _format_message(event_type, data)
+    if not text:
+        return
+    for chat_id in await _chat_ids(wallet):
+        if _due_changed is not None:
+            _schedule(chat_id, text)
+            continue
+        try:
+            await _send(chat_id, text)
+            logger.info(f"Telegram notification sent: {event_type} → {wallet[:8]}...")
+        except Exception as e:
+            logger.error(f"Telegram send failed to {chat_id}: {e}")
+
+
+async def _chat_ids(wallet: str) -> List[int]:
+    wallet = wallet.lower()
+    cached = _bindings.get(wallet)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    result = await (
+        _supabase.table("telegram_bindings")
+        .select("chat_id")
+        .eq("wallet", wallet)
+        .execute()
+    )
+    chat_ids = [row["chat_id"] for row in (result.data or [])]
+    _bindings[wallet] = (chat_ids, time.monotonic() + TG_BINDING_CACHE_TTL)
+    return chat_ids
+
+
+async def _throttle_global():
+    global _global_next
+    async with _global_lock:
+        now = time.monotonic()
+        if _global_next > now:
+            await asyncio.sleep(_global_next - now)
+        _global_next = max(now, _global_next) + 1 / TG_GLOBAL_RATE
+
+
+def _schedule(chat_id: int, text: str):
+    """放进该 chat 的待发队列；chat 还没排进堆时按它的下一次可发送时间入堆"""
+    pending = _chat_pending.get(chat_id)
+    if pending is None:
+        _chat_pending[chat_id] = deque([(text, 0)])
+        heapq.heappush(_due, (_chat_next.get(chat_id, 0.0), chat_id))
+        _due_changed.set()
+    else:
+        pending.append((text, 0))
+
+
+async def _sender():
+    """取最早到期的 chat 发一条；没有到期的就睡到最早的到期时间（或有新 chat 入堆）"""
+    while True:
+        wait = _due[0][0] - time.monotonic() if _due else None
+        if wait is None or wait > 0:
+            _due_changed.clear()
             try:
-                await _bot.send_message(chat_id=chat_id, text=text)
-                logger.info(f"Telegram notification sent: {event_type} → {wallet[:8]}...")
-            except Exception as e:
-                logger.error(f"Telegram send failed to {chat_id}: {e}")
-    except Exception as e:
-        logger.error(f"Telegram notification failed: {event_type} → {wallet[:8]}... : {e}")
+                await asyncio.wait_for(_due_changed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        _, chat_id = heapq.heappop(_due)
+        pending = _chat_pending[chat_id]
+        text, retries = pending.popleft()
+        try:
+            await _throttle_global()
+            await _bot.send_message(chat_id=chat_id, text=text)
+            _chat_next[chat_id] = time.monotonic() + TG_CHAT_INTERVAL
+            logger.info(f"Telegram notification sent → chat {chat_id}")
+        except RetryAfter as e:
+            retry = _retry_seconds(e)
+            _chat_next[chat_id] = time.monotonic() + retry
+            if retries < 1:
+                logger.warning(f"Telegram rate limited for chat {chat_id}, retry in {retry}s")
+                pending.appendleft((text, retries + 1))
+            else:
+                logger.error(f"Telegram send failed to {chat_id}: still rate limited after retry")
+        except Exception as e:
+            _chat_next[chat_id] = time.monotonic() + TG_CHAT_INTERVAL
+            logger.error(f"Telegram send failed to {chat_id}: {e}")
+
+        if pending:
+            heapq.heappush(_due, (_chat_next[chat_id], chat_id))
+        else:
+            del _chat_pending[chat_id]
+        if len(_chat_next) > CHAT_NEXT_PRUNE:
+            _prune_idle_chats()
+
+
+def _prune_idle_chats():
+    now = time.monotonic()
+    for chat_id in [c for c, t in _chat_next.items() if t <= now and c not in _chat_pending]:
+        del _chat_next[chat_id]
+
+
+def _retry_seconds(e: RetryAfter) -> float:
+    return e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else float(e.retry_after)
+
+
+async def _send(chat_id: int, text: str):
+    """worker 未启动时的直接发送：等到该 chat 可发送，429 时等 retry_after 后重试一次"""
+    wait = _chat_next.get(chat_id, 0) - time.monotonic()
+    if wait > 0:
+        await asyncio.sleep(wait)
+    await _throttle_global()
+    try:
+        await _bot.send_message(chat_id=chat_id, text=text)
+    except RetryAfter as e:
+        retry = _retry_seconds(e)
+        logger.warning(f"Telegram rate limited for chat {chat_id}, retry in {retry}s")
+        await asyncio.sleep(retry)
+        await _bot.send_message(chat_id=chat_id, text=text)
+    finally:
+        _chat_next[chat_id] = time.monotonic() + TG_CHAT_INTERVAL
 
 
 def _format_message(event_type: str, data: dict) -> str | None:
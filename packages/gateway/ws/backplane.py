@@ -0,0 +1,212 @@
+"""
+跨进程 WebSocket 路由 — pub/sub backplane
+每个 worker 订阅自己的频道（worker_id），send_to 发现 wallet 的 socket 在别的 worker 上时，
+把消息 publish 到那个 worker 的频道，由它本地推送（见 ConnectionManager）
+
+- InMemoryBackplane: 进程内总线（单 worker / 测试），同一进程内多个 ConnectionManager 也能互相路由
+- PostgresBackplane: Postgres LISTEN/NOTIFY（需要 asyncpg + DATABASE_URL），多 worker / 多副本
+  LISTEN 连接断开（pooler 空闲回收 / 数据库重启）时按指数退避重连并重新订阅；
+  断开期间 connected=False，通过 on_state 通知 ConnectionManager 撤掉本 worker 的 presence
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from config import WS_BACKPLANE, DATABASE_URL, WS_BACKPLANE_RECONNECT_MAX
+
+logger = logging.getLogger("pactum.backplane")
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+StateListener = Callable[[bool], Awaitable[None]]
+
+NOTIFY_MAX_BYTES = 7900  # Postgres NOTIFY payload 上限 8000 字节
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()[:20]}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def _channel(worker_id: str) -> str:
+    # Postgres 标识符最长 63 字节
+    return ("pactum_ws_" + "".join(c if c.isalnum() else "_" for c in worker_id).lower())[:63]
+
+
+def _spawn(tasks: Set[asyncio.Task], coro) -> asyncio.Task:
+    """create_task 并保留引用，避免任务在运行中被回收"""
+    task = asyncio.create_task(coro)
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+    return task
+
+
+class InMemoryBackplane:
+    _subscribers: Dict[str, List[Handler]] = {}  # 进程级共享
+
+    def __init__(self):
+        self.connected = True
+        self.on_state: Optional[StateListener] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def subscribe(self, worker_id: str, handler: Handler):
+        self._subscribers.setdefault(_channel(worker_id), []).append(handler)
+
+    async def unsubscribe(self, worker_id: str, handler: Handler):
+        handlers = self._subscribers.get(_channel(worker_id), [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    async def publish(self, worker_id: str, payload: Dict[str, Any]) -> bool:
+        """投递给目标 worker；没有订阅者时返回 False（调用方走离线队列）"""
+        handlers = self._subscribers.get(_channel(worker_id))
+        if not handlers:
+            return False
+        for handler in list(handlers):
+            _spawn(self._tasks, handler(payload))
+        return True
+
+
+class PostgresBackplane:
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._listen_conn = None
+        self._pool = None
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.connected = False
+        self.on_state: Optional[StateListener] = None  # 连接状态变化回调（True=已连上，False=断开且重连失败）
+        self.reconnects = 0
+
+    async def start(self):
+        try:
+            import asyncpg
+        except ImportError:
+            raise RuntimeError("WS_BACKPLANE=postgres requires asyncpg (pip install asyncpg)")
+        if not self.dsn:
+            raise RuntimeError("WS_BACKPLANE=postgres requires DATABASE_URL")
+        self._stopping = False
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=4)
+        await self._connect_listener()
+        logger.info("Postgres backplane connected")
+
+    async def _connect_listener(self):
+        import asyncpg
+
+        conn = await asyncpg.connect(self.dsn)
+        try:
+            for channel in list(self._handlers):
+                await conn.add_listener(channel, self._dispatch)
+        except Exception:
+            await conn.close()
+            raise
+        conn.add_termination_listener(self._on_terminated)
+        self._listen_conn = conn
+        self.connected = True
+
+    def _on_terminated(self, conn):
+        if self._stopping or conn is not self._listen_conn:
+            return
+        logger.warning("Backplane LISTEN connection lost, reconnecting")
+        self._listen_conn = None
+        self.connected = False
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self):
+        """第一次重连失败就通知撤 presence（别的 worker 不再往这里转发），之后退避重试直到连上"""
+        delay = 1.0
+        announced = False
+        while not self._stopping:
+            try:
+                await self._connect_listener()
+            except Exception as e:
+                logger.warning(f"Backplane reconnect failed: {e} (retry in {delay:.0f}s)")
+                if not announced:
+                    announced = True
+                    await self._notify_state(False)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, WS_BACKPLANE_RECONNECT_MAX)
+                continue
+            self.reconnects += 1
+            logger.info(f"Backplane reconnected, resubscribed {len(self._handlers)} channel(s)")
+            if announced:
+                await self._notify_state(True)
+            return
+
+    async def _notify_state(self, connected: bool):
+        if not self.on_state:
+            return
+        try:
+            await self.on_state(connected)
+        except Exception as e:
+            logger.warning(f"Backplane state listener failed: {e}")
+
+    async def stop(self):
+        self._stopping = True
+        self.connected = False
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            await asyncio.gather(self._reconnect_task, return_exceptions=True)
+            self._reconnect_task = None
+        if self._listen_conn:
+            for channel in list(self._handlers):
+                try:
+                    await self._listen_conn.remove_listener(channel, self._dispatch)
+                except Exception:
+                    pass
+            await self._listen_conn.close()
+            self._listen_conn = None
+        if self._pool:
+            await self._pool.close()
+            self._pool = None
+
+    async def subscribe(self, worker_id: str, handler: Handler):
+        channel = _channel(worker_id)
+        self._handlers[channel] = handler
+        if self._listen_conn:
+            await self._listen_conn.add_listener(channel, self._dispatch)  # 断开期间由重连时补订阅
+
+    async def unsubscribe(self, worker_id: str, handler: Handler):
+        channel = _channel(worker_id)
+        if self._handlers.pop(channel, None) and self._listen_conn:
+            await self._listen_conn.remove_listener(channel, self._dispatch)
+
+    def _dispatch(self, conn, pid, channel, payload):
+        handler = self._handlers.get(channel)
+        if not handler:
+            return
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Backplane: bad payload on {channel}")
+            return
+        _spawn(self._tasks, handler(data))
+
+    async def publish(self, worker_id: str, payload: Dict[str, Any]) -> bool:
+        raw = json.dumps(payload, separators=(",", ":"), default=str)
+        if len(raw.encode()) > NOTIFY_MAX_BYTES or not self._pool:
+            return False  # 太大或未连接 → 调用方存离线队列，客户端重连/拉取时拿到
+        try:
+            await self._pool.execute("SELECT pg_notify($1, $2)", _channel(worker_id), raw)
+            return True
+        except Exception as e:
+            logger.warning(f"Backplane publish to {worker_id} failed: {e}")
+            return False
+
+
+def new_backplane():
+    """按 WS_BACKPLANE 选择实现：memory（默认，单 worker）/ postgres"""
+    if WS_BACKPLANE == "postgres":
+        return PostgresBackplane(DATABASE_URL)
+    return InMemoryBackplane()
@@ -1,84 +1,296 @@
 """
 ConnectionManager — wallet↔WebSocket 映射 + 离线队列
+离线事件重连后分页推送（带 event_id），客户端发 ack 后才标记 delivered
+多 worker：presence 记录 wallet 在哪个 worker，send_to 通过 backplane 转发给持有 socket 的 worker，
+  对方推送（或自己存离线）后回执；WS_REMOTE_ACK_TIMEOUT 内没回执（worker 已挂、presence 未过期）就存离线
+推送只入该连接的出站队列（ws.state.session，见 ws/session.py），队列满按 WS_OVERFLOW_POLICY 处理
+事件转存 agent_events 时唤醒本 worker 上挂起的 GET /market/events?wait= 长轮询
+broadcast / on_broadcast：发给所有 worker 的消息（比如 Telegram 绑定缓存失效），按 kind 分发给注册的 handler
 """
-import json
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import uuid
+from typing import Callable, Dict, Any, Optional, Set
 
 from fastapi import WebSocket
 
+from config import WS_PRESENCE_TTL, WS_OVERFLOW_POLICY, EVENTS_LONGPOLL_MAX, WS_REMOTE_ACK_TIMEOUT
+from ws.backplane import InMemoryBackplane, new_worker_id
+from ws.presence import InMemoryPresence
+
 logger = logging.getLogger("pactum.ws")
 
+OFFLINE_PAGE_SIZE = 100
+BROADCAST_CHANNEL = "broadcast"  # 所有 worker 都订阅的共享频道
+EVENT_SEQ_MAX_WALLETS = 10000
+
 
 class ConnectionManager:
-    def __init__(self, supabase):
-        self.active: Dict[str, WebSocket] = {}  # wallet → WebSocket
-        self.supabase = supabase
+    def __init__(self, market, backplane=None, presence=None, worker_id: Optional[str] = None):
+        self.active: Dict[str, WebSocket] = {}  # wallet → WebSocket（本 worker）
+        self.market = market
+        self.supabase = market.supabase
+        self.worker_id = worker_id or new_worker_id()
+        self.backplane = backplane or InMemoryBackplane()
+        self.presence = presence or InMemoryPresence(WS_PRESENCE_TTL)
+        self._heartbeat_task: asyncio.Task | None = None
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}  # wallet → 挂起的长轮询
+        self._event_seq: Dict[str, int] = {}  # wallet → 本 worker 见过的离线事件计数
+        self._parked = 0
+        self._remote_acks: Dict[str, asyncio.Future] = {}  # 转发消息 id → 等回执
+        self.remote_ack_timeouts = 0
+        self._broadcast_handlers: Dict[str, Callable[[Dict[str, Any]], None]] = {}  # kind → handler
+
+    async def start(self):
+        """lifespan 启动：订阅本 worker 的频道 + 定期刷新 presence"""
+        self.backplane.on_state = self._on_backplane_state
+        await self.backplane.start()
+        await self.backplane.subscribe(self.worker_id, self._on_remote)
+        await self.backplane.subscribe(BROADCAST_CHANNEL, self._on_broadcast)
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        logger.info(f"ConnectionManager started: worker={self.worker_id}")
+
+    async def stop(self):
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+        for wallet in list(self.active):
+            try:
+                await self.presence.release(wallet, self.worker_id)
+            except Exception:
+                pass
+        await self.backplane.unsubscribe(self.worker_id, self._on_remote)
+        await self.backplane.unsubscribe(BROADCAST_CHANNEL, self._on_broadcast)
+        await self.backplane.stop()
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(WS_PRESENCE_TTL / 3)
+            if not self.backplane.connected:
+                continue  # 收不到转发时不续期，presence 到期后别的 worker 直接存离线
+            try:
+                await self.presence.heartbeat(self.worker_id, list(self.active))
+            except Exception as e:
+                logger.warning(f"Presence heartbeat failed: {e}")
+
+    async def _on_backplane_state(self, connected: bool):
+        """backplane 断开且重连失败：撤掉本 worker 的 presence；重新连上后为在线 wallet 重新声明"""
+        if not connected:
+            logger.warning(f"Backplane down, releasing presence for worker {self.worker_id}")
+            await self.presence.release_worker(self.worker_id)
+            return
+        for wallet in list(self.active):
+            try:
+                await self.presence.claim(wallet, self.worker_id)
+            except Exception as e:
+                logger.warning(f"Presence reclaim failed for {wallet}: {e}")
 
     async def connect(self, wallet: str, ws: WebSocket):
         """注册连接，踢掉同 wallet 的旧连接"""
         old = self.active.get(wallet)
-        if old:
-            try:
-                await old.send_json({
+        if old and old is not ws:
+            session = _session(old)
+            if session:
+                await session.close(4001, "replaced", final={
                     "type": "error",
                     "code": "REPLACED",
                     "message": "Another connection opened for this wallet",
                 })
-                await old.close(code=4001, reason="replaced")
-            except Exception:
-                pass
 
         self.active[wallet] = ws
         logger.info(f"Connected: {wallet} (total: {len(self.active)})")
+        if self.backplane.connected:
+            try:
+                await self.presence.claim(wallet, self.worker_id)
+            except Exception as e:
+                logger.warning(f"Presence claim failed for {wallet}: {e}")
 
         # 投递离线消息
         await self._deliver_offline(wallet, ws)
 
-    def disconnect(self, wallet: str):
+    async def disconnect(self, wallet: str, ws: Optional[WebSocket] = None):
+        """ws 已被同 wallet 的新连接替换时不动新连接"""
+        if ws is not None and self.active.get(wallet) is not ws:
+            return
         self.active.pop(wallet, None)
         logger.info(f"Disconnected: {wallet} (total: {len(self.active)})")
+        try:
+            await self.presence.release(wallet, self.worker_id)
+        except Exception as e:
+            logger.warning(f"Presence release failed for {wallet}: {e}")
 
     async def send_to(self, wallet: str, msg: Dict[str, Any]):
-        """在线则直接推，离线存 agent_events 表"""
+        """本 worker 在线则直接推；在别的 worker 上则经 backplane 转发；都不在线存 agent_events 表"""
+        wallet = wallet.lower()
+        if await self._send_local(wallet, msg):
+            return
+
+        owner = await self.presence.owner(wallet)
+        if owner and owner != self.worker_id and await self._forward(owner, wallet, msg):
+            return
+
+        await self._store_offline(wallet, msg)
+
+    async def _forward(self, owner: str, wallet: str, msg: Dict[str, Any]) -> bool:
+        """经 backplane 转给 owner 并等回执；回执到了说明对方已推送或已存离线"""
+        msg_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._remote_acks[msg_id] = future
+        try:
+            payload = {"wallet": wallet, "msg": msg, "id": msg_id, "reply_to": self.worker_id}
+            if not await self.backplane.publish(owner, payload):
+                return False
+            await asyncio.wait_for(future, timeout=WS_REMOTE_ACK_TIMEOUT)
+            return True
+        except asyncio.TimeoutError:
+            self.remote_ack_timeouts += 1
+            logger.warning(f"No ack from worker {owner} for {wallet} within {WS_REMOTE_ACK_TIMEOUT}s, storing offline")
+            return False
+        finally:
+            self._remote_acks.pop(msg_id, None)
+
+    async def _on_remote(self, data: Dict[str, Any]):
+        """别的 worker 转发过来的消息（socket 已经断了就存离线，然后回执）或我们转发出去的回执"""
+        if "ack" in data:
+            future = self._remote_acks.get(data["ack"])
+            if future and not future.done():
+                future.set_result(True)
+            return
+        wallet, msg = data.get("wallet"), data.get("msg")
+        if not wallet or not isinstance(msg, dict):
+            return
+        if not await self._send_local(wallet, msg):
+            await self._store_offline(wallet, msg)
+        if data.get("reply_to") and data.get("id"):
+            await self.backplane.publish(data["reply_to"], {"ack": data["id"]})
+
+    def on_broadcast(self, kind: str, handler: Callable[[Dict[str, Any]], None]):
+        """注册广播 handler（每个 worker 各自注册，包括发出广播的那个）"""
+        self._broadcast_handlers[kind] = handler
+
+    async def broadcast(self, kind: str, data: Dict[str, Any]) -> bool:
+        """发给所有 worker（含自己）；backplane 断开时返回 False"""
+        return await self.backplane.publish(BROADCAST_CHANNEL, {"kind": kind, "data": data})
+
+    async def _on_broadcast(self, payload: Dict[str, Any]):
+        handler = self._broadcast_handlers.get(payload.get("kind"))
+        if not handler:
+            return
+        try:
+            handler(payload.get("data") or {})
+        except Exception as e:
+            logger.error(f"Broadcast handler {payload.get('kind')} failed: {e}")
+
+    async def _send_local(self, wallet: str, msg: Dict[str, Any]) -> bool:
         ws = self.active.get(wallet)
-        if ws:
-            try:
-                await ws.send_json(msg)
-                return
-            except Exception:
-                self.active.pop(wallet, None)
+        session = _session(ws) if ws else None
+        if not session:
+            return False
+        if session.offer(msg):
+            return True
+        if not session.closed:
+            # 队列满：消息转存 agent_events；disconnect 策略下顺便踢掉慢消费者，让它重连后补拉
+            logger.warning(f"WS send queue full for {wallet} ({session.queue.qsize()}), policy={WS_OVERFLOW_POLICY}")
+            if WS_OVERFLOW_POLICY != "disconnect":
+                return False
+            await session.close(4008, "send queue overflow")
+        await self.disconnect(wallet, ws)
+        return False
+
+    async def _store_offline(self, wallet: str, msg: Dict[str, Any]):
+        await self.store_event(wallet, msg.get("type", "unknown"), msg)
 
-        # 离线 → 存入数据库
-        self.supabase.table("agent_events").insert({
-            "wallet": wallet.lower(),
-            "event_type": msg.get("type", "unknown"),
-            "payload": msg,
-        }).execute()
-        logger.info(f"Queued offline event for {wallet}: {msg.get('type')}")
+    async def store_event(self, wallet: str, event_type: str, payload: Dict[str, Any], dedupe_key: Optional[str] = None):
+        """
+        写一条 agent_events 并唤醒本 worker 上该 wallet 的长轮询 / SSE
+        给了 dedupe_key 时按它幂等写入（重放同一个 key 不会产生第二行）
+        """
+        row = {"wallet": wallet.lower(), "event_type": event_type, "payload": payload}
+        table = self.supabase.table("agent_events")
+        if dedupe_key:
+            await table.upsert({**row, "dedupe_key": dedupe_key}, on_conflict="dedupe_key", ignore_duplicates=True).execute()
+        else:
+            await table.insert(row).execute()
+        logger.info(f"Queued offline event for {wallet}: {event_type}")
+        self._notify_waiters(wallet.lower())
+
+    # ========== 长轮询 ==========
+
+    def event_seq(self, wallet: str) -> int:
+        """查询前先取序号，wait_event 时带上，避免查询和挂起之间到达的事件被漏掉"""
+        return self._event_seq.get(wallet.lower(), 0)
+
+    async def wait_event(self, wallet: str, since: int, timeout: float) -> bool:
+        """
+        挂起直到 wallet 有新的离线事件或超时；序号已变化立即返回。
+        挂起数达到 EVENTS_LONGPOLL_MAX 时不挂起，返回 False
+        """
+        wallet = wallet.lower()
+        if self.event_seq(wallet) != since:
+            return True
+        if self._parked >= EVENTS_LONGPOLL_MAX:
+            return False
+        event = asyncio.Event()
+        waiters = self._waiters.setdefault(wallet, set())
+        waiters.add(event)
+        self._parked += 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._parked -= 1
+            waiters.discard(event)
+            if not waiters:
+                self._waiters.pop(wallet, None)
+        return True
+
+    def _notify_waiters(self, wallet: str):
+        if len(self._event_seq) >= EVENT_SEQ_MAX_WALLETS:
+            self._event_seq.clear()  # 序号变化只会让挂起方多查一次，清空无害
+        self._event_seq[wallet] = self._event_seq.get(wallet, 0) + 1
+        for event in self._waiters.get(wallet, ()):
+            event.set()
 
     async def _deliver_offline(self, wallet: str, ws: WebSocket):
-        """重连后投递离线消息"""
-        result = (
-            self.supabase.table("agent_events")
-            .select("*")
-            .eq("wallet", wallet.lower())
-            .eq("delivered", False)
-            .order("created_at")
-            .execute()
-        )
-        if not result.data:
+        """重连后按 cursor 分页投递离线消息，不在这里标记 delivered — 等客户端 ack"""
+        session = _session(ws)
+        if not session:
             return
-
-        for event in result.data:
-            try:
-                await ws.send_json(event["payload"])
-                self.supabase.table("agent_events").update(
-                    {"delivered": True}
-                ).eq("event_id", event["event_id"]).execute()
-            except Exception:
+        cursor = None
+        count = 0
+        while True:
+            events, cursor = await self.market.fetch_events(wallet, cursor, OFFLINE_PAGE_SIZE)
+            for event in events:
+                if not await session.send({**event["payload"], "event_id": event["event_id"]}):
+                    return
+            count += len(events)
+            if not cursor:
                 break
 
-        count = len(result.data)
         if count:
-            logger.info(f"Delivered {count} offline events to {wallet}")
+            logger.info(f"Delivered {count} offline events to {wallet} (awaiting ack)")
+
+    def stats(self) -> Dict[str, Any]:
+        """本 worker 的连接数 + 出站队列深度（最深的 10 个连接单列）"""
+        per_conn = {}
+        for wallet, ws in self.active.items():
+            session = _session(ws)
+            if session:
+                per_conn[wallet] = session.stats()
+        deepest = sorted(per_conn.items(), key=lambda kv: kv[1]["depth"], reverse=True)[:10]
+        return {
+            "worker_id": self.worker_id,
+            "connections": len(self.active),
+            "queued": sum(s["depth"] for s in per_conn.values()),
+            "dropped": sum(s["dropped"] for s in per_conn.values()),
+            "overflow_policy": WS_OVERFLOW_POLICY,
+            "parked_polls": self._parked,
+            "remote_ack_timeouts": self.remote_ack_timeouts,
+            "backplane_connected": self.backplane.connected,
+            "deepest": dict(deepest),
+        }
+
+
+def _session(ws: WebSocket):
+    return getattr(ws.state, "session", None)
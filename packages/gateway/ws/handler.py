@@ -11,10 +11,11 @@ from market import auth
 from market.service import MarketService
 from ws.connection import ConnectionManager
 from ws import protocol as P
-from tg.notify import send_notification as _tg_notify
 
 logger = logging.getLogger("pactum.ws")
 
+ACK_MAX_IDS = 500  # 单条 ack 最多的 event_id 数，超过整条拒绝（INVALID），客户端分批发
+
 
 class WSHandler:
     def __init__(self, market: MarketService, manager: ConnectionManager):
@@ -23,6 +24,8 @@ class WSHandler:
 
     async def handle(self, ws: WebSocket, msg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """路由消息到对应处理方法，返回响应"""
+        if not isinstance(msg, dict):
+            return self._error(None, "INVALID", "Message must be a JSON object")
         msg_type = msg.get("type")
         req_id = msg.get("id", str(uuid.uuid4())[:8])
 
@@ -48,7 +51,7 @@ class WSHandler:
             logger.exception(f"Error handling {msg_type}")
             return self._error(req_id, "INTERNAL", str(e))
 
-    def _error(self, req_id: str, code: str, message: str) -> Dict[str, Any]:
+    def _error(self, req_id: Optional[str], code: str, message: str) -> Dict[str, Any]:
         return {"type": P.ERROR, "reply_to": req_id, "ok": False, "code": code, "message": message}
 
     def _get_wallet(self, ws: WebSocket) -> str:
@@ -63,13 +66,26 @@ class WSHandler:
     async def _handle_ping(self, ws: WebSocket, msg: Dict[str, Any]) -> Dict[str, Any]:
         return {"pong": True}
 
+    # ========== ack ==========
+
+    async def _handle_ack(self, ws: WebSocket, msg: Dict[str, Any]) -> Dict[str, Any]:
+        """确认已收到的离线事件（event_id 列表，最多 ACK_MAX_IDS 个），一次批量标记 delivered"""
+        wallet = self._get_wallet(ws)
+        event_ids = msg.get("event_ids") or []
+        if not isinstance(event_ids, list):
+            raise ValueError("event_ids must be a list")
+        if len(event_ids) > ACK_MAX_IDS:
+            raise ValueError(f"Too many event_ids ({len(event_ids)}), max {ACK_MAX_IDS} per ack — split into several acks")
+        acked = await self.market.ack_events(wallet, event_ids)
+        return {"acked": acked}
+
     # ========== auth ==========
 
     async def _handle_auth(self, ws: WebSocket, msg: Dict[str, Any]) -> Dict[str, Any]:
         """认证：JWT token 或 challenge-response"""
         token = msg.get("token")
         if token:
-            wallet = auth.decode_token(token)
+            wallet = auth.decode_token(token)["wallet"]
             ws.state.wallet = wallet.lower()
             await self.manager.connect(wallet.lower(), ws)
             return {"wallet": wallet.lower(), "method": "jwt"}
@@ -82,13 +98,13 @@ class WSHandler:
 
         if not all([wallet, signature, challenge, timestamp]):
             # 没有签名 → 生成 challenge
-            result = auth.create_challenge(self.market.supabase)
+            result = await auth.create_challenge(self.market.supabase)
             return {"action": "sign_challenge", **result}
 
         # 验证签名 → JWT
-        token = auth.verify_challenge(
+        token = await auth.verify_challenge(
             supabase=self.market.supabase,
-            contract=self.market.contract,
+            verifier=self.market.auth_verifier,
             wallet=wallet,
             challenge=challenge,
             timestamp=timestamp,
@@ -139,17 +155,21 @@ class WSHandler:
 
     async def _handle_my_items(self, ws: WebSocket, msg: Dict[str, Any]) -> Dict[str, Any]:
         wallet = self._get_wallet(ws)
-        items = await self.market.get_my_items(wallet)
-        return {"items": items, "count": len(items)}
+        page = await self.market.get_my_items(wallet, limit=msg.get("limit"), cursor=msg.get("cursor"))
+        return {"items": page["items"], "count": len(page["items"]), "next_cursor": page["next_cursor"]}
 
     # ========== search ==========
 
     async def _handle_search(self, ws: WebSocket, msg: Dict[str, Any]) -> Dict[str, Any]:
-        items = await self.market.search_items(
+        page = await self.market.search_items(
             query=msg.get("query", ""),
             max_price=msg.get("max_price"),
+            min_price=msg.get("min_price"),
+            item_type=msg.get("type"),
+            limit=msg.get("limit"),
+            cursor=msg.get("cursor"),
         )
-        return {"items": items, "count": len(items)}
+        return {"items": page["items"], "count": len(page["items"]), "next_cursor": page["next_cursor"]}
 
     # ========== buy ==========
 
@@ -164,36 +184,7 @@ class WSHandler:
         order = result["order"]
         payment = result["payment"]
 
-        # 查 item name 给通知用
-        item_row = (
-            self.market.supabase.table("items")
-            .select("name")
-            .eq("item_id", order["item_id"])
-            .execute()
-        )
-        item_name = item_row.data[0]["name"] if item_row.data else "?"
-
-        # 通知卖家（WS）
-        await self.manager.send_to(order["seller_wallet"], {
-            "type": P.ORDER_NEW,
-            "order_id": order["order_id"],
-            "item_id": order["item_id"],
-            "buyer_wallet": order["buyer_wallet"],
-            "amount": str(order["amount"]),
-            "buyer_query": order.get("buyer_query"),
-        })
-
-        # Telegram 通知双方
-        tg_data = {
-            "order_id": order["order_id"],
-            "amount": str(order["amount"]),
-            "buyer_wallet": order["buyer_wallet"],
-            "item_name": item_name,
-            "buyer_query": order.get("buyer_query"),
-        }
-        await _tg_notify(order["seller_wallet"], "order_new", {**tg_data, "role": "seller"})
-        await _tg_notify(order["buyer_wallet"], "order_new", {**tg_data, "role": "buyer"})
-
+        # WS / Telegram 通知由 outbox 派发器异步完成
         return {
             "order_id": order["order_id"],
             "payment": payment,
@@ -208,33 +199,7 @@ class WSHandler:
             tx_hash=msg["tx_hash"],
         )
 
-        # 通知卖家付款已确认
-        order = (
-            self.market.supabase.table("orders")
-            .select("*")
-            .eq("order_id", msg["order_id"])
-            .execute()
-        )
-        if order.data:
-            o = order.data[0]
-            await self.manager.send_to(o["seller_wallet"], {
-                "type": P.PAYMENT_CONFIRMED,
-                "order_id": o["order_id"],
-                "buyer_wallet": o["buyer_wallet"],
-                "tx_hash": msg["tx_hash"],
-                "amount": str(o["amount"]),
-            })
-
-            # Telegram 通知双方
-            tg_data = {
-                "order_id": o["order_id"],
-                "amount": str(o["amount"]),
-                "buyer_wallet": o["buyer_wallet"],
-                "tx_hash": msg["tx_hash"],
-            }
-            await _tg_notify(o["seller_wallet"], "payment_confirmed", {**tg_data, "role": "seller"})
-            await _tg_notify(o["buyer_wallet"], "payment_confirmed", {**tg_data, "role": "buyer"})
-
+        # WS / Telegram 通知由 outbox 派发器异步完成
         return result
 
     # ========== deliver ==========
@@ -248,24 +213,7 @@ class WSHandler:
             tracking=msg.get("tracking"),
         )
 
-        # 通知买家收到交付
-        await self.manager.send_to(result["buyer_wallet"], {
-            "type": P.DELIVERY,
-            "order_id": result["order_id"],
-            "seller_wallet": result["seller_wallet"],
-            "content": msg.get("content"),
-            "tracking": msg.get("tracking"),
-        })
-
-        # Telegram 通知双方
-        tg_data = {
-            "order_id": result["order_id"],
-            "content": msg.get("content"),
-            "tracking": msg.get("tracking"),
-        }
-        await _tg_notify(result["buyer_wallet"], "delivery", {**tg_data, "role": "buyer"})
-        await _tg_notify(result["seller_wallet"], "delivery", {**tg_data, "role": "seller"})
-
+        # WS / agent_events / Telegram 通知由 outbox 派发器异步完成
         return result
 
     # ========== message ==========
@@ -293,36 +241,26 @@ class WSHandler:
             direction=direction,
         )
 
-        # 推送给对方
-        await self.manager.send_to(to_wallet, {
-            "type": P.MESSAGE_RECEIVED,
-            "order_id": msg["order_id"],
-            "from_wallet": wallet,
-            "content": msg["content"],
-        })
-
-        # Telegram 通知对方
-        await _tg_notify(to_wallet, "message_received", {
-            "order_id": msg["order_id"],
-            "from_wallet": wallet,
-            "content": msg["content"],
-        })
-
+        # WS / Telegram 通知由 outbox 派发器异步完成
         return {"message_id": result["message_id"], "to_wallet": to_wallet}
 
     # ========== orders ==========
 
     async def _handle_orders(self, ws: WebSocket, msg: Dict[str, Any]) -> Dict[str, Any]:
         wallet = self._get_wallet(ws)
-        orders = await self.market.get_wallet_orders(wallet)
-        return {"orders": orders, "count": len(orders)}
+        page = await self.market.get_wallet_orders(
+            wallet, limit=msg.get("limit"), cursor=msg.get("cursor"), role=msg.get("role"),
+        )
+        return {"orders": page["orders"], "count": len(page["orders"]), "next_cursor": page["next_cursor"]}
 
     # ========== get_messages ==========
 
     async def _handle_get_messages(self, ws: WebSocket, msg: Dict[str, Any]) -> Dict[str, Any]:
         wallet = self._get_wallet(ws)
-        messages = await self.market.get_order_messages(msg["order_id"], wallet)
-        return {"messages": messages, "count": len(messages)}
+        page = await self.market.get_order_messages(
+            msg["order_id"], wallet, limit=msg.get("limit"), cursor=msg.get("cursor"),
+        )
+        return {"messages": page["messages"], "count": len(page["messages"]), "next_cursor": page["next_cursor"]}
 
     # ========== set_address ==========
 
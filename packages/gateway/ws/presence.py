@@ -0,0 +1,97 @@
+"""
+Presence registry — 哪个 worker 持有哪个 wallet 的 WebSocket
+- InMemoryPresence: 进程内（单 worker / 测试）
+- SupabasePresence: ws_presence 表，worker 定期刷新 heartbeat_at，超过 ttl 没刷新视为已下线
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from config import WS_BACKPLANE, WS_PRESENCE_TTL
+
+
+class InMemoryPresence:
+    _owners: Dict[str, Tuple[str, float]] = {}  # wallet → (worker_id, heartbeat)，进程级共享
+
+    def __init__(self, ttl_seconds: float = 90):
+        self.ttl_seconds = ttl_seconds
+
+    async def claim(self, wallet: str, worker_id: str):
+        self._owners[wallet] = (worker_id, time.monotonic())
+
+    async def release(self, wallet: str, worker_id: str):
+        if self._owners.get(wallet, (None,))[0] == worker_id:
+            self._owners.pop(wallet, None)
+
+    async def release_worker(self, worker_id: str):
+        for wallet, (owner, _) in list(self._owners.items()):
+            if owner == worker_id:
+                self._owners.pop(wallet, None)
+
+    async def owner(self, wallet: str) -> Optional[str]:
+        entry = self._owners.get(wallet)
+        if not entry or time.monotonic() - entry[1] > self.ttl_seconds:
+            return None
+        return entry[0]
+
+    async def heartbeat(self, worker_id: str, wallets: Iterable[str]):
+        now = time.monotonic()
+        for wallet in wallets:
+            if self._owners.get(wallet, (None,))[0] == worker_id:
+                self._owners[wallet] = (worker_id, now)
+
+
+class SupabasePresence:
+    def __init__(self, supabase, ttl_seconds: float = 90):
+        self.supabase = supabase
+        self.ttl_seconds = ttl_seconds
+
+    async def claim(self, wallet: str, worker_id: str):
+        await self.supabase.table("ws_presence").upsert({
+            "wallet": wallet,
+            "worker_id": worker_id,
+            "heartbeat_at": _now().isoformat(),
+        }).execute()
+
+    async def release(self, wallet: str, worker_id: str):
+        await (
+            self.supabase.table("ws_presence")
+            .delete()
+            .eq("wallet", wallet)
+            .eq("worker_id", worker_id)
+            .execute()
+        )
+
+    async def release_worker(self, worker_id: str):
+        """撤掉某个 worker 的全部 presence（它暂时收不到转发）"""
+        await self.supabase.table("ws_presence").delete().eq("worker_id", worker_id).execute()
+
+    async def owner(self, wallet: str) -> Optional[str]:
+        cutoff = (_now() - timedelta(seconds=self.ttl_seconds)).isoformat()
+        result = await (
+            self.supabase.table("ws_presence")
+            .select("worker_id")
+            .eq("wallet", wallet)
+            .gt("heartbeat_at", cutoff)
+            .execute()
+        )
+        return result.data[0]["worker_id"] if result.data else None
+
+    async def heartbeat(self, worker_id: str, wallets: Iterable[str]):
+        await (
+            self.supabase.table("ws_presence")
+            .update({"heartbeat_at": _now().isoformat()})
+            .eq("worker_id", worker_id)
+            .execute()
+        )
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def new_presence(supabase):
+    """postgres backplane 需要跨进程 presence（ws_presence 表），否则进程内即可"""
+    if WS_BACKPLANE == "postgres":
+        return SupabasePresence(supabase, WS_PRESENCE_TTL)
+    return InMemoryPresence(WS_PRESENCE_TTL)
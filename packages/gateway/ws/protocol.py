@@ -18,16 +18,19 @@ GET_MESSAGES = "get_messages"
 SET_ADDRESS = "set_address"
 GET_ADDRESS = "get_address"
 PING = "ping"
+PONG = "pong"  # 回应服务端 heartbeat，不产生响应
+ACK = "ack"
 
 # 服务器 → 客户端（推送）
 ORDER_NEW = "order_new"
 PAYMENT_CONFIRMED = "payment_confirmed"
 DELIVERY = "delivery"
 MESSAGE_RECEIVED = "message_received"
+HEARTBEAT = "heartbeat"  # 服务端心跳（和客户端请求 ping 区分），客户端回 pong（或任意消息）
 
 # 响应
 RESULT = "result"
 ERROR = "error"
 
 # 所有合法的客户端消息类型
-CLIENT_TYPES = {AUTH, SELL, UPDATE_ITEM, DELETE_ITEM, MY_ITEMS, SEARCH, BUY, PAY, DELIVER, MESSAGE, ORDERS, GET_MESSAGES, SET_ADDRESS, GET_ADDRESS, PING}
+CLIENT_TYPES = {AUTH, SELL, UPDATE_ITEM, DELETE_ITEM, MY_ITEMS, SEARCH, BUY, PAY, DELIVER, MESSAGE, ORDERS, GET_MESSAGES, SET_ADDRESS, GET_ADDRESS, PING, PONG, ACK}
@@ -0,0 +1,140 @@
+"""
+WSSession — 单个 WebSocket 连接的出站队列 + writer task + 心跳
+- 所有写操作（请求响应、推送、离线补投）都进有界队列，由一个 writer 串行发出，
+  慢消费者不会卡住触发推送的协程（比如买家的 HTTP 请求）
+- 推送用 offer()：队列满立即返回 False，由 ConnectionManager 按 WS_OVERFLOW_POLICY 处理
+- 响应用 send()：队列满时等待，背压传回该连接自己的读循环
+- 服务端每 WS_PING_INTERVAL 秒发 {"type": "heartbeat"}，客户端任意一帧（含 pong）都算活跃；
+  超过 WS_IDLE_TIMEOUT 没动静就以 4002 关闭（只收不发的客户端必须回 pong）
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict
+
+from fastapi import WebSocket
+
+from config import WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT, WS_PING_INTERVAL, WS_IDLE_TIMEOUT
+from ws import protocol as P
+
+logger = logging.getLogger("pactum.ws")
+
+_CLOSE = object()
+
+
+class WSSession:
+    def __init__(self, ws: WebSocket, max_queue: int = WS_SEND_QUEUE_SIZE):
+        self.ws = ws
+        self.max_queue = max_queue
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self._close_frame = (1000, "")
+        self._final: Dict[str, Any] | None = None
+        self._writer: asyncio.Task | None = None
+        self._pinger: asyncio.Task | None = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write_loop())
+        if WS_PING_INTERVAL > 0:
+            self._pinger = asyncio.create_task(self._ping_loop())
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def offer(self, msg: Dict[str, Any]) -> bool:
+        """非阻塞入队（推送）；已关闭或队列满返回 False"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(msg)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    async def send(self, msg: Dict[str, Any]) -> bool:
+        """阻塞入队（响应 / 离线补投）"""
+        if self.closed:
+            return False
+        await self.queue.put(msg)
+        return not self.closed
+
+    async def close(self, code: int = 1000, reason: str = "", final: Dict[str, Any] | None = None):
+        """丢弃积压、发出 final（可选）后关闭 socket；读循环随后收到 WebSocketDisconnect"""
+        if self.closed:
+            return
+        self.closed = True
+        self._close_frame = (code, reason)
+        self._final = final
+        if self._pinger and self._pinger is not asyncio.current_task():
+            self._pinger.cancel()
+        self._drain()
+        if self._writer is None or self._writer.done() or self._writer is asyncio.current_task():
+            await self._close_socket()
+        else:
+            self.queue.put_nowait(_CLOSE)
+
+    async def wait_closed(self):
+        """等 writer 发完关闭帧（最多 WS_SEND_TIMEOUT），然后回收后台 task"""
+        if self._pinger:
+            self._pinger.cancel()
+        if self._writer:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._writer), timeout=WS_SEND_TIMEOUT)
+            except Exception:
+                self._writer.cancel()
+        await asyncio.gather(*(t for t in (self._writer, self._pinger) if t), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.queue.qsize(),
+            "max": self.max_queue,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "idle_seconds": round(time.monotonic() - self.last_seen, 1),
+        }
+
+    async def _write_loop(self):
+        while True:
+            msg = await self.queue.get()
+            if msg is _CLOSE:
+                if self._final:
+                    try:
+                        await asyncio.wait_for(self.ws.send_json(self._final), timeout=WS_SEND_TIMEOUT)
+                    except Exception:
+                        pass
+                await self._close_socket()
+                return
+            try:
+                await asyncio.wait_for(self.ws.send_json(msg), timeout=WS_SEND_TIMEOUT)
+                self.sent += 1
+            except Exception as e:
+                logger.info(f"WS writer stopped: {e}")
+                self.closed = True
+                self._drain()
+                await self._close_socket()
+                return
+
+    async def _ping_loop(self):
+        while not self.closed:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            if time.monotonic() - self.last_seen > WS_IDLE_TIMEOUT:
+                logger.info(f"WS idle eviction: {getattr(self.ws.state, 'wallet', None)}")
+                await self.close(4002, "idle timeout")
+                return
+            self.offer({"type": P.HEARTBEAT, "ts": int(time.time())})
+
+    def _drain(self):
+        """丢掉积压（同时唤醒卡在 send() 上的协程）"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    async def _close_socket(self):
+        code, reason = self._close_frame
+        try:
+            await self.ws.close(code=code, reason=reason)
+        except Exception:
+            pass
@@ -0,0 +1,53 @@
+"""
+PactumAuth EIP-712 — 复刻 PactumAgent.sol 的 domain / struct hash，本地恢复签名人
+与 gateway/chain/eip712.py 保持一致；对照向量见 contracts/test/PactumAgent.t.sol 的 test_verifyEIP712_vectors
+"""
+from typing import Optional
+
+from eth_keys import keys
+from web3 import Web3
+
+DOMAIN_TYPEHASH = Web3.keccak(text="EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+AUTH_TYPEHASH = Web3.keccak(text="PactumAuth(address wallet,bytes32 challenge,uint256 timestamp)")
+DOMAIN_NAME = "Pactum"
+DOMAIN_VERSION = "1"
+
+SECP256K1_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+_codec = Web3().codec
+
+
+def domain_separator(chain_id: int, verifying_contract: str) -> bytes:
+    return Web3.keccak(_codec.encode(
+        ["bytes32", "bytes32", "bytes32", "uint256", "address"],
+        [
+            DOMAIN_TYPEHASH,
+            Web3.keccak(text=DOMAIN_NAME),
+            Web3.keccak(text=DOMAIN_VERSION),
+            chain_id,
+            Web3.to_checksum_address(verifying_contract),
+        ],
+    ))
+
+
+def auth_digest(separator: bytes, wallet: str, challenge: bytes, timestamp: int) -> bytes:
+    struct_hash = Web3.keccak(_codec.encode(
+        ["bytes32", "address", "bytes32", "uint256"],
+        [AUTH_TYPEHASH, Web3.to_checksum_address(wallet), challenge, timestamp],
+    ))
+    return Web3.keccak(b"\x19\x01" + separator + struct_hash)
+
+
+def recover_signer(digest: bytes, signature: bytes) -> Optional[str]:
+    """Recover the signer like OZ ECDSA.recover (65 bytes, v in {27, 28}, low-s); None where the contract would revert."""
+    if len(signature) != 65:
+        return None
+    r = int.from_bytes(signature[:32], "big")
+    s = int.from_bytes(signature[32:64], "big")
+    v = signature[64]
+    if v not in (27, 28) or s > SECP256K1_N // 2:
+        return None
+    try:
+        pub = keys.Signature(vrs=(v - 27, r, s)).recover_public_key_from_msg_hash(digest)
+    except Exception:
+        return None
+    return pub.to_checksum_address()
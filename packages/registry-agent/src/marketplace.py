@@ -13,10 +13,15 @@ from supabase import create_client, Client
 from web3 import Web3
 import httpx
 
+from .eip712 import domain_separator, auth_digest, recover_signer
+
 JWT_SECRET = os.getenv("JWT_SECRET", "")
 JWT_ALGORITHM = "HS256"
 JWT_TTL_HOURS = 24
 CHALLENGE_TTL_MINUTES = 5
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "local").lower()  # local | onchain | both
+AUTH_AGENT_CACHE_TTL = float(os.getenv("AUTH_AGENT_CACHE_TTL", "60"))  # wallet → (token_id, tokenSigner)
+CHAIN_ID = int(os.getenv("CHAIN_ID", "0"))  # 0 = read eth_chainId once
 
 
 class MarketplaceService:
@@ -57,6 +62,26 @@ class MarketplaceService:
                 "stateMutability": "view",
                 "type": "function",
             },
+            {
+                "inputs": [{"name": "", "type": "uint256"}],
+                "name": "records",
+                "outputs": [
+                    {"name": "agentCardHash", "type": "bytes32"},
+                    {"name": "registeredAt", "type": "uint256"},
+                    {"name": "active", "type": "bool"},
+                    {"name": "totalRating", "type": "uint256"},
+                    {"name": "reviewCount", "type": "uint256"},
+                ],
+                "stateMutability": "view",
+                "type": "function",
+            },
+            {
+                "inputs": [{"name": "", "type": "uint256"}],
+                "name": "tokenSigner",
+                "outputs": [{"name": "", "type": "address"}],
+                "stateMutability": "view",
+                "type": "function",
+            },
             {
                 "inputs": [
                     {"name": "wallet", "type": "address"},
@@ -79,6 +104,9 @@ class MarketplaceService:
         else:
             self.contract = None
 
+        self._domain_separator: Optional[bytes] = None
+        self._agents: Dict[str, tuple] = {}  # wallet → (token_id, signer, expires)
+
     # ========== Challenge-Response Auth ==========
 
     def create_challenge(self) -> dict:
@@ -101,7 +129,7 @@ class MarketplaceService:
         self, wallet: str, challenge: str, timestamp: int, signature: str
     ) -> str:
         """
-        Verify EIP-712 signature via on-chain verifyEIP712().
+        Verify EIP-712 signature (local recovery, or on-chain verifyEIP712() per AUTH_VERIFY_MODE).
         Returns JWT token on success.
         Raises ValueError on failure.
         """
@@ -128,7 +156,7 @@ class MarketplaceService:
             {"used": True, "wallet": wallet.lower()}
         ).eq("challenge", challenge).execute()
 
-        # On-chain EIP-712 verification
+        # EIP-712 verification (local recovery by default, see AUTH_VERIFY_MODE)
         if self.contract:
             try:
                 checksum = Web3.to_checksum_address(wallet)
@@ -136,19 +164,26 @@ class MarketplaceService:
                 challenge_bytes = Web3.keccak(text=challenge)
                 sig_bytes = bytes.fromhex(signature.replace("0x", ""))
 
-                is_valid = self.contract.functions.verifyEIP712(
-                    checksum, challenge_bytes, timestamp, sig_bytes
-                ).call()
+                if AUTH_VERIFY_MODE == "onchain":
+                    is_valid = self._verify_onchain(checksum, challenge_bytes, timestamp, sig_bytes)
+                else:
+                    is_valid = self._verify_local(checksum, challenge_bytes, timestamp, sig_bytes)
+                    if AUTH_VERIFY_MODE == "both":
+                        onchain_valid = self._verify_onchain(checksum, challenge_bytes, timestamp, sig_bytes)
+                        if onchain_valid != is_valid:
+                            print(f"[AUTH] EIP-712 local/on-chain mismatch wallet={checksum} local={is_valid} onchain={onchain_valid}")
+                            self._agents.pop(checksum.lower(), None)
+                        is_valid = onchain_valid
 
                 if not is_valid:
-                    raise ValueError("EIP-712 signature verification failed on-chain")
+                    raise ValueError("EIP-712 signature verification failed")
             except ValueError:
                 raise
             except Exception as e:
-                raise ValueError(f"On-chain verification error: {e}")
+                raise ValueError(f"Signature verification error: {e}")
         else:
-            # No contract — dev mode, skip on-chain check
-            print(f"[DEV] Skipping on-chain verification for {wallet}")
+            # No contract — dev mode, skip signature check
+            print(f"[DEV] Skipping signature verification for {wallet}")
 
         # Issue JWT
         now = datetime.now(timezone.utc)
@@ -160,6 +195,36 @@ class MarketplaceService:
         token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
         return token
 
+    def _verify_onchain(self, wallet: str, challenge: bytes, timestamp: int, signature: bytes) -> bool:
+        return self.contract.functions.verifyEIP712(wallet, challenge, timestamp, signature).call()
+
+    def _verify_local(self, wallet: str, challenge: bytes, timestamp: int, signature: bytes) -> bool:
+        """Same checks as PactumAgent.verifyEIP712: active agent NFT + signer is the wallet or its tokenSigner."""
+        if self._domain_separator is None:
+            chain_id = CHAIN_ID or self.w3.eth.chain_id
+            self._domain_separator = domain_separator(chain_id, self.contract_address)
+        recovered = recover_signer(auth_digest(self._domain_separator, wallet, challenge, timestamp), signature)
+        if recovered is None:
+            return False
+        agent = self._agent(wallet)
+        if agent is None:
+            return False
+        return recovered in (wallet, agent[1])
+
+    def _agent(self, wallet: str) -> Optional[tuple]:
+        """(token_id, tokenSigner) for an active agent, cached for AUTH_AGENT_CACHE_TTL; None if not registered / deactivated."""
+        entry = self._agents.get(wallet.lower())
+        if entry and time.monotonic() < entry[2]:
+            return entry[0], entry[1]
+        token_id = self.contract.functions.walletToToken(wallet).call()
+        if not token_id:
+            return None
+        if not self.contract.functions.records(token_id).call()[2]:  # AgentRecord.active
+            return None
+        signer = Web3.to_checksum_address(self.contract.functions.tokenSigner(token_id).call())
+        self._agents[wallet.lower()] = (token_id, signer, time.monotonic() + AUTH_AGENT_CACHE_TTL)
+        return token_id, signer
+
     @staticmethod
     def decode_token(token: str) -> str:
         """Decode JWT, return wallet address. Raises ValueError on failure."""
@@ -1,34 +1,151 @@
 """
 FastAPI 依赖注入 — 从 Bearer token 解析用户
 """
-from fastapi import Depends, HTTPException, status
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from db.client import get_supabase
-from auth.api_key import verify_api_key
+from auth.api_key import API_KEY_PREFIX, key_id, key_digest, key_fields, verify_digest, verify_api_key
+from auth.key_cache import key_cache
+from config import (
+    API_KEY_LEGACY_FALLBACK, API_KEY_LEGACY_RATE, API_KEY_LEGACY_CLIENT_RATE, API_KEY_LEGACY_MISS_TTL,
+    API_KEY_CACHE_SIZE,
+)
+
+logger = logging.getLogger("wallet.auth")
 
 _bearer = HTTPBearer()
 
+_PAGE = 1000
+
+# 旧 key 兜底的保护（bcrypt 逐个比对很贵，随机 key 不能换来无限次扫描）：
+# - 未命中的 digest 负缓存
+# - 全进程每分钟扫描次数上限 API_KEY_LEGACY_RATE（总 CPU 的硬上限）
+# - 每个客户端每分钟上限 API_KEY_LEGACY_CLIENT_RATE，一个客户端用不完全进程的额度；
+#   客户端取 request.client.host（只有 uvicorn FORWARDED_ALLOW_IPS 信任的代理才会用 X-Forwarded-For 改写它）
+# - 同一时间只跑一个扫描
+_legacy_misses: OrderedDict[str, float] = OrderedDict()  # digest → expires
+_legacy_scans: deque = deque()  # 全进程最近一分钟的扫描时间
+_legacy_client_scans: OrderedDict[str, deque] = OrderedDict()  # client → 最近一分钟的扫描时间（LRU，有上限）
+_legacy_lock = asyncio.Lock()
+
+
+def _lookup_user(token: str, digest: str) -> tuple[dict | None, bool]:
+    """
+    按 api_key_id 唯一索引查一行，再常数时间比较 digest — 与用户总数无关
+    Returns: (user, 是否需要走旧 key 兜底)
+    """
+    db = get_supabase()
+    result = db.table("wallet_users").select("*").eq("api_key_id", key_id(token)).limit(1).execute()
+    user = result.data[0] if result.data else None
+    if verify_digest(digest, user["api_key_digest"] if user else None):
+        return user, False
+    return None, user is None and API_KEY_LEGACY_FALLBACK
+
+
+def _legacy_scan_allowed(digest: str, client: str) -> bool:
+    """同一个 key 最近已扫过且未命中、该客户端或全进程本分钟扫描次数已满时跳过"""
+    now = time.monotonic()
+    expires = _legacy_misses.get(digest)
+    if expires is not None:
+        if now < expires:
+            return False
+        _legacy_misses.pop(digest, None)
+
+    client_scans = _legacy_client_scans.get(client)
+    if client_scans is not None:
+        _expire(client_scans, now)
+        if len(client_scans) >= API_KEY_LEGACY_CLIENT_RATE:
+            logger.warning(f"Legacy API key fallback rate limit reached for {client}, rejecting")
+            return False
+    _expire(_legacy_scans, now)
+    if len(_legacy_scans) >= API_KEY_LEGACY_RATE:
+        logger.warning("Legacy API key fallback process-wide rate limit reached, rejecting")
+        return False
+
+    _legacy_scans.append(now)
+    if client_scans is None:
+        client_scans = _legacy_client_scans[client] = deque()
+    client_scans.append(now)
+    _legacy_client_scans.move_to_end(client)
+    while len(_legacy_client_scans) > API_KEY_CACHE_SIZE:
+        _legacy_client_scans.popitem(last=False)
+    return True
+
+
+def _expire(scans: deque, now: float):
+    while scans and now - scans[0] > 60:
+        scans.popleft()
+
+
+def _remember_legacy_miss(digest: str):
+    _legacy_misses[digest] = time.monotonic() + API_KEY_LEGACY_MISS_TTL
+    while len(_legacy_misses) > API_KEY_CACHE_SIZE:
+        _legacy_misses.popitem(last=False)
+
+
+def _migrate_legacy_key(token: str) -> dict | None:
+    """
+    旧 key 只有 bcrypt hash：在尚未迁移的用户中比对，命中后写入 id + digest
+    分页读取（不受 PostgREST 单次 1000 行限制）；整段是阻塞的，调用方放到线程里跑
+    """
+    db = get_supabase()
+    offset = 0
+    while True:
+        result = (
+            db.table("wallet_users")
+            .select("*")
+            .is_("api_key_id", "null")
+            .not_.is_("api_key_hash", "null")
+            .order("id")
+            .range(offset, offset + _PAGE - 1)
+            .execute()
+        )
+        rows = result.data or []
+        for user in rows:
+            if verify_api_key(token, user["api_key_hash"]):
+                fields = key_fields(token)
+                db.table("wallet_users").update(fields).eq("id", user["id"]).execute()
+                logger.info(f"Migrated legacy API key for user {user['id']}")
+                return {**user, **fields}
+        if len(rows) < _PAGE:
+            return None
+        offset += _PAGE
+
 
 async def get_current_user(
+    request: Request,
     creds: HTTPAuthorizationCredentials = Depends(_bearer),
 ) -> dict:
     """
     从 Bearer token 验证 API key，返回 wallet_users 行
-    遍历所有用户做 bcrypt 比较 — 用户规模小（<10k）时没问题
-    大规模可加 key prefix 索引
+    先查已验证缓存，未命中再走 api_key_id 索引 + HMAC digest 比较
     """
     token = creds.credentials
-    db = get_supabase()
 
-    # 取前缀做初筛 — API key 格式 pk_live_{hex}
-    if not token.startswith("pk_live_"):
+    # API key 格式 pk_live_{hex}
+    if not token.startswith(API_KEY_PREFIX):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key format")
 
-    # 拉所有用户（规模小时可行）
-    result = db.table("wallet_users").select("*").execute()
-    for user in result.data or []:
-        if verify_api_key(token, user["api_key_hash"]):
-            return user
+    digest = key_digest(token)
+    user = key_cache.get(digest)
+    if user:
+        return user
+
+    user, legacy = _lookup_user(token, digest)
+    client = request.client.host if request.client else "unknown"
+    if legacy and _legacy_scan_allowed(digest, client):
+        async with _legacy_lock:
+            user = await asyncio.to_thread(_migrate_legacy_key, token)
+        if not user:
+            _remember_legacy_miss(digest)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
 
-    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+    key_cache.put(digest, user)
+    return user
@@ -1,11 +1,14 @@
 """
 Pactum Wallet — REST API 端点
 """
+import asyncio
 import logging
+import time
 from datetime import datetime, timezone
 from decimal import Decimal
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
 from auth.rate_limit import register_limiter, verify_limiter, get_client_ip
 from api.models import (
@@ -19,9 +22,14 @@ from api.deps import get_current_user
 from services.registration import register, verify
 from services.payment import pay, confirm_payment, cancel_payment, withdraw, escrow_deposit, contract_call
 from services.settings import get_settings, update_settings
-from services.events import get_events
+from services.events import (
+    get_events, latest_cursor, fetch_after, fetch_late, mark_sent, decode_cursor, encode_cursor, event_seq, wait_event,
+)
+from net.sse import SSE_HEADERS, sse_event, sse_comment
+from config import EVENTS_STREAM_RECHECK, SSE_HEARTBEAT_INTERVAL
 from chain.usdc import get_balance
 from auth.api_key import generate_api_key
+from auth.key_cache import key_cache
 from db.client import get_supabase
 
 logger = logging.getLogger("wallet.api")
@@ -163,6 +171,60 @@ async def events_endpoint(
     return await get_events(user["id"], since, limit)
 
 
+@router.get("/events/stream")
+async def events_stream_endpoint(
+    request: Request,
+    last_event_id: str = Query(None, description="Resume after this event id (same as the Last-Event-ID header)"),
+    user: dict = Depends(get_current_user),
+):
+    """
+    SSE 推送 wallet_events，data 与 GET /v1/events 返回的行相同，id 是续传 cursor
+    带 Last-Event-ID 从断点续传，否则只推连接之后的新事件
+    晚提交的事件（时间戳早于 cursor）按当前 cursor 补发，cursor 不回退；续传时回看窗口内的事件可能重复，按 id 去重
+    """
+    sent: dict = {}  # 本流已发出的 event id → created_at（fetch_late 去重）
+    cursor = request.headers.get("last-event-id") or last_event_id
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    else:
+        cursor = await asyncio.to_thread(latest_cursor, user["id"])
+        # 新连接只要之后的事件：连接时已可见的回看窗口内事件视为已发
+        for event in await asyncio.to_thread(fetch_late, user["id"], cursor, sent):
+            mark_sent(sent, event)
+
+    async def gen():
+        nonlocal cursor
+        yield "retry: 3000\n\n"
+        last_write = time.monotonic()
+        while not await request.is_disconnected():
+            seq = event_seq(user["id"])
+            events = await asyncio.to_thread(fetch_after, user["id"], cursor)  # sync 客户端，别阻塞事件循环
+            for event in events:
+                cursor = encode_cursor(event)
+                mark_sent(sent, event)
+                yield sse_event(event, event_id=cursor, event=event["type"])
+            if events:
+                last_write = time.monotonic()
+                continue
+            late = await asyncio.to_thread(fetch_late, user["id"], cursor, sent)
+            for event in late:
+                mark_sent(sent, event)
+                yield sse_event(event, event_id=cursor, event=event["type"])
+            if late:
+                last_write = time.monotonic()
+            timeout = min(SSE_HEARTBEAT_INTERVAL, EVENTS_STREAM_RECHECK)
+            if not await wait_event(user["id"], seq, timeout):
+                await asyncio.sleep(timeout)  # 挂起数已满，退化成定时回查
+            if time.monotonic() - last_write >= SSE_HEARTBEAT_INTERVAL:
+                last_write = time.monotonic()
+                yield sse_comment()
+
+    return StreamingResponse(gen(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 # ===== Settings =====
 
 @router.get("/settings")
@@ -185,7 +247,8 @@ async def settings_update_endpoint(
 
 @router.post("/api-key/regenerate")
 async def regenerate_api_key_endpoint(user: dict = Depends(get_current_user)):
-    plain_key, key_hash = generate_api_key()
+    plain_key, key_fields = generate_api_key()
     db = get_supabase()
-    db.table("wallet_users").update({"api_key_hash": key_hash}).eq("id", user["id"]).execute()
+    db.table("wallet_users").update(key_fields).eq("id", user["id"]).execute()
+    key_cache.invalidate_user(user["id"])
     return {"api_key": plain_key, "message": "New API key generated. Old key is now invalid."}
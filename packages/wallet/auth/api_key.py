@@ -1,22 +1,54 @@
 """
-API Key 生成 + bcrypt 验证
+API Key 生成 + 验证
 格式: pk_live_{32 hex chars}
+
+存储: api_key_id（前 12 位 hex，唯一索引，用于 O(1) 查找）
+    + api_key_digest（HMAC-SHA256(API_KEY_PEPPER, key)，常数时间比较）
+旧 key 只有 bcrypt 的 api_key_hash，首次认证成功时自动升级为 id + digest
 """
+import hashlib
+import hmac
 import secrets
+
 import bcrypt
 
+from config import API_KEY_PEPPER
+
+API_KEY_PREFIX = "pk_live_"
+KEY_ID_LENGTH = 12
+
+# 查不到用户时也做一次比较，避免通过响应时间区分 key_id 是否存在
+_DUMMY_DIGEST = "0" * 64
+
+
+def key_id(plain: str) -> str:
+    return plain[len(API_KEY_PREFIX):len(API_KEY_PREFIX) + KEY_ID_LENGTH]
+
 
-def generate_api_key() -> tuple[str, str]:
+def key_digest(plain: str) -> str:
+    return hmac.new(API_KEY_PEPPER.encode(), plain.encode(), hashlib.sha256).hexdigest()
+
+
+def key_fields(plain: str) -> dict:
+    """wallet_users 中保存 key 的列"""
+    return {"api_key_id": key_id(plain), "api_key_digest": key_digest(plain), "api_key_hash": None}
+
+
+def generate_api_key() -> tuple[str, dict]:
     """
-    生成 API key 和对应的 bcrypt hash
-    Returns: (plain_key, bcrypt_hash)
+    生成 API key 和对应的存储字段
+    Returns: (plain_key, {api_key_id, api_key_digest, api_key_hash})
     """
     raw = secrets.token_hex(16)
-    plain = f"pk_live_{raw}"
-    hashed = bcrypt.hashpw(plain.encode(), bcrypt.gensalt()).decode()
-    return plain, hashed
+    plain = f"{API_KEY_PREFIX}{raw}"
+    return plain, key_fields(plain)
+
+
+def verify_digest(digest: str, stored: str | None) -> bool:
+    """常数时间比较 HMAC digest"""
+    return hmac.compare_digest(digest, stored or _DUMMY_DIGEST)
 
 
 def verify_api_key(plain: str, hashed: str) -> bool:
-    """验证明文 API key 与 bcrypt hash 是否匹配"""
+    """验证明文 API key 与旧版 bcrypt hash 是否匹配（仅迁移用）"""
     return bcrypt.checkpw(plain.encode(), hashed.encode())
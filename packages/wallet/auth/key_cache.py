@@ -0,0 +1,49 @@
+"""
+已验证 API key 的内存缓存 — LRU + TTL，按 digest 索引（不存明文）
+regenerate / 设置变更时按 user_id 失效（进程内；多进程部署时旧 key 最多再存活 TTL 秒）
+"""
+import time
+from collections import OrderedDict
+
+from config import API_KEY_CACHE_SIZE, API_KEY_CACHE_TTL
+
+
+class VerifiedKeyCache:
+    def __init__(self, max_size: int = 1024, ttl_seconds: int = 60):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()  # digest → (user, expires)
+        self._by_user: dict[str, str] = {}  # user_id → digest
+
+    def get(self, digest: str) -> dict | None:
+        entry = self._entries.get(digest)
+        if not entry:
+            return None
+        user, expires = entry
+        if time.monotonic() > expires:
+            self._drop(digest)
+            return None
+        self._entries.move_to_end(digest)
+        return user
+
+    def put(self, digest: str, user: dict) -> None:
+        self.invalidate_user(user["id"])
+        self._entries[digest] = (user, time.monotonic() + self.ttl_seconds)
+        self._by_user[user["id"]] = digest
+        while len(self._entries) > self.max_size:
+            oldest, _ = next(iter(self._entries.items()))
+            self._drop(oldest)
+
+    def invalidate_user(self, user_id: str) -> None:
+        digest = self._by_user.pop(user_id, None)
+        if digest:
+            self._entries.pop(digest, None)
+
+    def _drop(self, digest: str) -> None:
+        user, _ = self._entries.pop(digest)
+        if self._by_user.get(user["id"]) == digest:
+            self._by_user.pop(user["id"], None)
+
+
+# 全局缓存实例
+key_cache = VerifiedKeyCache(max_size=API_KEY_CACHE_SIZE, ttl_seconds=API_KEY_CACHE_TTL)
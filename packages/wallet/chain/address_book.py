@@ -0,0 +1,102 @@
+"""
+充值地址簿 — 扫描器用的 地址 → user_id 缓存（EOA + smart account，小写）
+- 首次 / 每 ADDRESS_BOOK_FULL_REFRESH 秒全量加载（分页，不受 PostgREST 单次 1000 行限制）
+- 其余每轮只拉 updated_at 晚于「水位线 - ADDRESS_BOOK_OVERLAP 秒」的行（别的进程注册的新用户）；
+  updated_at 取的是事务开始时间，晚提交的行可能带着比水位线更早的时间戳，重叠窗口把它们补上
+- 本进程注册成功后直接 add()，下一轮扫描就能过滤到
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from db.client import get_supabase
+from config import ADDRESS_BOOK_FULL_REFRESH, ADDRESS_BOOK_OVERLAP
+
+logger = logging.getLogger("wallet.address_book")
+
+_PAGE = 1000
+_COLUMNS = "id, wallet_address, smart_account_address, updated_at"
+
+
+class AddressBook:
+    def __init__(self):
+        self._map: Dict[str, str] = {}
+        self._watermark: Optional[str] = None
+        self._full_at = 0.0
+
+    def add(self, user_id: str, *addresses: Optional[str]):
+        for addr in addresses:
+            if addr:
+                self._map[addr.lower()] = user_id
+
+    def get(self, address: str) -> Optional[str]:
+        return self._map.get(address.lower())
+
+    def addresses(self) -> List[str]:
+        return list(self._map)
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def refresh(self):
+        if self._watermark is None or time.monotonic() - self._full_at > ADDRESS_BOOK_FULL_REFRESH:
+            self._load_all()
+        else:
+            self._load_since(self._watermark)
+
+    def _load_all(self):
+        db = get_supabase()
+        fresh: Dict[str, str] = {}
+        watermark = None
+        offset = 0
+        while True:
+            result = (
+                db.table("wallet_users").select(_COLUMNS)
+                .order("id").range(offset, offset + _PAGE - 1).execute()
+            )
+            rows = result.data or []
+            for row in rows:
+                _put(fresh, row)
+                watermark = max(watermark or "", row.get("updated_at") or "") or None
+            if len(rows) < _PAGE:
+                break
+            offset += _PAGE
+        self._map = fresh
+        self._watermark = watermark or ""
+        self._full_at = time.monotonic()
+        logger.info(f"Address book loaded: {len(fresh)} addresses")
+
+    def _load_since(self, watermark: str):
+        db = get_supabase()
+        since = _minus_overlap(watermark) if watermark else None
+        offset = 0
+        while True:
+            query = db.table("wallet_users").select(_COLUMNS)
+            if since:
+                query = query.gt("updated_at", since)
+            result = query.order("updated_at").order("id").range(offset, offset + _PAGE - 1).execute()
+            rows = result.data or []
+            for row in rows:
+                _put(self._map, row)
+                self._watermark = max(self._watermark or "", row.get("updated_at") or "")
+            if len(rows) < _PAGE:
+                break
+            offset += _PAGE
+
+
+def _minus_overlap(watermark: str) -> str:
+    try:
+        ts = datetime.fromisoformat(watermark.replace("Z", "+00:00"))
+    except ValueError:
+        return watermark
+    return (ts - timedelta(seconds=ADDRESS_BOOK_OVERLAP)).isoformat()
+
+
+def _put(addr_map: Dict[str, str], row: dict):
+    addr_map[row["wallet_address"].lower()] = row["id"]
+    if row.get("smart_account_address"):
+        addr_map[row["smart_account_address"].lower()] = row["id"]
+
+
+address_book = AddressBook()
@@ -1,131 +1,284 @@
 """
-USDC 充值检测 — 定时扫描 Transfer events
-匹配 to 地址在 wallet_users 中的记录 → 写入 transactions + events
+USDC 充值检测 — 扫描 Transfer events
+只向节点要 to 是本站用户地址的 Transfer（to topic 过滤，地址按 SCANNER_ADDRESS_CHUNK 分批），
+扫描成本跟用户活动量走，不跟全链 USDC 流量走；命中后批量写入 transactions + events
+
+- checkpoint 持久化在 wallet_scanner_state，重启后从断点继续，停机期间的充值不会漏
+- 只扫到 head - SCANNER_CONFIRMATIONS（已足够确认的区块），防 reorg
+- 落后时进入追赶模式：一次并发拉 SCANNER_CONCURRENCY 段，不等 interval
+- 节点报结果过多 / 范围过大时该段对半拆分重试（不小于 SCANNER_MIN_RANGE），并缩小后续的段长；成功后逐步放大
+- 节点限流（429 / rate limit）不拆分，整轮按指数退避（SCANNER_RATE_LIMIT_BACKOFF 起，最长 RATE_LIMIT_BACKOFF_MAX）
+- 所有 supabase 读写（地址簿刷新、入账、checkpoint）都放到线程里跑：sync 客户端会阻塞事件循环，
+  追赶模式下连续多轮不睡，阻塞会一直拖住钱包 API
+- 写入按 (tx_hash, log_index) 唯一键幂等：先一次 IN 查询跳过已入账的，再批量 upsert；
+  迁移前的充值行 log_index 为 NULL（不参与唯一冲突），按 tx_hash 整笔跳过，重扫旧区块不会重复入账；
+  events 先于 transactions 写，中途失败重扫时两边都能补齐且不重复
 """
 import asyncio
 import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 
 from db.client import get_supabase
+from services.events import record_events
 from chain.usdc import get_transfer_events, get_latest_block
-from config import SCANNER_INTERVAL
+from chain.address_book import address_book
+from config import (
+    SCANNER_INTERVAL, SCANNER_CONFIRMATIONS, SCANNER_RANGE, SCANNER_MIN_RANGE,
+    SCANNER_CONCURRENCY, SCANNER_START_BLOCK, SCANNER_ADDRESS_CHUNK, SCANNER_RATE_LIMIT_BACKOFF,
+)
 
 logger = logging.getLogger("wallet.scanner")
 
-# 记住上次扫描到的区块
-_last_scanned_block: int | None = None
+CHECKPOINT_NAME = "usdc_deposits"
 
+RATE_LIMIT_BACKOFF_MAX = 300  # 秒
 
-def _get_user_addresses() -> dict[str, str]:
-    """获取所有用户地址 → user_id 的映射（EOA + smart account，地址小写化）"""
-    db = get_supabase()
-    result = db.table("wallet_users").select("id, wallet_address, smart_account_address").execute()
-    addr_map = {}
-    for row in (result.data or []):
-        # EOA 地址
-        addr_map[row["wallet_address"].lower()] = row["id"]
-        # Smart account 地址
-        if row.get("smart_account_address"):
-            addr_map[row["smart_account_address"].lower()] = row["id"]
-    return addr_map
-
-
-async def scan_deposits():
-    """单次扫描"""
-    global _last_scanned_block
+# 各家节点 eth_getLogs 结果过多 / 区块范围过大的报错措辞
+_LIMIT_HINTS = (
+    "query returned more than", "response size", "block range", "range is too", "range too",
+    "too wide", "is limited to", "too large", "413",
+)
+# 限流（先于 _LIMIT_HINTS 判断，避免 "Too Many Requests" 之类被当成范围超限）
+_RATE_HINTS = ("429", "too many requests", "rate limit", "rate-limit", "ratelimit", "throttl", "exceeded your")
 
-    try:
-        latest = get_latest_block()
 
-        if _last_scanned_block is None:
-            # 首次启动，从当前区块开始（不扫历史）
-            _last_scanned_block = latest
-            logger.info(f"Scanner initialized at block {latest}")
-            return
+def _is_rate_limited(e: Exception) -> bool:
+    msg = str(e).lower()
+    return any(h in msg for h in _RATE_HINTS)
+
 
-        if latest <= _last_scanned_block:
-            return  # 没有新区块
+def _is_limit_error(e: Exception) -> bool:
+    msg = str(e).lower()
+    return not _is_rate_limited(e) and any(h in msg for h in _LIMIT_HINTS)
 
-        from_block = _last_scanned_block + 1
-        to_block = min(latest, from_block + 2000)  # 最多扫 2000 个区块
 
-        events = get_transfer_events(from_block, to_block)
-        user_map = _get_user_addresses()
+class DepositScanner:
+    def __init__(self):
+        self.checkpoint: Optional[int] = None  # 已处理完的最后一个区块
+        self.head: Optional[int] = None
+        self.range_size = SCANNER_RANGE
+        self.last_error: Optional[str] = None
+        self.last_scan_at: Optional[float] = None
+        self.deposits = 0
+        self.backoff = 0.0  # 限流退避（秒），scanner_loop 据此多睡
+        self.rate_limited = 0
+        self._shrunk = False
 
+    # ========== checkpoint ==========
+
+    def _load_checkpoint(self, safe_head: int) -> int:
         db = get_supabase()
-        deposit_count = 0
+        result = db.table("wallet_scanner_state").select("last_block").eq("name", CHECKPOINT_NAME).execute()
+        if result.data:
+            block = int(result.data[0]["last_block"])
+            logger.info(f"Scanner resuming after block {block}")
+            return block
+        # 首次部署：从 SCANNER_START_BLOCK 开始，没配置就从当前安全高度开始（不扫历史）
+        block = SCANNER_START_BLOCK - 1 if SCANNER_START_BLOCK > 0 else safe_head
+        self._save_checkpoint(block)
+        logger.info(f"Scanner initialized at block {block}")
+        return block
+
+    def _save_checkpoint(self, block: int):
+        get_supabase().table("wallet_scanner_state").upsert({
+            "name": CHECKPOINT_NAME,
+            "last_block": block,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }).execute()
 
+    # ========== 拉取 ==========
+
+    async def _fetch(self, from_block: int, to_block: int, addresses: List[str]) -> List[Dict[str, Any]]:
+        """拉一段 logs（地址分批）；节点超限就对半拆分递归重试"""
+        try:
+            events = []
+            for i in range(0, len(addresses), SCANNER_ADDRESS_CHUNK):
+                chunk = addresses[i:i + SCANNER_ADDRESS_CHUNK]
+                events += await asyncio.to_thread(get_transfer_events, from_block, to_block, chunk)
+        except Exception as e:
+            if to_block - from_block + 1 <= SCANNER_MIN_RANGE or not _is_limit_error(e):
+                raise
+            mid = (from_block + to_block) // 2
+            self._shrunk = True
+            self.range_size = max(SCANNER_MIN_RANGE, min(self.range_size, (to_block - from_block + 1) // 2))
+            logger.info(f"getLogs {from_block}-{to_block} over provider limit, splitting (range → {self.range_size})")
+            return await self._fetch(from_block, mid, addresses) + await self._fetch(mid + 1, to_block, addresses)
+        return events
+
+    # ========== 处理 ==========
+
+    def _process(self, events: List[Dict[str, Any]]) -> int:
+        deposits = []
         for evt in events:
-            to_lower = evt["to"].lower()
-            if to_lower not in user_map:
-                continue
-
-            user_id = user_map[to_lower]
-            tx_hash = evt["tx_hash"]
-
-            # 幂等：检查 tx_hash 是否已存在
-            existing = db.table("wallet_transactions").select("id").eq("tx_hash", tx_hash).execute()
-            if existing.data:
-                continue
-
-            # 写入交易记录
-            db.table("wallet_transactions").insert({
-                "user_id": user_id,
-                "type": "deposit",
-                "amount": evt["value"],
-                "from_address": evt["from"],
-                "to_address": evt["to"],
-                "tx_hash": tx_hash,
-                "status": "completed",
-            }).execute()
-
-            # 写入事件
-            db.table("wallet_events").insert({
-                "user_id": user_id,
-                "type": "deposit_received",
-                "data": {
-                    "from": evt["from"],
-                    "amount": evt["value"],
-                    "tx_hash": tx_hash,
-                },
-            }).execute()
-
-            deposit_count += 1
-
-        if deposit_count > 0:
-            logger.info(f"Detected {deposit_count} deposits in blocks {from_block}-{to_block}")
-
-        _last_scanned_block = to_block
+            user_id = address_book.get(evt["to"])
+            if user_id:
+                deposits.append((user_id, evt))
+        if not deposits:
+            return 0
+
+        db = get_supabase()
+        # 幂等：一次查出已入账的 (tx_hash, log_index)
+        hashes = list({evt["tx_hash"] for _, evt in deposits})
+        existing = db.table("wallet_transactions").select("tx_hash, log_index, type").in_("tx_hash", hashes).execute()
+        seen = set()
+        legacy = set()  # 旧扫描器写的充值行没有 log_index（唯一键曾是 tx_hash），视为整笔 tx 已入账
+        for r in existing.data or []:
+            if r["log_index"] is not None:
+                seen.add((r["tx_hash"], r["log_index"]))
+            elif r["type"] == "deposit":
+                legacy.add(r["tx_hash"])
+        deposits = [
+            (u, evt) for u, evt in deposits
+            if evt["tx_hash"] not in legacy and (evt["tx_hash"], evt["log_index"]) not in seen
+        ]
+        if not deposits:
+            return 0
+
+        record_events([{
+            "user_id": user_id,
+            "type": "deposit_received",
+            "data": {"from": evt["from"], "amount": evt["value"], "tx_hash": evt["tx_hash"]},
+            "tx_hash": evt["tx_hash"],
+            "log_index": evt["log_index"],
+        } for user_id, evt in deposits], on_conflict="tx_hash,log_index")
+
+        db.table("wallet_transactions").upsert([{
+            "user_id": user_id,
+            "type": "deposit",
+            "amount": evt["value"],
+            "from_address": evt["from"],
+            "to_address": evt["to"],
+            "tx_hash": evt["tx_hash"],
+            "log_index": evt["log_index"],
+            "status": "completed",
+        } for user_id, evt in deposits], on_conflict="tx_hash,log_index", ignore_duplicates=True).execute()
+        return len(deposits)
+
+    async def scan_once(self) -> bool:
+        """扫一轮；返回 True 表示该等下一个 interval 了（已追上安全高度，或有段失败）"""
+        self.head = await asyncio.to_thread(get_latest_block)
+        safe_head = self.head - SCANNER_CONFIRMATIONS
+        if self.checkpoint is None:
+            self.checkpoint = await asyncio.to_thread(self._load_checkpoint, safe_head)
+        if safe_head <= self.checkpoint:
+            return True
+
+        self._shrunk = False
+        ranges = []
+        start = self.checkpoint + 1
+        while start <= safe_head and len(ranges) < SCANNER_CONCURRENCY:
+            end = min(safe_head, start + self.range_size - 1)
+            ranges.append((start, end))
+            start = end + 1
 
+        await asyncio.to_thread(address_book.refresh)  # sync supabase 客户端，别阻塞事件循环（追赶时连续多轮）
+        addresses = address_book.addresses()
+        results = await asyncio.gather(*(self._fetch(a, b, addresses) for a, b in ranges), return_exceptions=True)
+
+        # 按区块顺序处理，遇到失败段就停，checkpoint 只推进到连续成功的末尾
+        if any(isinstance(r, Exception) and _is_rate_limited(r) for r in results):
+            self.rate_limited += 1
+            self.backoff = min(max(self.backoff * 2, SCANNER_RATE_LIMIT_BACKOFF), RATE_LIMIT_BACKOFF_MAX)
+            logger.warning(f"Scanner rate limited by provider, backing off {self.backoff:.0f}s")
+        else:
+            self.backoff = 0.0
+
+        reached = self.checkpoint
+        deposit_count = 0
+        failed = False
+        for (a, b), result in zip(ranges, results):
+            if isinstance(result, Exception):
+                self.last_error = f"{a}-{b}: {result}"
+                logger.error(f"Scanner getLogs {a}-{b} failed: {result}")
+                failed = True
+                break
+            deposit_count += await asyncio.to_thread(self._process, result)
+            reached = b
+
+        if reached > self.checkpoint:
+            await asyncio.to_thread(self._save_checkpoint, reached)
+            if deposit_count > 0:
+                logger.info(f"Detected {deposit_count} deposits in blocks {self.checkpoint + 1}-{reached}")
+            self.checkpoint = reached
+            self.deposits += deposit_count
+            if reached == ranges[-1][1]:
+                self.last_error = None
+                if not self._shrunk:
+                    self.range_size = min(SCANNER_RANGE, self.range_size * 2)  # 一轮没超限，逐步放大
+        self.last_scan_at = time.time()
+        return failed or reached >= safe_head
+
+    def stats(self) -> Dict[str, Any]:
+        lag = None
+        if self.head is not None and self.checkpoint is not None:
+            lag = max(self.head - self.checkpoint, 0)
+        return {
+            "checkpoint": self.checkpoint,
+            "head": self.head,
+            "confirmations": SCANNER_CONFIRMATIONS,
+            "lag_blocks": lag,
+            "range_size": self.range_size,
+            "deposits": self.deposits,
+            "rate_limited": self.rate_limited,
+            "backoff": self.backoff,
+            "addresses": len(address_book),
+            "last_scan_at": self.last_scan_at,
+            "last_error": self.last_error,
+        }
+
+
+scanner = DepositScanner()
+
+
+async def scan_deposits() -> bool:
+    """单次扫描"""
+    try:
+        return await scanner.scan_once()
     except Exception as e:
+        scanner.last_error = str(e)
         logger.error(f"Scanner error: {e}")
+        return True
 
 
 async def scanner_loop():
-    """持续运行的充值检测循环"""
+    """持续运行的充值检测循环；落后时连续追赶，追上后按 interval 轮询"""
     logger.info(f"Starting deposit scanner (interval: {SCANNER_INTERVAL}s)")
     while True:
-        await scan_deposits()
-        await asyncio.sleep(SCANNER_INTERVAL)
+        caught_up = await scan_deposits()
+        delay = max(SCANNER_INTERVAL if caught_up else 0, scanner.backoff)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def scanner_stats() -> Dict[str, Any]:
+    return scanner.stats()
+
+
+def _expire_pending_payments() -> int:
+    from datetime import datetime, timezone
+
+    db = get_supabase()
+    now = datetime.now(timezone.utc).isoformat()
+    result = (
+        db.table("wallet_pending_payments")
+        .update({"status": "expired"})
+        .eq("status", "pending")
+        .lt("expires_at", now)
+        .execute()
+    )
+    return len(result.data or [])
 
 
 async def expired_payment_cleanup_loop():
     """清理过期的 pending payments"""
     from config import EXPIRED_PAYMENT_CLEANUP_INTERVAL
-    from datetime import datetime, timezone
 
     logger.info("Starting expired payment cleanup loop")
     while True:
         try:
-            db = get_supabase()
-            now = datetime.now(timezone.utc).isoformat()
-            result = (
-                db.table("wallet_pending_payments")
-                .update({"status": "expired"})
-                .eq("status", "pending")
-                .lt("expires_at", now)
-                .execute()
-            )
-            expired = len(result.data or [])
+            expired = await asyncio.to_thread(_expire_pending_payments)
             if expired > 0:
                 logger.info(f"Expired {expired} pending payments")
         except Exception as e:
@@ -101,19 +101,29 @@ def build_transfer_calldata(to: str, amount: float) -> str:
     ).build_transaction({"gas": 0, "gasPrice": 0})["data"]
 
 
-def get_transfer_events(from_block: int, to_block: int) -> list[dict]:
-    """获取 USDC Transfer 事件"""
-    contract = _get_contract()
+def _address_topic(address: str) -> str:
+    """地址左补零到 32 字节，作为 indexed 参数的 topic"""
+    return "0x" + "0" * 24 + address.lower().replace("0x", "")
+
+
+def get_transfer_events(from_block: int, to_block: int, to_addresses: list[str] | None = None) -> list[dict]:
+    """获取 USDC Transfer 事件；给了 to_addresses 时由节点按 to topic 过滤（OR），只返回转给这些地址的"""
     w3 = _get_w3()
 
     # Transfer event topic
     transfer_topic = w3.keccak(text="Transfer(address,address,uint256)").hex()
+    if not transfer_topic.startswith("0x"):
+        transfer_topic = "0x" + transfer_topic
+
+    topics: list = [transfer_topic]
+    if to_addresses is not None:
+        topics += [None, [_address_topic(a) for a in to_addresses]]
 
     logs = w3.eth.get_logs({
         "address": Web3.to_checksum_address(USDC_CONTRACT_ADDRESS),
         "fromBlock": from_block,
         "toBlock": to_block,
-        "topics": [transfer_topic],
+        "topics": topics,
     })
 
     events = []
@@ -122,11 +132,13 @@ def get_transfer_events(from_block: int, to_block: int) -> list[dict]:
         from_addr = "0x" + log["topics"][1].hex()[-40:]
         to_addr = "0x" + log["topics"][2].hex()[-40:]
         value = int(log["data"].hex(), 16) / (10 ** USDC_DECIMALS)
+        tx_hash = log["transactionHash"].hex()
         events.append({
             "from": Web3.to_checksum_address(from_addr),
             "to": Web3.to_checksum_address(to_addr),
             "value": value,
-            "tx_hash": log["transactionHash"].hex(),
+            "tx_hash": tx_hash if tx_hash.startswith("0x") else "0x" + tx_hash,
+            "log_index": log["logIndex"],
             "block_number": log["blockNumber"],
         })
     return events
@@ -38,12 +38,43 @@ BUNDLER_RPC_URL = os.getenv("BUNDLER_RPC_URL", "")
 RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
 FROM_EMAIL = os.getenv("FROM_EMAIL", "wallet@pactum.cc")
 
+# 出站 HTTP 连接池（每个上游一个）
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+# API key
+API_KEY_PEPPER = os.getenv("API_KEY_PEPPER", "")  # HMAC key for api_key_digest
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "1024"))
+API_KEY_CACHE_TTL = int(os.getenv("API_KEY_CACHE_TTL", "60"))  # 秒
+# 旧版 bcrypt key 兜底：未知 key 要对所有未迁移用户跑 bcrypt（迁移窗口见 db/schema.sql「API key 索引迁移」）
+API_KEY_LEGACY_FALLBACK = os.getenv("API_KEY_LEGACY_FALLBACK", "true").lower() == "true"
+API_KEY_LEGACY_RATE = int(os.getenv("API_KEY_LEGACY_RATE", "10"))  # 全进程每分钟最多几次兜底扫描
+API_KEY_LEGACY_CLIENT_RATE = int(os.getenv("API_KEY_LEGACY_CLIENT_RATE", "3"))  # 每个客户端每分钟最多几次
+API_KEY_LEGACY_MISS_TTL = int(os.getenv("API_KEY_LEGACY_MISS_TTL", "600"))  # 兜底未命中的 key 多久内不再扫描（秒）
+
 # 服务
 PORT = int(os.getenv("PORT", 8001))
 PUBLIC_URL = os.getenv("PUBLIC_URL", "")
 
 # 充值检测
 SCANNER_INTERVAL = int(os.getenv("SCANNER_INTERVAL", "30"))  # 秒
+SCANNER_CONFIRMATIONS = int(os.getenv("SCANNER_CONFIRMATIONS", "5"))  # 只扫 head - N 之前的区块（防 reorg）
+SCANNER_RANGE = int(os.getenv("SCANNER_RANGE", "2000"))  # 单次 getLogs 最大区块数
+SCANNER_MIN_RANGE = int(os.getenv("SCANNER_MIN_RANGE", "10"))  # 节点超限时拆分的下限
+SCANNER_RATE_LIMIT_BACKOFF = float(os.getenv("SCANNER_RATE_LIMIT_BACKOFF", "5"))  # 节点限流时的首次退避（秒），连续限流翻倍
+SCANNER_CONCURRENCY = int(os.getenv("SCANNER_CONCURRENCY", "4"))  # 追赶时并发拉取的段数
+SCANNER_START_BLOCK = int(os.getenv("SCANNER_START_BLOCK", "0"))  # 首次部署起点，0 = 当前高度
+SCANNER_ADDRESS_CHUNK = int(os.getenv("SCANNER_ADDRESS_CHUNK", "200"))  # 单次 getLogs 的 to 地址数上限
+ADDRESS_BOOK_FULL_REFRESH = int(os.getenv("ADDRESS_BOOK_FULL_REFRESH", "3600"))  # 地址簿全量重载间隔（秒）
+ADDRESS_BOOK_OVERLAP = int(os.getenv("ADDRESS_BOOK_OVERLAP", "120"))  # 增量刷新回看水位线之前多少秒（兜底晚提交的注册）
+
+# /v1/events/stream（SSE）
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))  # 心跳（秒）
+EVENTS_STREAM_RECHECK = float(os.getenv("EVENTS_STREAM_RECHECK", "5"))  # 回查间隔，兜底别的进程写入的事件（秒）
+EVENTS_STREAM_MAX = int(os.getenv("EVENTS_STREAM_MAX", "1000"))  # 每个进程同时挂起的流上限
+EVENTS_STREAM_OVERLAP = int(os.getenv("EVENTS_STREAM_OVERLAP", "120"))  # 流每轮回看 cursor 之前多少秒（兜底晚提交的事件）
 EXPIRED_PAYMENT_CLEANUP_INTERVAL = int(os.getenv("EXPIRED_PAYMENT_CLEANUP_INTERVAL", "60"))
 
 # 默认限额
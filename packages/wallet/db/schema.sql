@@ -7,7 +7,9 @@
 CREATE TABLE IF NOT EXISTS wallet_users (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     email TEXT UNIQUE NOT NULL,
-    api_key_hash TEXT NOT NULL,
+    api_key_hash TEXT,                              -- 旧版 bcrypt（迁移完成后为 NULL）
+    api_key_id TEXT UNIQUE,                         -- key 前 12 位 hex，查找用
+    api_key_digest TEXT,                            -- HMAC-SHA256(API_KEY_PEPPER, key)
     privy_wallet_id TEXT UNIQUE NOT NULL,
     wallet_address TEXT UNIQUE NOT NULL,            -- EOA (Privy)
     smart_account_address TEXT UNIQUE,              -- ERC-4337 Smart Account
@@ -38,7 +40,8 @@ CREATE TABLE IF NOT EXISTS wallet_transactions (
     from_address TEXT,
     to_address TEXT,
     memo TEXT,
-    tx_hash TEXT UNIQUE,
+    tx_hash TEXT,
+    log_index INTEGER,                              -- 链上充值的 log 序号（同一 tx 可有多笔 Transfer）
     user_op_hash TEXT,                              -- ERC-4337 UserOp hash
     status TEXT DEFAULT 'completed',
     created_at TIMESTAMPTZ DEFAULT NOW()
@@ -62,21 +65,33 @@ CREATE TABLE IF NOT EXISTS wallet_events (
     user_id UUID NOT NULL REFERENCES wallet_users(id),
     type TEXT NOT NULL,
     data JSONB NOT NULL DEFAULT '{}',
+    tx_hash TEXT,                                   -- 链上事件来源（扫描器幂等写入用）
+    log_index INTEGER,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- 6. wallet_scanner_state: 链上扫描 checkpoint（重启后续扫）
+CREATE TABLE IF NOT EXISTS wallet_scanner_state (
+    name TEXT PRIMARY KEY,
+    last_block BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
 -- ========== 索引 ==========
 
 CREATE INDEX IF NOT EXISTS idx_wallet_users_email ON wallet_users(email);
+CREATE INDEX IF NOT EXISTS idx_wallet_users_legacy_key ON wallet_users(id) WHERE api_key_id IS NULL;
 CREATE INDEX IF NOT EXISTS idx_wallet_users_address ON wallet_users(wallet_address);
 CREATE INDEX IF NOT EXISTS idx_wallet_users_smart_account ON wallet_users(smart_account_address);
 CREATE INDEX IF NOT EXISTS idx_wallet_verification_codes_email ON wallet_verification_codes(email);
 CREATE INDEX IF NOT EXISTS idx_wallet_transactions_user ON wallet_transactions(user_id);
 CREATE INDEX IF NOT EXISTS idx_wallet_transactions_hash ON wallet_transactions(tx_hash);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_wallet_transactions_log ON wallet_transactions(tx_hash, log_index);
 CREATE INDEX IF NOT EXISTS idx_wallet_pending_payments_user ON wallet_pending_payments(user_id);
 CREATE INDEX IF NOT EXISTS idx_wallet_pending_payments_status ON wallet_pending_payments(status) WHERE status = 'pending';
 CREATE INDEX IF NOT EXISTS idx_wallet_events_user ON wallet_events(user_id);
 CREATE INDEX IF NOT EXISTS idx_wallet_events_created ON wallet_events(user_id, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_wallet_events_log ON wallet_events(tx_hash, log_index);
 
 -- ========== updated_at 触发器 ==========
 -- 复用 gateway 已有的 update_updated_at_column 函数，如果不存在则创建
@@ -101,6 +116,7 @@ ALTER TABLE wallet_verification_codes ENABLE ROW LEVEL SECURITY;
 ALTER TABLE wallet_transactions ENABLE ROW LEVEL SECURITY;
 ALTER TABLE wallet_pending_payments ENABLE ROW LEVEL SECURITY;
 ALTER TABLE wallet_events ENABLE ROW LEVEL SECURITY;
+ALTER TABLE wallet_scanner_state ENABLE ROW LEVEL SECURITY;
 
 -- service_role 完全访问
 CREATE POLICY wallet_users_service ON wallet_users FOR ALL USING (true) WITH CHECK (true);
@@ -108,6 +124,7 @@ CREATE POLICY wallet_verification_codes_service ON wallet_verification_codes FOR
 CREATE POLICY wallet_transactions_service ON wallet_transactions FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY wallet_pending_payments_service ON wallet_pending_payments FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY wallet_events_service ON wallet_events FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY wallet_scanner_state_service ON wallet_scanner_state FOR ALL USING (true) WITH CHECK (true);
 
 -- ========== ERC-4337 迁移（已有表执行） ==========
 -- ALTER TABLE wallet_users ADD COLUMN IF NOT EXISTS smart_account_address TEXT UNIQUE;
@@ -116,3 +133,26 @@ CREATE POLICY wallet_events_service ON wallet_events FOR ALL USING (true) WITH C
 -- ALTER TABLE wallet_transactions DROP CONSTRAINT IF EXISTS wallet_transactions_type_check;
 -- ALTER TABLE wallet_transactions ADD CONSTRAINT wallet_transactions_type_check CHECK (type IN ('deposit', 'payment', 'withdrawal', 'escrow_deposit'));
 -- CREATE INDEX IF NOT EXISTS idx_wallet_users_smart_account ON wallet_users(smart_account_address);
+
+-- ========== API key 索引迁移（已有表执行） ==========
+-- 迁移窗口：API_KEY_LEGACY_FALLBACK 默认 true，旧 key 在用户下次认证时自动写入 api_key_id / api_key_digest；
+-- 下面的 count 为 0 后设置 API_KEY_LEGACY_FALLBACK=false
+-- ALTER TABLE wallet_users ALTER COLUMN api_key_hash DROP NOT NULL;
+-- ALTER TABLE wallet_users ADD COLUMN IF NOT EXISTS api_key_id TEXT UNIQUE;
+-- ALTER TABLE wallet_users ADD COLUMN IF NOT EXISTS api_key_digest TEXT;
+-- CREATE INDEX IF NOT EXISTS idx_wallet_users_legacy_key ON wallet_users(id) WHERE api_key_id IS NULL;
+-- 查询剩余未迁移用户: SELECT count(*) FROM wallet_users WHERE api_key_id IS NULL;
+
+-- ========== 扫描 checkpoint 迁移（已有表执行） ==========
+-- 执行上面的 wallet_scanner_state 表 + RLS policy；首次启动从 SCANNER_START_BLOCK（或当前安全高度）开始
+
+-- ========== 充值幂等键迁移（已有表执行） ==========
+-- 同一 tx 可含多笔 Transfer（批量转账 / 同一 tx 付款又充值给别的用户），唯一键从 tx_hash 改为 (tx_hash, log_index)
+-- ALTER TABLE wallet_transactions DROP CONSTRAINT IF EXISTS wallet_transactions_tx_hash_key;
+-- ALTER TABLE wallet_transactions ADD COLUMN IF NOT EXISTS log_index INTEGER;
+-- ALTER TABLE wallet_events ADD COLUMN IF NOT EXISTS tx_hash TEXT;
+-- ALTER TABLE wallet_events ADD COLUMN IF NOT EXISTS log_index INTEGER;
+-- CREATE UNIQUE INDEX IF NOT EXISTS idx_wallet_transactions_log ON wallet_transactions(tx_hash, log_index);
+-- CREATE UNIQUE INDEX IF NOT EXISTS idx_wallet_events_log ON wallet_events(tx_hash, log_index);
+-- 旧充值行 log_index 为 NULL（NULL 不参与唯一冲突）；扫描器把 type='deposit' 且 log_index 为 NULL 的行视为整笔 tx 已入账，
+-- 用 SCANNER_START_BLOCK 重扫旧区块时不会重复入账 / 重复发 deposit_received
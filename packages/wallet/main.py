@@ -10,9 +10,10 @@ import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from config import PORT
+from config import PORT, API_KEY_PEPPER
+from net.http import init_http_clients, close_http_clients, http_pool_stats
 from api.routes import router
-from chain.scanner import scanner_loop, expired_payment_cleanup_loop
+from chain.scanner import scanner_loop, expired_payment_cleanup_loop, scanner_stats
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,10 +25,14 @@ logger = logging.getLogger("pactum-wallet")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    if not API_KEY_PEPPER:
+        raise RuntimeError("API_KEY_PEPPER is not set — API key digests would be unkeyed")
     logger.info("Pactum Wallet service started")
+    init_http_clients()
     asyncio.create_task(scanner_loop())
     asyncio.create_task(expired_payment_cleanup_loop())
     yield
+    await close_http_clients()
     logger.info("Pactum Wallet service shutting down")
 
 
@@ -54,5 +59,11 @@ async def health():
     return {"status": "ok", "service": "pactum-wallet"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """运行时指标：出站 HTTP 连接池使用率、充值扫描进度（lag_blocks = head - checkpoint）"""
+    return {"http_pools": http_pool_stats(), "scanner": scanner_stats()}
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=PORT, log_level="info")
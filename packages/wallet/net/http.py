@@ -0,0 +1,101 @@
+"""
+出站 HTTP 客户端注册表 — 每个上游一个长生命周期 httpx.AsyncClient
+复用 TCP/TLS 连接（keep-alive），每个上游独立连接上限，可选 HTTP/2
+lifespan 启动时 init_http_clients()，关闭时 close_http_clients()
+"""
+import logging
+from typing import Dict, Any
+
+import httpx
+
+from config import HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY, HTTP2_ENABLED
+
+logger = logging.getLogger("wallet.http")
+
+DEFAULT_TIMEOUT = 30
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HttpClientRegistry:
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2_ENABLED,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and _http2_available()
+        if http2 and not self.http2:
+            logger.warning("HTTP2_ENABLED but h2 is not installed — falling back to HTTP/1.1")
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, name: str, timeout: float = DEFAULT_TIMEOUT) -> httpx.AsyncClient:
+        """按上游名字取共享客户端（同名复用同一个连接池），单次请求可用 timeout= 覆盖"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=timeout, limits=self.limits, http2=self.http2)
+            self._clients[name] = client
+        return client
+
+    async def aclose(self):
+        for client in self._clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"HTTP client close failed: {e}")
+        self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池使用率 gauge：每个上游的连接数 / 使用中 / 空闲 / 上限"""
+        out = {}
+        for name, client in self._clients.items():
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            conns = list(getattr(pool, "connections", None) or [])
+            idle = sum(1 for c in conns if c.is_idle())
+            in_use = len(conns) - idle
+            limit = self.limits.max_connections or 0
+            out[name] = {
+                "connections": len(conns),
+                "in_use": in_use,
+                "idle": idle,
+                "max": limit,
+                "utilization": round(in_use / limit, 3) if limit else 0.0,
+            }
+        return out
+
+
+_registry: HttpClientRegistry | None = None
+
+
+def init_http_clients() -> HttpClientRegistry:
+    global _registry
+    if _registry is None:
+        _registry = HttpClientRegistry()
+    return _registry
+
+
+def http_client(name: str, timeout: float = DEFAULT_TIMEOUT) -> httpx.AsyncClient:
+    return init_http_clients().get(name, timeout=timeout)
+
+
+async def close_http_clients():
+    global _registry
+    if _registry is not None:
+        await _registry.aclose()
+        _registry = None
+
+
+def http_pool_stats() -> Dict[str, Any]:
+    return _registry.stats() if _registry else {}
@@ -0,0 +1,27 @@
+"""
+Server-Sent Events 帧格式 — text/event-stream
+id 用于断线重连（浏览器 / 客户端带 Last-Event-ID 头续传），注释行（: 开头）做心跳
+"""
+import json
+from typing import Any, Optional
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",  # 关掉 nginx / 反代缓冲
+}
+
+
+def sse_event(data: Any, event_id: Optional[str] = None, event: Optional[str] = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    payload = json.dumps(data, separators=(",", ":"), default=str)
+    lines.append(f"data: {payload}")
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_comment(text: str = "ping") -> str:
+    return f": {text}\n\n"
@@ -8,10 +8,10 @@ import base64
 import json
 import logging
 
-import httpx
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives import hashes, serialization
 
+from net.http import http_client
 from config import PRIVY_APP_ID, PRIVY_APP_SECRET, PRIVY_AUTH_KEY, CHAIN_ID
 
 logger = logging.getLogger("wallet.privy")
@@ -90,16 +90,16 @@ async def create_wallet() -> dict:
     url = f"{PRIVY_BASE}/wallets"
     body = {"chain_type": "ethereum"}
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
-            url,
-            headers=_common_headers(),
-            json=body,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        logger.info(f"Created Privy wallet: {data.get('address', 'unknown')}")
-        return {"id": data["id"], "address": data["address"]}
+    resp = await http_client("privy").post(
+        url,
+        headers=_common_headers(),
+        json=body,
+        timeout=30,
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    logger.info(f"Created Privy wallet: {data.get('address', 'unknown')}")
+    return {"id": data["id"], "address": data["address"]}
 
 
 async def send_transaction(wallet_id: str, to: str, data: str) -> str:
@@ -125,16 +125,15 @@ async def send_transaction(wallet_id: str, to: str, data: str) -> str:
     headers = _common_headers()
     headers["privy-authorization-signature"] = _make_auth_signature("POST", url, body)
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        resp = await client.post(url, headers=headers, json=body)
-        if resp.status_code != 200:
-            logger.error(f"Privy RPC error {resp.status_code}: {resp.text}")
-            logger.error(f"Request body: {json.dumps(body)}")
-            resp.raise_for_status()
-        result = resp.json()
-        tx_hash = result["data"]["hash"]
-        logger.info(f"Sent tx via Privy: {tx_hash}")
-        return tx_hash
+    resp = await http_client("privy").post(url, headers=headers, json=body, timeout=60)
+    if resp.status_code != 200:
+        logger.error(f"Privy RPC error {resp.status_code}: {resp.text}")
+        logger.error(f"Request body: {json.dumps(body)}")
+        resp.raise_for_status()
+    result = resp.json()
+    tx_hash = result["data"]["hash"]
+    logger.info(f"Sent tx via Privy: {tx_hash}")
+    return tx_hash
 
 
 async def sign_message(wallet_id: str, message: str) -> str:
@@ -173,12 +172,11 @@ async def sign_message(wallet_id: str, message: str) -> str:
 
     logger.info(f"Signing with secp256k1_sign: wallet={wallet_id} original_hash={message[:20]}... eip191_hash={eth_signed_hash_hex[:20]}...")
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(url, headers=headers, json=body)
-        if resp.status_code != 200:
-            logger.error(f"Privy secp256k1_sign error {resp.status_code}: {resp.text}")
-            resp.raise_for_status()
-        result = resp.json()
-        signature = result["data"]["signature"]
-        logger.info(f"Signed via Privy wallet {wallet_id}")
-        return signature
+    resp = await http_client("privy").post(url, headers=headers, json=body, timeout=30)
+    if resp.status_code != 200:
+        logger.error(f"Privy secp256k1_sign error {resp.status_code}: {resp.text}")
+        resp.raise_for_status()
+    result = resp.json()
+    signature = result["data"]["signature"]
+    logger.info(f"Signed via Privy wallet {wallet_id}")
+    return signature
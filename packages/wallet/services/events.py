@@ -1,8 +1,60 @@
 """
 事件写入/查询 — Agent 轮询用
+record_event 写入后唤醒本进程内挂起的 SSE 流（/v1/events/stream）；别的进程写入的由流定期回查兜底
+SSE 流查询前先取 event_seq，wait_event 带上它：查询和挂起之间写入的事件会让 wait_event 立即返回
+created_at 是写入事务的开始时间，晚提交的行可能排在流已经发过的 cursor 之前：
+流每轮再用 fetch_late 回看 cursor 之前 EVENTS_STREAM_OVERLAP 秒，按 id 跳过本流发过的
 """
-from datetime import datetime, timezone
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
 from db.client import get_supabase
+from config import EVENTS_STREAM_MAX, EVENTS_STREAM_OVERLAP
+
+_waiters: Dict[str, Set[asyncio.Event]] = {}  # user_id → 挂起的 SSE 流
+_event_seq: Dict[str, int] = {}  # user_id → 本进程写入的事件计数
+_parked = 0
+_loop: Optional[asyncio.AbstractEventLoop] = None  # 挂起流所在的事件循环（扫描器在线程里写事件，要跨线程唤醒）
+EVENT_SEQ_MAX_USERS = 10000
+
+
+def record_event(user_id: str, event_type: str, data: Dict[str, Any]):
+    db = get_supabase()
+    db.table("wallet_events").insert({
+        "user_id": user_id,
+        "type": event_type,
+        "data": data,
+    }).execute()
+    _wake(user_id)
+
+
+def record_events(rows: List[Dict[str, Any]], on_conflict: str | None = None):
+    """批量写入（每行含 user_id / type / data）；给了 on_conflict 时按该唯一键忽略重复，可安全重放"""
+    if not rows:
+        return
+    db = get_supabase()
+    if on_conflict:
+        db.table("wallet_events").upsert(rows, on_conflict=on_conflict, ignore_duplicates=True).execute()
+    else:
+        db.table("wallet_events").insert(rows).execute()
+    for user_id in {row["user_id"] for row in rows}:
+        _wake(user_id)
+
+
+def _wake(user_id: str):
+    if len(_event_seq) >= EVENT_SEQ_MAX_USERS:
+        _event_seq.clear()  # 序号变化只会让挂起方多查一次，清空无害
+    _event_seq[user_id] = _event_seq.get(user_id, 0) + 1
+    if _waiters.get(user_id) and _loop is not None:
+        _loop.call_soon_threadsafe(_set_waiters, user_id)
+
+
+def _set_waiters(user_id: str):
+    for event in _waiters.get(user_id, ()):
+        event.set()
 
 
 async def get_events(user_id: str, since: str | None = None, limit: int = 50) -> dict:
@@ -18,3 +70,106 @@ async def get_events(user_id: str, since: str | None = None, limit: int = 50) ->
     result = query.order("created_at", desc=False).limit(limit).execute()
 
     return {"events": result.data or []}
+
+
+# ========== SSE 续传 ==========
+
+def encode_cursor(event: Dict[str, Any]) -> str:
+    raw = json.dumps([event["created_at"], event["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return str(ts), str(key)
+
+
+_ZERO_ID = "00000000-0000-0000-0000-000000000000"
+
+
+def latest_cursor(user_id: str) -> str:
+    """不带 Last-Event-ID 时从当前最新一条之后开始推；还没有事件就从头开始（不用本机时钟）"""
+    db = get_supabase()
+    result = (
+        db.table("wallet_events").select("id, created_at").eq("user_id", user_id)
+        .order("created_at", desc=True).order("id", desc=True).limit(1).execute()
+    )
+    if result.data:
+        return encode_cursor(result.data[0])
+    return encode_cursor({"created_at": "1970-01-01T00:00:00+00:00", "id": _ZERO_ID})
+
+
+def fetch_after(user_id: str, cursor: str, limit: int = 100) -> List[Dict[str, Any]]:
+    """按 (created_at, id) 取 cursor 之后的事件"""
+    ts, key = decode_cursor(cursor)
+    db = get_supabase()
+    result = (
+        db.table("wallet_events").select("*").eq("user_id", user_id)
+        .or_(f'created_at.gt."{ts}",and(created_at.eq."{ts}",id.gt."{key}")')
+        .order("created_at").order("id").limit(limit).execute()
+    )
+    return result.data or []
+
+
+def fetch_late(user_id: str, cursor: str, sent: Dict[str, datetime]) -> List[Dict[str, Any]]:
+    """
+    cursor 之前 EVENTS_STREAM_OVERLAP 秒内、不在 sent（本流已发出的 id → created_at）里的事件
+    顺带把 sent 中早于回看窗口的 id 清掉
+    """
+    ts, key = decode_cursor(cursor)
+    since = _parse_ts(ts) - timedelta(seconds=EVENTS_STREAM_OVERLAP)
+    for event_id, created in list(sent.items()):
+        if created < since:
+            del sent[event_id]
+    db = get_supabase()
+    result = (
+        db.table("wallet_events").select("*").eq("user_id", user_id)
+        .gte("created_at", since.isoformat()).lte("created_at", ts)
+        .order("created_at").order("id").limit(1000).execute()
+    )
+    # 同一时间戳、id 在 cursor 之后的归正常翻页
+    return [
+        e for e in result.data or []
+        if e["id"] not in sent and (e["created_at"] != ts or e["id"] < key)
+    ]
+
+
+def _parse_ts(ts: str) -> datetime:
+    return datetime.fromisoformat(ts.replace("Z", "+00:00"))
+
+
+def mark_sent(sent: Dict[str, datetime], event: Dict[str, Any]):
+    sent[event["id"]] = _parse_ts(event["created_at"])
+
+
+def event_seq(user_id: str) -> int:
+    """查询前取序号，wait_event 时带上"""
+    return _event_seq.get(user_id, 0)
+
+
+async def wait_event(user_id: str, since: int, timeout: float) -> bool:
+    """挂起直到本进程写入该用户的新事件或超时；序号已变化立即返回；挂起数满时返回 False"""
+    global _parked, _loop
+    _loop = asyncio.get_running_loop()
+    if event_seq(user_id) != since:
+        return True
+    if _parked >= EVENTS_STREAM_MAX:
+        return False
+    event = asyncio.Event()
+    waiters = _waiters.setdefault(user_id, set())
+    waiters.add(event)
+    _parked += 1
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        _parked -= 1
+        waiters.discard(event)
+        if not waiters:
+            _waiters.pop(user_id, None)
+    return True
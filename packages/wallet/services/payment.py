@@ -6,6 +6,7 @@ import logging
 from datetime import datetime, timezone, timedelta
 
 from db.client import get_supabase
+from services.events import record_event
 from chain.usdc import get_balance, build_transfer_calldata, build_approve_calldata, build_deposit_calldata, USDC_DECIMALS
 from privy.client import sign_message
 from userop.builder import (
@@ -150,11 +151,7 @@ async def pay(user: dict, to_address: str, amount: float, memo: str | None = Non
         payment_id = result.data[0]["id"]
 
         # 写事件
-        db.table("wallet_events").insert({
-            "user_id": user["id"],
-            "type": "payment_requires_confirmation",
-            "data": {"payment_id": payment_id, "to": to_address, "amount": amount, "memo": memo},
-        }).execute()
+        record_event(user["id"], "payment_requires_confirmation", {"payment_id": payment_id, "to": to_address, "amount": amount, "memo": memo})
 
         return {"status": "pending_confirmation", "payment_id": payment_id, "expires_at": expires_at}
 
@@ -188,11 +185,7 @@ async def _execute_payment(user: dict, to_address: str, amount: float, memo: str
     }).execute()
 
     # 写事件
-    db.table("wallet_events").insert({
-        "user_id": user["id"],
-        "type": "payment_sent",
-        "data": {"to": to_address, "amount": amount, "tx_hash": tx_hash, "user_op_hash": user_op_hash, "memo": memo},
-    }).execute()
+    record_event(user["id"], "payment_sent", {"to": to_address, "amount": amount, "tx_hash": tx_hash, "user_op_hash": user_op_hash, "memo": memo})
 
     logger.info(f"Payment: {sender} → {to_address} {amount} USDC op={user_op_hash}")
 
@@ -256,11 +249,7 @@ async def cancel_payment(user: dict, payment_id: str) -> dict:
     db.table("wallet_pending_payments").update({"status": "cancelled"}).eq("id", payment_id).execute()
 
     # 写事件
-    db.table("wallet_events").insert({
-        "user_id": user["id"],
-        "type": "payment_cancelled",
-        "data": {"payment_id": payment_id},
-    }).execute()
+    record_event(user["id"], "payment_cancelled", {"payment_id": payment_id})
 
     return {"status": "cancelled", "payment_id": payment_id}
 
@@ -293,11 +282,7 @@ async def withdraw(user: dict, to_address: str, amount: float, memo: str | None
         "user_op_hash": user_op_hash,
     }).execute()
 
-    db.table("wallet_events").insert({
-        "user_id": user["id"],
-        "type": "withdrawal_sent",
-        "data": {"to": to_address, "amount": amount, "tx_hash": tx_hash, "user_op_hash": user_op_hash, "memo": memo},
-    }).execute()
+    record_event(user["id"], "withdrawal_sent", {"to": to_address, "amount": amount, "tx_hash": tx_hash, "user_op_hash": user_op_hash, "memo": memo})
 
     logger.info(f"Withdrawal: {sender} → {to_address} {amount} USDC op={user_op_hash}")
 
@@ -335,15 +320,11 @@ async def contract_call(user: dict, contract_address: str, calldata: str) -> dic
         "user_op_hash": user_op_hash,
     }).execute()
 
-    db.table("wallet_events").insert({
-        "user_id": user["id"],
-        "type": "contract_call",
-        "data": {
-            "contract_address": contract_address,
-            "tx_hash": tx_hash,
-            "user_op_hash": user_op_hash,
-        },
-    }).execute()
+    record_event(user["id"], "contract_call", {
+        "contract_address": contract_address,
+        "tx_hash": tx_hash,
+        "user_op_hash": user_op_hash,
+    })
 
     logger.info(f"Contract call: {sender} → {contract_address} op={user_op_hash}")
 
@@ -402,18 +383,14 @@ async def escrow_deposit(
     }).execute()
 
     # 写事件
-    db.table("wallet_events").insert({
-        "user_id": user["id"],
-        "type": "escrow_deposit",
-        "data": {
-            "escrow_contract": escrow_contract,
-            "order_id_bytes32": order_id_bytes32,
-            "seller": seller,
-            "amount": amount,
-            "tx_hash": tx_hash,
-            "user_op_hash": user_op_hash,
-        },
-    }).execute()
+    record_event(user["id"], "escrow_deposit", {
+        "escrow_contract": escrow_contract,
+        "order_id_bytes32": order_id_bytes32,
+        "seller": seller,
+        "amount": amount,
+        "tx_hash": tx_hash,
+        "user_op_hash": user_op_hash,
+    })
 
     logger.info(f"Escrow deposit: {sender} → {escrow_contract} {amount} USDC op={user_op_hash}")
 
@@ -13,6 +13,7 @@ from db.client import get_supabase
 from auth.api_key import generate_api_key
 from privy.client import create_wallet
 from userop.builder import get_smart_account_address
+from chain.address_book import address_book
 from config import RESEND_API_KEY, FROM_EMAIL
 
 logger = logging.getLogger("wallet.registration")
@@ -108,16 +109,18 @@ async def verify(email: str, code: str) -> dict:
     smart_account = get_smart_account_address(wallet["address"])
 
     # 生成 API key
-    plain_key, key_hash = generate_api_key()
+    plain_key, key_fields = generate_api_key()
 
     # 创建用户（wallet_address 存 smart account，EOA 地址存 wallet_address 字段保持兼容）
-    db.table("wallet_users").insert({
+    created = db.table("wallet_users").insert({
         "email": email,
-        "api_key_hash": key_hash,
+        **key_fields,
         "privy_wallet_id": wallet["id"],
         "wallet_address": wallet["address"],  # EOA（Privy 钱包）
         "smart_account_address": smart_account,  # counterfactual smart account
     }).execute()
+    if created.data:
+        address_book.add(created.data[0]["id"], wallet["address"], smart_account)  # 下一轮扫描即生效
 
     logger.info(f"User registered: {email} → EOA={wallet['address']} SA={smart_account}")
 
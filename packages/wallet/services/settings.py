@@ -2,6 +2,7 @@
 用户限额管理
 """
 from db.client import get_supabase
+from auth.key_cache import key_cache
 from api.models import UpdateSettingsRequest
 
 
@@ -27,6 +28,7 @@ def update_settings(user: dict, req: UpdateSettingsRequest) -> dict:
 
     db = get_supabase()
     db.table("wallet_users").update(updates).eq("id", user["id"]).execute()
+    key_cache.invalidate_user(user["id"])
 
     # 返回更新后的值
     result = db.table("wallet_users").select("per_transaction_limit, daily_limit, require_confirmation_above").eq("id", user["id"]).execute()
@@ -8,8 +8,7 @@ ERC-7677 三步 Paymaster 流程:
 import asyncio
 import logging
 
-import httpx
-
+from net.http import http_client
 from config import BUNDLER_RPC_URL, ENTRYPOINT_ADDRESS, CHAIN_ID, BASE_RPC_URL
 
 logger = logging.getLogger("wallet.userop.bundler")
@@ -35,25 +34,23 @@ class BundlerClient:
             "method": method,
             "params": params,
         }
-        async with httpx.AsyncClient(timeout=30) as client:
-            resp = await client.post(self.rpc_url, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
-            if "error" in data:
-                logger.error(f"Bundler RPC error ({method}): {data['error']}")
-                raise RuntimeError(f"Bundler RPC error: {data['error']}")
-            return data["result"]
+        resp = await http_client("bundler").post(self.rpc_url, json=payload, timeout=30)
+        resp.raise_for_status()
+        data = resp.json()
+        if "error" in data:
+            logger.error(f"Bundler RPC error ({method}): {data['error']}")
+            raise RuntimeError(f"Bundler RPC error: {data['error']}")
+        return data["result"]
 
     async def _get_gas_price(self) -> str:
         """从 Base RPC 获取当前 gas price"""
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.post(BASE_RPC_URL, json={
-                "jsonrpc": "2.0",
-                "id": 1,
-                "method": "eth_gasPrice",
-                "params": [],
-            })
-            return resp.json()["result"]
+        resp = await http_client("rpc").post(BASE_RPC_URL, json={
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "eth_gasPrice",
+            "params": [],
+        }, timeout=10)
+        return resp.json()["result"]
 
     async def sponsor_user_op(self, user_op: dict) -> dict:
         """